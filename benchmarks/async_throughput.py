@@ -0,0 +1,82 @@
+"""Serve many concurrent deposits and withdrawals from one event loop.
+
+Opens an AsyncBank in a temporary directory, fires all requests at once with
+asyncio.gather and reports requests per second and how many disk writes
+carried them. Final balances are checked against a reloaded Bank.
+
+Usage:
+    python -m benchmarks.async_throughput [requests] [customers]
+"""
+import asyncio
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from utils.logger import logger
+from models.BankAccount import BankAccount as Account
+from models.Employee import Employee
+from repositories.customer_repository import CustomerRepository
+from repositories.employee_repository import EmployeeRepository
+from repositories.transaction_ledger import TransactionLedger
+from services.AsyncBank import AsyncBank
+from services.Bank import Bank
+
+OPENING_BALANCE = 10_000
+
+
+async def run(requests, customers, directory):
+    bank = await AsyncBank.open(Path(directory) / "customers.json", Path(directory) / "employees.json",
+                                Path(directory) / "transactions.jsonl")
+    employee = await bank.add_employee("1", "John", "Smith", Employee.Position.MANAGER.value)
+    customer_ids = [f"{i:010d}" for i in range(1, customers + 1)]
+    for customer_id in customer_ids:
+        await bank.add_customer(customer_id, "Async", "Test", 30, "Main Street", "5550000000", employee)
+        await bank.open_account(customer_id, Account.Type.CHECKING.value, OPENING_BALANCE, "1")
+
+    rng = random.Random(0)
+    expected = dict.fromkeys(customer_ids, OPENING_BALANCE)
+
+    async def deposit(customer_id, amount):
+        await bank.deposit(customer_id, Account.Type.CHECKING.value, amount)
+        expected[customer_id] += amount
+
+    async def withdraw(customer_id, amount):
+        if await bank.withdraw(customer_id, Account.Type.CHECKING.value, amount):
+            expected[customer_id] -= amount
+
+    batches_before = bank.bank.customer_repository.writer.batches
+    calls = [(deposit if rng.random() < 0.5 else withdraw)(rng.choice(customer_ids), rng.randint(1, 400))
+             for _ in range(requests)]
+    start = time.perf_counter()
+    await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - start
+    batches = bank.bank.customer_repository.writer.batches - batches_before
+    await bank.close()
+    return expected, elapsed, batches
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    requests = int(argv[0]) if len(argv) > 0 else 5000
+    customers = int(argv[1]) if len(argv) > 1 else 100
+    logger.setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as directory:
+        expected, elapsed, batches = asyncio.run(run(requests, customers, directory))
+        reloaded = Bank(CustomerRepository(Path(directory) / "customers.json"),
+                        EmployeeRepository(Path(directory) / "employees.json"),
+                        TransactionLedger(Path(directory) / "transactions.jsonl"))
+        on_disk = {customer_id: reloaded.find_customer(customer_id).accounts[0].balance for customer_id in expected}
+
+    print(f"{requests} concurrent requests on {customers} customers in {elapsed:.2f}s "
+          f"({requests / elapsed:.0f} requests/s, {batches} journal writes)")
+    ok = on_disk == expected
+    print("Final balances match" if ok else "Final balances DO NOT match")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Load-test the bank HTTP API with keep-alive clients.
+
+Without --url, a server is started in a subprocess over a temporary data
+directory seeded with customers. Each client process holds one keep-alive
+connection and sends a mix of customer lookups, deposits and withdrawals for
+the given duration. Reports requests per second and latency percentiles.
+
+Usage:
+    python -m benchmarks.http_load [--clients 8] [--duration 10] [--customers 1000] [--workers 32]
+                                   [--url http://127.0.0.1:8080]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from models.Employee import Employee
+
+
+def request(connection, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    headers = {'Content-Type': 'application/json'} if data else {}
+    connection.request(method, path, body=data, headers=headers)
+    response = connection.getresponse()
+    payload = response.read()
+    return response.status, payload
+
+
+def client(url, customer_ids, duration, seed):
+    """Send requests on one keep-alive connection until the duration is over.
+    Returns:
+        tuple: Latencies in seconds and the number of error responses
+    """
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port)
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        customer_id = rng.choice(customer_ids)
+        roll = rng.random()
+        start = time.perf_counter()
+        if roll < 0.6:
+            status, _ = request(connection, 'GET', f"/customers/{customer_id}")
+        elif roll < 0.8:
+            status, _ = request(connection, 'POST', f"/customers/{customer_id}/deposit",
+                                {'account_type': 'checking', 'amount': rng.randint(1, 100)})
+        else:
+            status, _ = request(connection, 'POST', f"/customers/{customer_id}/withdraw",
+                                {'account_type': 'checking', 'amount': rng.randint(1, 100)})
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            errors += 1
+    connection.close()
+    return latencies, errors
+
+
+def seed(url, customers):
+    """Create an employee and customers with a checking account through the API."""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port)
+    request(connection, 'POST', "/employees",
+            {'id': "1", 'first_name': "John", 'last_name': "Smith", 'position': Employee.Position.MANAGER.value})
+    customer_ids = [f"{i:010d}" for i in range(1, customers + 1)]
+    for customer_id in customer_ids:
+        request(connection, 'POST', "/customers",
+                {'id': customer_id, 'first_name': "Load", 'last_name': "Test", 'age': 30,
+                 'address': "Main Street", 'phone_number': "5550000000", 'employee_id': "1"})
+        request(connection, 'POST', f"/customers/{customer_id}/accounts",
+                {'account_type': 'checking', 'initial_deposit': 10_000, 'employee_id': "1"})
+    connection.close()
+    return customer_ids
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((parts.hostname, parts.port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def run(url, customers, clients, duration):
+    customer_ids = seed(url, customers)
+    with multiprocessing.Pool(clients) as pool:
+        start = time.perf_counter()
+        outcomes = pool.starmap(client, [(url, customer_ids, duration, n) for n in range(clients)])
+        elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latencies, _ in outcomes for latency in latencies)
+    errors = sum(errors for _, errors in outcomes)
+    print(f"{len(latencies)} requests from {clients} keep-alive clients in {elapsed:.1f}s: "
+          f"{len(latencies) / elapsed:.0f} requests/s, {errors} errors")
+    print(f"latency p50 {percentile(latencies, 0.50) * 1000:.2f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the bank HTTP API.")
+    parser.add_argument('--url', help="API to test; by default a server is started on a temporary book")
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=32, help="worker threads of the started server")
+    parser.add_argument('--flush-interval', type=float, default=0, help="flush interval of the started server")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        return 1 if run(args.url, args.customers, args.clients, args.duration) else 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [sys.executable, 'server.py', '--port', str(port), '--workers', str(args.workers),
+             '--data-dir', directory, '--flush-interval', str(args.flush_interval)],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env={**os.environ, 'BANK_LOG_LEVEL': 'WARNING'}
+        )
+        try:
+            wait_for(url)
+            errors = run(url, args.customers, args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Measure the resident memory of hydrated customers.
+
+Builds customers with one savings account, one checking account and one
+service from dictionaries, materializes their accounts and services, and
+reports the bytes allocated per customer as traced by tracemalloc.
+
+The same customers are also built from copies of the model classes without
+``__slots__``, whose instances keep their attributes in a ``__dict__``, as a
+baseline for the slotted models.
+
+Usage:
+    python -m benchmarks.memory_per_customer [count]
+"""
+import gc
+import logging
+import sys
+import tracemalloc
+import types
+
+from utils.logger import logger
+from models.BankAccount import BankAccount
+from models.CheckingAccount import CheckingAccount
+from models.CreditCardService import CreditCardService
+from models.Customer import Customer
+from models.LoanService import LoanService
+from models.SavingAccount import SavingAccount
+from models.Service import Service
+
+# Base classes first, so that every copy can take the copies of its bases
+MODEL_CLASSES = (BankAccount, SavingAccount, CheckingAccount, Service, LoanService, CreditCardService, Customer)
+
+
+def make_record(i):
+    return {
+        'id': f"{i:010d}",
+        'first_name': f"First{i}",
+        'last_name': f"Last{i}",
+        'age': 20 + i % 60,
+        'address': f"{i} Main Street",
+        'phone_number': f"{5550000000 + i:010d}",
+        'accounts': [
+            {'type': 'savings', 'balance': 1000 + i % 500, 'created_by': 'John Smith', 'minimum_balance': 500},
+            {'type': 'checking', 'balance': i % 700, 'created_by': 'John Smith', 'transaction_limit': 500}
+        ],
+        'services': [
+            {'type': 'loan', 'is_active': True, 'approved_by': 'John Smith'}
+        ]
+    }
+
+
+def without_slots(classes):
+    """Copy model classes without their __slots__.
+
+    Each copy has the methods of its class and the copies of its bases. The
+    functions are rebuilt so that the module globals they read and the class
+    behind zero-argument super() refer to the copies.
+    Args:
+        classes (tuple): Model classes, bases before subclasses
+    Returns:
+        dict: Copy of each class, keyed on the class
+    """
+    copies = {}
+    for cls in classes:
+        slots = set(cls.__dict__.get('__slots__', ()))
+        namespace = {name: value for name, value in cls.__dict__.items()
+                     if name not in slots and name not in ('__slots__', '__dict__', '__weakref__')}
+        bases = tuple(copies.get(base, base) for base in cls.__bases__)
+        copies[cls] = type(cls)(cls.__name__, bases, namespace)
+    replaced = {id(cls): copy for cls, copy in copies.items()}
+    module_globals = {}
+
+    def rebuild(function, copy):
+        if function is None:
+            return None
+        namespace = module_globals.get(function.__module__)
+        if namespace is None:
+            namespace = {name: replaced.get(id(value), value) for name, value in function.__globals__.items()}
+            module_globals[function.__module__] = namespace
+        closure = function.__closure__
+        if closure is not None:
+            closure = tuple(types.CellType(copy) if name == '__class__' else cell
+                            for name, cell in zip(function.__code__.co_freevars, closure))
+        rebuilt = types.FunctionType(function.__code__, namespace, function.__name__, function.__defaults__, closure)
+        rebuilt.__kwdefaults__ = function.__kwdefaults__
+        rebuilt.__qualname__ = function.__qualname__
+        return rebuilt
+
+    for cls, copy in copies.items():
+        for name, value in list(vars(copy).items()):
+            if isinstance(value, types.FunctionType):
+                setattr(copy, name, rebuild(value, copy))
+            elif isinstance(value, (classmethod, staticmethod)):
+                setattr(copy, name, type(value)(rebuild(value.__func__, copy)))
+            elif isinstance(value, property):
+                setattr(copy, name, property(rebuild(value.fget, copy), rebuild(value.fset, copy),
+                                             rebuild(value.fdel, copy), value.__doc__))
+    return copies
+
+
+def measure(count, customer_class=Customer):
+    """Return the bytes allocated per hydrated customer.
+    Args:
+        count (int): Number of customers to hydrate
+        customer_class (type): Customer class to hydrate them with
+    Returns:
+        float: Traced bytes per customer
+    """
+    records = [make_record(i) for i in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    customers = []
+    for record in records:
+        customer = customer_class.from_dict(record)
+        customer.accounts
+        customer.services
+        customers.append(customer)
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / count
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if argv else 100_000
+    logger.setLevel(logging.ERROR)
+    dict_customer = without_slots(MODEL_CLASSES)[Customer]
+    baseline = measure(count, dict_customer)
+    per_customer = measure(count)
+    print(f"{count} customers (customer + 2 accounts + 1 service)")
+    print(f"  __dict__   {baseline:6.0f} bytes per customer")
+    print(f"  __slots__  {per_customer:6.0f} bytes per customer  "
+          f"{1 - per_customer / baseline:.0%} less")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare the JSON and binary customer snapshot formats.
+
+Writes the same synthetic book as indented JSON and with customer_codec,
+checks that both decode to the same records, and reports file sizes, the
+time to parse each file and the time to open a CustomerRepository on each.
+Every load runs in a fresh process so that each starts from the same heap.
+
+Usage:
+    python -m benchmarks.snapshot_format [customers]
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+from utils.logger import logger
+from benchmarks.memory_per_customer import make_record
+from repositories import customer_codec
+
+LOAD = {
+    'parse': "import json, time; from repositories import customer_codec\n"
+             "start = time.perf_counter()\n"
+             "with open({path!r}, 'rb') as f:\n"
+             "    customer_codec.read_records(f) if customer_codec.is_binary(f) else json.load(f)\n"
+             "print(time.perf_counter() - start)",
+    'open': "import time; from repositories.customer_repository import CustomerRepository\n"
+            "start = time.perf_counter()\n"
+            "CustomerRepository({path!r})\n"
+            "print(time.perf_counter() - start)",
+}
+
+
+def make_book(count):
+    records = []
+    for i in range(1, count + 1):
+        record = make_record(i)
+        record['version'] = 1
+        record['created_by'] = "John Smith"
+        for account in record['accounts']:
+            account['id'] = uuid.uuid4().hex
+        records.append(record)
+    return records
+
+
+def timed_load(kind, path, runs=3):
+    """Return the best time of several fresh-process loads of a file."""
+    times = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-c', LOAD[kind].format(path=str(path))],
+                                   stdout=subprocess.PIPE, check=True, text=True,
+                                   env={**os.environ, 'BANK_LOG_LEVEL': 'ERROR'})
+        times.append(float(completed.stdout))
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the JSON and binary customer snapshot formats.")
+    parser.add_argument('customers', type=int, nargs='?', default=100_000)
+    args = parser.parse_args(argv)
+    count = args.customers
+    logger.setLevel(logging.ERROR)
+    records = make_book(count)
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = Path(directory) / "json" / "customers.json"
+        binary_path = Path(directory) / "binary" / "customers.json"
+        json_path.parent.mkdir()
+        binary_path.parent.mkdir()
+        with open(json_path, 'w') as f:
+            json.dump(records, f, indent=4)
+        customer_codec.dump(records, binary_path)
+        if customer_codec.load(binary_path) != records:
+            print("Binary snapshot does not decode to the original records")
+            return 1
+
+        json_size, binary_size = json_path.stat().st_size, binary_path.stat().st_size
+        print(f"{count} customers")
+        print(f"  size    JSON {json_size / 1e6:8.1f} MB  binary {binary_size / 1e6:8.1f} MB  "
+              f"{json_size / binary_size:.1f}x smaller")
+        for kind in ('parse', 'open'):
+            json_time, binary_time = timed_load(kind, json_path), timed_load(kind, binary_path)
+            print(f"  {kind:<6}  JSON {json_time:9.3f} s  binary {binary_time:9.3f} s  "
+                  f"{json_time / binary_time:.1f}x faster")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
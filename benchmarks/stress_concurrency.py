@@ -0,0 +1,102 @@
+"""Stress Bank with concurrent deposits and withdrawals from a thread pool.
+
+Every thread hammers a small set of customers so that operations on the same
+customer interleave. At the end the balances held in memory and the balances
+reloaded from disk must both equal the opening balances plus every applied
+deposit minus every applied withdrawal.
+
+Usage:
+    python -m benchmarks.stress_concurrency [threads] [operations] [customers]
+"""
+import logging
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from utils.logger import logger
+from models.BankAccount import BankAccount as Account
+from models.Employee import Employee
+from repositories.customer_repository import CustomerRepository
+from repositories.employee_repository import EmployeeRepository
+from repositories.transaction_ledger import TransactionLedger
+from services.Bank import Bank
+
+OPENING_BALANCE = 10_000
+
+
+def make_bank(directory):
+    return Bank(
+        CustomerRepository(Path(directory) / "customers.json", compact_threshold=500),
+        EmployeeRepository(Path(directory) / "employees.json"),
+        TransactionLedger(Path(directory) / "transactions.jsonl")
+    )
+
+
+def worker(bank, customer_ids, operations, seed):
+    """Run random operations and return the net amount applied per customer."""
+    rng = random.Random(seed)
+    net = defaultdict(int)
+    for _ in range(operations):
+        customer_id = rng.choice(customer_ids)
+        amount = rng.randint(1, 400)
+        if rng.random() < 0.5:
+            bank.deposit(customer_id, Account.Type.CHECKING.value, amount)
+            net[customer_id] += amount
+        elif bank.withdraw(customer_id, Account.Type.CHECKING.value, amount):
+            net[customer_id] -= amount
+    return net
+
+
+def run(threads, operations, customers):
+    with tempfile.TemporaryDirectory() as directory:
+        bank = make_bank(directory)
+        bank.add_employee(id="1", first_name="John", last_name="Smith", position=Employee.Position.MANAGER.value)
+        employee = bank.find_employee("1")
+        customer_ids = [f"{i:010d}" for i in range(1, customers + 1)]
+        for customer_id in customer_ids:
+            bank.add_customer(customer_id, "Stress", "Test", 30, "Main Street", "5550000000", employee)
+            bank.open_account(customer_id, Account.Type.CHECKING.value, OPENING_BALANCE, "1")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = [pool.submit(worker, bank, customer_ids, operations, seed) for seed in range(threads)]
+            totals = defaultdict(int)
+            for future in futures:
+                for customer_id, amount in future.result().items():
+                    totals[customer_id] += amount
+        elapsed = time.perf_counter() - start
+
+        expected = {customer_id: OPENING_BALANCE + totals[customer_id] for customer_id in customer_ids}
+        in_memory = {customer_id: bank.find_customer(customer_id).accounts[0].balance for customer_id in customer_ids}
+        reloaded_bank = make_bank(directory)
+        on_disk = {customer_id: reloaded_bank.find_customer(customer_id).accounts[0].balance
+                   for customer_id in customer_ids}
+
+    total_operations = threads * operations
+    print(f"{total_operations} operations on {customers} customers with {threads} threads "
+          f"in {elapsed:.2f}s ({total_operations / elapsed:.0f} ops/s)")
+    ok = expected == in_memory == on_disk
+    print("Final balances match" if ok else "Final balances DO NOT match")
+    if not ok:
+        for customer_id in customer_ids:
+            if not expected[customer_id] == in_memory[customer_id] == on_disk[customer_id]:
+                print(f"  {customer_id}: expected {expected[customer_id]}, "
+                      f"in memory {in_memory[customer_id]}, on disk {on_disk[customer_id]}")
+    return ok
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    threads = int(argv[0]) if len(argv) > 0 else 16
+    operations = int(argv[1]) if len(argv) > 1 else 500
+    customers = int(argv[2]) if len(argv) > 2 else 8
+    logger.setLevel(logging.ERROR)
+    return 0 if run(threads, operations, customers) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""Time the main Bank operations at several book sizes.
+
+Each book size runs in its own process so that peak RSS is measured per
+size. A run builds a synthetic book of customers with a savings account, a
+checking account and a loan, reloads it through a fresh Bank and times:
+loading, add_customer, open_account, apply_for_service, find_customer,
+deposit, withdraw, get_all_customers and the main.list_* renderers.
+
+Every operation records wall time, operations per second, bytes written and
+peak RSS. Results are written as JSON and can be compared with an earlier
+run.
+
+Usage:
+    python -m benchmarks.suite [--sizes 10000 100000 1000000] [--ops 1000]
+                               [--output benchmark_results.json] [--compare old_results.json]
+"""
+import argparse
+import builtins
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from utils.logger import logger
+from benchmarks.memory_per_customer import make_record
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def bytes_written():
+    """Return the bytes this process has written so far, as counted by the kernel."""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process in kilobytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Recorder:
+    """Collect one result per timed operation."""
+
+    def __init__(self, size):
+        self.size = size
+        self.results = []
+
+    @contextlib.contextmanager
+    def measure(self, operation, ops):
+        written = bytes_written()
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.results.append({
+            'size': self.size,
+            'operation': operation,
+            'ops': ops,
+            'seconds': elapsed,
+            'ops_per_second': ops / elapsed if elapsed > 0 else 0.0,
+            'bytes_written': bytes_written() - written,
+            'peak_rss_kb': peak_rss_kb()
+        })
+        print(f"  {operation:<20}{ops:>9} ops {elapsed:>9.3f}s {ops / elapsed if elapsed else 0:>12.0f} ops/s",
+              file=sys.stderr)
+
+
+def make_bank(directory):
+    from repositories.customer_repository import CustomerRepository
+    from repositories.employee_repository import EmployeeRepository
+    from repositories.transaction_ledger import TransactionLedger
+    from services.Bank import Bank
+    return Bank(
+        CustomerRepository(Path(directory) / "customers.json"),
+        EmployeeRepository(Path(directory) / "employees.json"),
+        TransactionLedger(Path(directory) / "transactions.jsonl")
+    )
+
+
+def render(function, bank):
+    """Run a main.list_* renderer without a terminal."""
+    with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+        original_input, builtins.input = builtins.input, lambda prompt='': ''
+        try:
+            function(bank)
+        finally:
+            builtins.input = original_input
+
+
+def run_size(size, ops):
+    """Build a book of a given size and time every operation on it.
+    Args:
+        size (int): Number of customers in the book
+        ops (int): Number of calls for each per-customer operation
+    Returns:
+        list: One result dictionary per operation
+    """
+    import main
+    from models.Employee import Employee
+
+    recorder = Recorder(size)
+    rng = random.Random(size)
+    with tempfile.TemporaryDirectory() as directory:
+        bank = make_bank(directory)
+        bank.add_employee(id="1", first_name="John", last_name="Smith", position=Employee.Position.MANAGER.value)
+        with recorder.measure('import', size):
+            bank.customer_repository.import_records(make_record(i) for i in range(1, size + 1))
+        bank.customer_repository.compact()
+
+        with recorder.measure('load', size):
+            bank = make_bank(directory)
+        employee = bank.find_employee("1")
+        ids = [f"{i:010d}" for i in range(1, size + 1)]
+
+        with recorder.measure('add_customer', ops):
+            for i in range(size + 1, size + ops + 1):
+                bank.add_customer(f"{i:010d}", f"First{i}", f"Last{i}", 30, f"{i} Main Street", "5550000000",
+                                  employee)
+        sample = [rng.choice(ids) for _ in range(ops)]
+        with recorder.measure('open_account', ops):
+            for customer_id in sample:
+                bank.open_account(customer_id, "checking", 1000, "1")
+        with recorder.measure('apply_for_service', ops):
+            for customer_id in sample:
+                bank.apply_for_service(customer_id, "credit_card", "1")
+        with recorder.measure('find_customer', ops):
+            for customer_id in sample:
+                bank.find_customer(customer_id)
+        with recorder.measure('deposit', ops):
+            for customer_id in sample:
+                bank.deposit(customer_id, "savings", 100)
+        with recorder.measure('withdraw', ops):
+            for customer_id in sample:
+                bank.withdraw(customer_id, "savings", 50)
+        with recorder.measure('get_all_customers', size + ops):
+            bank.get_all_customers()
+        for renderer in (main.list_customers, main.list_accounts, main.list_services):
+            with recorder.measure(renderer.__name__, size + ops):
+                render(renderer, bank)
+    return recorder.results
+
+
+def compare(results, baseline):
+    """Print the change in operations per second against an earlier run."""
+    previous = {(result['size'], result['operation']): result for result in baseline['results']}
+    print(f"{'size':>9} {'operation':<20}{'before':>12}{'after':>12}{'change':>9}")
+    for result in results:
+        before = previous.get((result['size'], result['operation']))
+        if not before or not before['ops_per_second']:
+            continue
+        change = result['ops_per_second'] / before['ops_per_second'] - 1
+        print(f"{result['size']:>9} {result['operation']:<20}{before['ops_per_second']:>12.0f}"
+              f"{result['ops_per_second']:>12.0f}{change:>+9.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Bank operations at several book sizes.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--ops', type=int, default=1000, help="calls per per-customer operation")
+    parser.add_argument('--output', default="benchmark_results.json")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    parser.add_argument('--single-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    logger.setLevel(logging.ERROR)
+
+    if args.single_size:
+        json.dump(run_size(args.single_size, args.ops), sys.stdout)
+        return 0
+
+    results = []
+    for size in args.sizes:
+        print(f"Book of {size} customers", file=sys.stderr)
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.suite', '--single-size', str(size), '--ops', str(args.ops)],
+            stdout=subprocess.PIPE, check=True, text=True
+        )
+        results.extend(json.loads(completed.stdout))
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'ops': args.ops,
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Compare trusted and fully validated hydration of stored customers.
+
+Imports a synthetic book into a CustomerRepository and seals it with
+``audit(reseal=True)``, the path an imported or legacy book takes, then
+hydrates every customer and its accounts with two repositories on it: one
+trusting the records whose checksum matches, and one with ``verify``
+validating every record in full. Passes alternate between the two so both
+run against the same heap. The checksum check is part of both times.
+
+Usage:
+    python -m benchmarks.trusted_hydration [customers]
+"""
+import gc
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from utils.logger import logger
+from benchmarks.memory_per_customer import make_record
+from repositories.customer_repository import CustomerRepository
+
+
+def hydrate_all(repository):
+    """Return the time of one pass hydrating every customer and its accounts."""
+    gc.collect()
+    start = time.perf_counter()
+    for customer in repository.iter_customers():
+        customer.accounts
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if argv else 100_000
+    runs = 3
+    logger.setLevel(logging.ERROR)
+    records = [make_record(i) for i in range(1, count + 1)]
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = Path(directory) / "customers.json"
+        seeded = CustomerRepository(file_path)
+        seeded.import_records(records)
+        resealed = seeded.audit(reseal=True)['resealed']
+        if resealed != count:
+            print(f"Only {resealed} of {count} customers were sealed")
+            return 1
+        trusted, verified = CustomerRepository(file_path), CustomerRepository(file_path, verify=True)
+        times = [(hydrate_all(trusted), hydrate_all(verified)) for _ in range(runs)]
+        trusted_time, verified_time = (min(column) for column in zip(*times))
+    print(f"{count} customers")
+    print(f"  trusted  {trusted_time:8.3f} s  {count / trusted_time:10.0f} customers/s")
+    print(f"  verify   {verified_time:8.3f} s  {count / verified_time:10.0f} customers/s  "
+          f"trusted is {verified_time / trusted_time:.1f}x faster")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
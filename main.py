@@ -1,6 +1,12 @@
+import argparse
+import contextlib
+import json
 import sys
+import time
 from models.BankAccount import BankAccount as Account
 from services.Bank import Bank
+from repositories.customer_repository import CustomerRepository
+from repositories.transaction_ledger import TransactionLedger
 from models.Service import Service
 from models.Employee import Employee
 from utils.Constants import CustomerConstants
@@ -126,16 +132,17 @@ def apply_service(bank, employee):
 
 def list_customers(bank):
     try:
-        customers = bank.get_all_customers()
-        if customers:
-            print("\n=== Customer List ===")
-            
-            # Left-aligns the text within the specified width
-            print(f"{'ID':<15}{'First Name':<15}{'Last Name':<15}{'Age':<5}{'Address':<20}{'Phone Number':<15}")
-            print("-" * 80)  
-            for customer in customers:
-                print(f"{customer.id:<15}{customer.first_name:<15}{customer.last_name:<15}{customer.age:<5}{customer.address:<20}{customer.phone_number:<15}")
-        else:
+        found = False
+        for customer in bank.iter_customers():
+            if not found:
+                print("\n=== Customer List ===")
+
+                # Left-aligns the text within the specified width
+                print(f"{'ID':<15}{'First Name':<15}{'Last Name':<15}{'Age':<5}{'Address':<20}{'Phone Number':<15}")
+                print("-" * 80)
+                found = True
+            print(f"{customer.id:<15}{customer.first_name:<15}{customer.last_name:<15}{customer.age:<5}{customer.address:<20}{customer.phone_number:<15}")
+        if not found:
             print("\nNo customers found.")
     except Exception as e:
         print(f"\n Error listing customers: {e}")
@@ -198,20 +205,18 @@ def perform_account_operation(bank, employee):
             
         amount = int(info['amount'])
         
+        # The bank stores the new balance and records the transaction in the ledger
         if info['operation'] == 'deposit':
             try:
-                account.balance += amount
-                print(f"\nSuccessfully deposited ${amount}. New balance: ${account.balance}")
+                balance = bank.deposit(customer.id, info['account_type'], amount)
+                print(f"\nSuccessfully deposited ${amount}. New balance: ${balance}")
             except ValueError as e:
                 print(f"\nError during deposit: {e}")
         else:  # withdraw
-            if account.withdraw(amount):
-                print(f"\nSuccessfully withdrew ${amount}. New balance: ${account.balance}")
+            if bank.withdraw(customer.id, info['account_type'], amount):
+                print(f"\nSuccessfully withdrew ${amount}. New balance: ${account.balance - amount}")
             else:
                 print("\nWithdrawal failed. Insufficient funds or below minimum balance.")
-                
-        # Update the customer in repository
-        bank.customer_repository.update_customer(customer.id, customer)
         
     except ValueError as e:
         print(f"\nError: {e}")
@@ -222,19 +227,19 @@ def perform_account_operation(bank, employee):
 
 def list_accounts(bank):
     try:
-        customers = bank.get_all_customers()
-        if not customers:
+        found = False
+        for customer in bank.iter_customers():
+            if not found:
+                print("\n=== Account List ===")
+                print(f"{'Customer ID':<15}{'Account Type':<15}{'Balance':<15}{'Created By':<20}")
+                print("-" * 65)
+                found = True
+            for account in customer.accounts:
+                print(f"{customer.id:<15}{account.type:<15}${account.balance:<14}{account._created_by:<20}")
+        if not found:
             print("\nNo accounts found.")
             return
 
-        print("\n=== Account List ===")
-        print(f"{'Customer ID':<15}{'Account Type':<15}{'Balance':<15}{'Created By':<20}")
-        print("-" * 65)
-        
-        for customer in customers:
-            for account in customer.accounts:
-                print(f"{customer.id:<15}{account.type:<15}${account.balance:<14}{account._created_by:<20}")
-                
     except Exception as e:
         print(f"\nError listing accounts: {e}")
     
@@ -242,21 +247,21 @@ def list_accounts(bank):
 
 def list_services(bank):
     try:
-        customers = bank.get_all_customers()
-        if not customers:
-            print("\nNo services found.")
-            return
-
-        print("\n=== Service List ===")
-        print(f"{'Customer ID':<15}{'Customer Name':<20}{'Service Type':<15}{'Status':<10}{'Approved By':<20}")
-        print("-" * 80)
-        
-        for customer in customers:
+        found = False
+        for customer in bank.iter_customers():
+            if not found:
+                print("\n=== Service List ===")
+                print(f"{'Customer ID':<15}{'Customer Name':<20}{'Service Type':<15}{'Status':<10}{'Approved By':<20}")
+                print("-" * 80)
+                found = True
             for service in customer.services:
                 status = "Active" if service.is_active else "Inactive"
                 print(f"{customer.id:<15}{customer.first_name + ' ' + customer.last_name:<20}"
                       f"{service.type:<15}{status:<10}{service._approved_by or 'N/A':<20}")
-                
+        if not found:
+            print("\nNo services found.")
+            return
+
     except Exception as e:
         print(f"\nError listing services: {e}")
     
@@ -282,6 +287,137 @@ def list_employees(bank):
     
     input("\nPress Enter to continue...")
 
+def batch_add_customer(bank, command):
+    employee = bank.find_employee(command.get('employee_id', "1"))
+    if not employee:
+        raise ValueError("Employee not found")
+    customer = bank.add_customer(
+        id=command.get('id'),
+        first_name=command.get('first_name'),
+        last_name=command.get('last_name'),
+        age=command.get('age'),
+        address=command.get('address'),
+        phone_number=command.get('phone_number'),
+        employee=employee
+    )
+    return {'id': customer.id}
+
+def batch_open_account(bank, command):
+    account = bank.open_account(
+        customer_id=command.get('customer_id'),
+        account_type=command.get('account_type'),
+        initial_deposit=command.get('initial_deposit', 0),
+        employee_id=command.get('employee_id', "1")
+    )
+    return {'account_id': account.id, 'type': account.type, 'balance': account.balance}
+
+def batch_apply_service(bank, command):
+    approved = bank.apply_for_service(command.get('customer_id'), command.get('service_type'),
+                                      command.get('employee_id', "1"))
+    return {'approved': approved}
+
+def batch_deposit(bank, command):
+    return {'balance': bank.deposit(command.get('customer_id'), command.get('account_type'), command.get('amount'))}
+
+def batch_withdraw(bank, command):
+    return {'applied': bank.withdraw(command.get('customer_id'), command.get('account_type'), command.get('amount'))}
+
+def batch_list_customers(bank, command):
+    return [{'id': customer.id, 'first_name': customer.first_name, 'last_name': customer.last_name,
+             'age': customer.age, 'address': customer.address, 'phone_number': customer.phone_number}
+            for customer in bank.iter_customers()]
+
+def batch_search_customers(bank, command):
+    criteria = {key: command[key] for key in ('phone_number', 'last_name', 'last_name_prefix', 'created_by',
+                                              'min_age', 'max_age', 'limit') if key in command}
+    return [{'id': customer.id, 'first_name': customer.first_name, 'last_name': customer.last_name,
+             'age': customer.age, 'address': customer.address, 'phone_number': customer.phone_number}
+            for customer in bank.search_customers(**criteria)]
+
+def batch_list_accounts(bank, command):
+    return [{'customer_id': customer.id, 'account_id': account.id, 'type': account.type,
+             'balance': account.balance, 'created_by': account._created_by}
+            for customer in bank.iter_customers() for account in customer.accounts]
+
+def batch_list_services(bank, command):
+    return [{'customer_id': customer.id, 'type': service.type, 'active': service.is_active,
+             'approved_by': service._approved_by}
+            for customer in bank.iter_customers() for service in customer.services]
+
+def batch_list_employees(bank, command):
+    return bank.get_all_employees()
+
+def batch_checkpoint(bank, command):
+    bank.flush()
+    return None
+
+def batch_audit(bank, command):
+    return bank.audit_customers(reseal=bool(command.get('reseal')))
+
+BATCH_COMMANDS = {
+    'add_customer': batch_add_customer,
+    'open_account': batch_open_account,
+    'apply_service': batch_apply_service,
+    'deposit': batch_deposit,
+    'withdraw': batch_withdraw,
+    'list_customers': batch_list_customers,
+    'search_customers': batch_search_customers,
+    'list_accounts': batch_list_accounts,
+    'list_services': batch_list_services,
+    'list_employees': batch_list_employees,
+    'checkpoint': batch_checkpoint,
+    'audit': batch_audit
+}
+
+def run_batch(bank, lines, output=sys.stdout, checkpoint_every=None):
+    """Run JSON commands against a bank without prompts
+    Each line is an object with a "command" key (see BATCH_COMMANDS) and its arguments,
+    e.g. {"command": "deposit", "customer_id": "0000000001", "account_type": "savings", "amount": 100}.
+    One JSON result is written per command, followed by a summary. Persistence is deferred
+    to a single flush at the end, at "checkpoint" commands and every checkpoint_every commands.
+    Args:
+        bank (Bank): The bank to run the commands against
+        lines (iterable): JSON lines, blank lines are skipped
+        output (file): Where the JSON results are written
+        checkpoint_every (int): Flush after this many commands, or None to flush only at the end
+    Returns:
+        dict: Counts of ok and failed commands, elapsed seconds and commands per second
+    """
+    start = time.perf_counter()
+    counts = {'ok': 0, 'error': 0}
+    commands = 0
+    with bank.deferred(), contextlib.redirect_stdout(sys.stderr):
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            commands += 1
+            result = {'line': line_number}
+            try:
+                command = json.loads(line)
+                result['command'] = command.get('command')
+                handler = BATCH_COMMANDS.get(result['command'])
+                if not handler:
+                    raise ValueError(f"Unknown command: {result['command']}")
+                result['result'] = handler(bank, command)
+                result['status'] = 'ok'
+            except Exception as e:
+                result.update(status='error', error=str(e))
+            counts[result['status']] += 1
+            output.write(json.dumps(result) + "\n")
+            if checkpoint_every and commands % checkpoint_every == 0:
+                bank.flush()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'summary': True,
+        'commands': commands,
+        **counts,
+        'elapsed': elapsed,
+        'commands_per_second': commands / elapsed if elapsed > 0 else 0.0
+    }
+    output.write(json.dumps(summary) + "\n")
+    return summary
+
 def display_menu():
     print("\n=== Banking System Menu ===")
     print("1. Add New Customer")
@@ -295,8 +431,8 @@ def display_menu():
     print("9. Exit")
     return input("\nSelect an option (1-9): ").strip()
 
-def initialize_bank():
-    bank = Bank()
+def initialize_bank(verify=False):
+    bank = Bank(CustomerRepository(warm_start=True, verify=verify), transaction_ledger=TransactionLedger())
     
     employees = bank.get_all_employees()
     if not employees:
@@ -315,8 +451,22 @@ def initialize_bank():
     
     return bank
 
-def main():
-    bank = initialize_bank()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banking system menu, or batch mode with --batch.")
+    parser.add_argument("--batch", metavar="FILE", help="run JSON line commands from FILE ('-' for stdin) without prompts")
+    parser.add_argument("--checkpoint-every", type=int, default=None,
+                        help="in batch mode, flush to storage after this many commands")
+    parser.add_argument("--verify", action="store_true",
+                        help="validate every stored customer in full when loading it instead of trusting its checksum")
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        bank = initialize_bank(args.verify)
+        with (open(args.batch, 'r', encoding='utf-8') if args.batch != '-' else contextlib.nullcontext(sys.stdin)) as f:
+            summary = run_batch(bank, f, checkpoint_every=args.checkpoint_every)
+        sys.exit(0 if not summary['error'] else 2)
+
+    bank = initialize_bank(args.verify)
     employee = bank.find_employee("1")
     
     while True:
@@ -1,22 +1,42 @@
+import uuid
 from enum import Enum
-from utils.logger import logger
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class BankAccount:
+    __slots__ = ('_id', '_type', '_created_by', '_balance', '_owner', '_slot')
+
     class Type(Enum):
-        SAVING = "savings"
+        SAVINGS = "savings"
         CHECKING = "checking"
 
     def __init__(self, balance=0, created_by=None):
+        self._id = None
         self._type = None
         self._created_by = created_by
+        self._owner = None
+        self._slot = None
         self.balance = balance 
-        logger.info(f"{self.__class__.__name__} created by: {self._created_by} with balance: ${self.balance}")
+        logger.debug("%s created by: %s with balance: $%s", self.__class__.__name__, self._created_by, self.balance)
+
 
+    @property
+    def id(self):
+        """Getter for id, generated on first access for new accounts"""
+        if self._id is None:
+            self._id = uuid.uuid4().hex
+        return self._id
 
     @property
     def type(self):
         return self._type
 
+    @property
+    def slot(self):
+        """Slot of the account in the repository's balance file, or None"""
+        return self._slot
+
     @property
     def balance(self):
         """Getter for balance"""
@@ -34,6 +54,8 @@ class BankAccount:
                 raise ValueError("Balance cannot be negative")
             self._validate_balance(new_amount)  
             self._balance = new_amount
+            if self._owner is not None:
+                self._owner.touch()
         except ValueError:
             logger.error("Balance must be a valid number")
             raise ValueError("Balance must be a valid number")
@@ -60,23 +82,46 @@ class BankAccount:
             bool: True if withdrawal is successful, False otherwise
         """
         self.balance -= amount
-        logger.info(f"${amount} withdrawn from {self._type} account. New balance: ${self.balance}")
+        logger.info("$%s withdrawn from %s account. New balance: $%s", amount, self._type, self.balance)
         return True
 
+    def deposit(self, amount):
+        """Deposit the specified amount
+        Args:
+            amount (int): Amount to deposit
+        Raises:
+            ValueError: If the amount is not a positive number
+        """
+        try:
+            amount = int(amount)
+        except (TypeError, ValueError):
+            logger.error("Deposit amount must be a valid number")
+            raise ValueError("Deposit amount must be a valid number")
+        if amount <= 0:
+            logger.error("Deposit amount must be positive")
+            raise ValueError("Deposit amount must be positive")
+        self.balance += amount
+        logger.info("$%s deposited to %s account. New balance: $%s", amount, self._type, self.balance)
+
 
     def to_dict(self):
         """Make BankAccount class JSON serializable"""
-        return {
+        data = {
+            'id': self.id,
             'type': self._type,
             'balance': self.balance,
             'created_by': self._created_by,
         }
+        if self._slot is not None:
+            data['slot'] = self._slot
+        return data
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, trusted=False):
         """Create BankAccount object from a dictionary
         Args:
             data (dict): Dictionary containing account data
+            trusted (bool): Assign the stored balance without running the balance validation
         Returns:
             BankAccount: BankAccount object
         Raises:
@@ -88,18 +133,26 @@ class BankAccount:
             return None
         
         try:
-            BankAccount = cls(balance=data.get('balance', 0), created_by=data.get('created_by'))
+            if trusted:
+                BankAccount = cls.__new__(cls)
+                BankAccount._created_by = data.get('created_by')
+                BankAccount._owner = None
+                BankAccount._balance = data.get('balance', 0)
+            else:
+                BankAccount = cls(balance=data.get('balance', 0), created_by=data.get('created_by'))
             BankAccount._type = data['type'] 
-            logger.info(f"BankAccount createdfor user: {data.get('created_by')}") 
+            BankAccount._id = data.get('id')
+            BankAccount._slot = data.get('slot')
+            logger.debug("BankAccount createdfor user: %s", data.get('created_by')) 
             return BankAccount
         except KeyError as e:
-            logger.error(f"Invalid BankAccount data: Missing key {str(e)}.")
+            logger.error("Invalid BankAccount data: Missing key %s.", e)
             raise ValueError(f"Invalid BankAccount data: Missing key {str(e)}")
     
         except ValueError as e:
-            logger.error(f"Invalid BankAccount data: {str(e)}")
+            logger.error("Invalid BankAccount data: %s", e)
             raise ValueError(f"Invalid BankAccount data: {str(e)}")
         
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             raise ValueError(f"Unexpected error: {str(e)}")
@@ -1,14 +1,18 @@
-from utils.logger import logger
+from utils.logger import get_logger
 from models.BankAccount import BankAccount as Account
 from utils.Constants import TRANSACTION_LIMIT 	
 
+logger = get_logger(__name__)
+
 
 class CheckingAccount(Account):
+    __slots__ = ('_transaction_limit',)
+
     def __init__(self, balance=0, created_by=None, transaction_limit=TRANSACTION_LIMIT):
-        self._type = Account.Type.CHECKING.value
         self._transaction_limit = transaction_limit  
         super().__init__(balance, created_by)
-        logger.info(f"New CheckingAccount created by {created_by}.")
+        self._type = Account.Type.CHECKING.value
+        logger.debug("New CheckingAccount created by %s.", created_by)
 
 
     @property
@@ -32,7 +36,7 @@ class CheckingAccount(Account):
         if limit > 0 and limit <= TRANSACTION_LIMIT:
             self._transaction_limit = limit
         else:
-            logger.error(f"Transaction limit must be positive and less than or equal to {TRANSACTION_LIMIT}.")
+            logger.error("Transaction limit must be positive and less than or equal to %s.", TRANSACTION_LIMIT)
             raise ValueError(f"Transaction limit must be positive and less than or equal to {TRANSACTION_LIMIT}.")
 
     def withdraw(self, amount):
@@ -43,10 +47,10 @@ class CheckingAccount(Account):
             bool: True if the withdrawal is successful and False otherwise.
         """
         if amount <= self._transaction_limit and self.balance >= amount: 
-            logger.info(f"Withdrawal of ${amount} approved.")       
+            logger.info("Withdrawal of $%s approved.", amount)       
             return super().withdraw(amount)
         else:
-            logger.warning(f"Withdrawal of ${amount} denied.")
+            logger.warning("Withdrawal of $%s denied.", amount)
             return False
 
     def to_dict(self):
@@ -56,11 +60,12 @@ class CheckingAccount(Account):
         return data
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, trusted=False):
         """Create CheckingAccount object from a dictionary
         Args:
             data (dict): Dictionary containing account data
-            
+            trusted (bool): Assign the stored balance without running the balance validation
+
         Returns:
             CheckingAccount: CheckingAccount object
 
@@ -72,18 +77,18 @@ class CheckingAccount(Account):
             return None
         
         try:
-            account = super().from_dict(data)
+            account = super().from_dict(data, trusted)
             if account:
                 account._transaction_limit = data.get('transaction_limit', TRANSACTION_LIMIT)
             return account
         except KeyError as e:
-            logger.error(f"Invalid CheckingAccount data: Missing key {str(e)}.")
+            logger.error("Invalid CheckingAccount data: Missing key %s.", e)
             raise ValueError(f"Invalid CheckingAccount data: Missing key {str(e)}")
     
         except ValueError as e:
-            logger.error(f"Invalid CheckingAccount data: {str(e)}")
+            logger.error("Invalid CheckingAccount data: %s", e)
             raise ValueError(f"Invalid CheckingAccount data: {str(e)}")
         
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             raise ValueError(f"Unexpected error: {str(e)}")
\ No newline at end of file
@@ -1,12 +1,16 @@
-from utils.logger import logger
+from utils.logger import get_logger
 from models.Service import Service
 from utils.Constants import MINIMUM_BALANCE, CreditCardConstants
 
+logger = get_logger(__name__)
+
 class CreditCardService(Service):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__() 
         self._type = Service.Type.CREDIT_CARD.value 
-        logger.info("New CreditCardService created.")
+        logger.debug("New CreditCardService created.")
 
 
     def _meets_requirements(self, customer):
@@ -18,8 +22,8 @@ class CreditCardService(Service):
         """
         has_sufficient_balance = any(account.balance >= MINIMUM_BALANCE for account in customer.accounts)
         is_eligible_age = customer.age >= CreditCardConstants.MIN_AGE
-        logger.debug(f"CreditCard requirement check for {customer.full_name}: "
-                 f"balance_ok={has_sufficient_balance}, age_ok={is_eligible_age})")
+        logger.debug("CreditCard requirement check for %s: balance_ok=%s, age_ok=%s)",
+                     customer.full_name, has_sufficient_balance, is_eligible_age)
         
         return has_sufficient_balance and is_eligible_age
     
@@ -47,13 +51,13 @@ class CreditCardService(Service):
             service._approved_by = data.get('approved_by')
             return service
         except KeyError as e:
-            logger.error(f"Invalid CreditCard service data: Missing key {str(e)}.")
+            logger.error("Invalid CreditCard service data: Missing key %s.", e)
             raise ValueError(f"Invalid CreditCard service data: Missing key {str(e)}")
     
         except ValueError as e:
-            logger.error(f"Invalid CreditCard service data: {str(e)}")
+            logger.error("Invalid CreditCard service data: %s", e)
             raise ValueError(f"Invalid CreditCard service data: {str(e)}")
         
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             raise ValueError(f"Unexpected error: {str(e)}")
\ No newline at end of file
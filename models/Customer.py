@@ -1,4 +1,5 @@
-from utils.logger import logger
+from utils.logger import get_logger
+from utils.metrics import registry as metrics
 from models.BankAccount import BankAccount as Account
 from models.CheckingAccount import CheckingAccount
 from models.SavingAccount import SavingAccount
@@ -7,17 +8,26 @@ from .Service import Service
 from .CreditCardService import CreditCardService
 from .LoanService import LoanService
 
+logger = get_logger(__name__)
+
 class Customer:
+    __slots__ = ('_id', 'first_name', 'last_name', 'address', '_age', '_phone_number',
+                 '_accounts', '_services', '_account_data', '_service_data', '_version', '_trusted')
+
     def __init__(self, id, first_name, last_name, age, address, phone_number):
+        self._version = 0
         self.id = id
         self.first_name = first_name
         self.last_name = last_name
         self.address = address
         self.age = age 
         self.phone_number = phone_number
-        self.accounts = []
-        self.services = []
-        logger.info(f"New Customer created: {self.full_name}")
+        self._accounts = []
+        self._services = []
+        self._account_data = None
+        self._service_data = None
+        self._trusted = False
+        logger.debug("New Customer created: %s", self.full_name)
 
     @property
     def id(self):
@@ -42,7 +52,7 @@ class Customer:
             raise ValueError("Customer ID must contain only digits")
 
         if len(value) !=  CustomerConstants.ID_LENGTH:
-            logger.error(f"customer ID must be exactly {CustomerConstants.ID_LENGTH} digits")
+            logger.error("customer ID must be exactly %s digits", CustomerConstants.ID_LENGTH)
             raise ValueError("Customer ID must be exactly 10 digits")
             
         self._id = value
@@ -67,10 +77,25 @@ class Customer:
             raise ValueError("Age must be a valid number")
 
         if not CustomerConstants.MIN_AGE <= age_value <= CustomerConstants.MAX_AGE:
-            logger.error(f"Age must be between {CustomerConstants.MIN_AGE} and {CustomerConstants.MAX_AGE} years")
+            logger.error("Age must be between %s and %s years", CustomerConstants.MIN_AGE, CustomerConstants.MAX_AGE)
             raise ValueError(f"Age must be between {CustomerConstants.MIN_AGE} and {CustomerConstants.MAX_AGE} years")
         
         self._age = age_value
+        self.touch()
+
+    @property
+    def version(self):
+        """Counter bumped by every change that can affect service eligibility"""
+        return self._version
+
+    @property
+    def validated(self):
+        """True unless the customer holds stored account data that has not been through validation yet"""
+        return self._trusted or self._account_data is None
+
+    def touch(self):
+        """Bump the version after a change to the age, the accounts or an account balance"""
+        self._version += 1
 
     @property
     def full_name(self):
@@ -99,11 +124,47 @@ class Customer:
             raise ValueError("Phone number must contain only digits.")
 
         if len(value) != 10:
-            logger.error(f"Phone number must contain exactly {CustomerConstants.PHONE_NUMBER_LENGTH} digits.")
+            logger.error("Phone number must contain exactly %s digits.", CustomerConstants.PHONE_NUMBER_LENGTH)
             raise ValueError(f"Phone number must contain exactly {CustomerConstants.PHONE_NUMBER_LENGTH} digits.")
 
         self._phone_number = value
 
+    @property
+    def accounts(self):
+        """Getter for accounts, built from the stored data on first access"""
+        if self._account_data is not None:
+            self._accounts = [account for account in
+                              (self._account_from_dict(account_data, f"{self._id}-{position}", self._trusted)
+                               for position, account_data in enumerate(self._account_data))
+                              if account]
+            self._account_data = None
+            for account in self._accounts:
+                account._owner = self
+            metrics.increment('customer.accounts_hydrated', len(self._accounts))
+        return self._accounts
+
+    @accounts.setter
+    def accounts(self, value):
+        self._accounts = value
+        self._account_data = None
+        for account in value:
+            account._owner = self
+        self.touch()
+
+    @property
+    def services(self):
+        """Getter for services, built from the stored data on first access"""
+        if self._service_data is not None:
+            self._services = [service for service in map(self._service_from_dict, self._service_data) if service]
+            self._service_data = None
+            metrics.increment('customer.services_hydrated', len(self._services))
+        return self._services
+
+    @services.setter
+    def services(self, value):
+        self._services = value
+        self._service_data = None
+
     @property
     def active_services(self):
         """Get a list of active services for the customer
@@ -117,30 +178,50 @@ class Customer:
         Args:
             account (BankAccount): The account to add
         """
-        logger.info(f"Account added to customer: {self.full_name}")
+        logger.info("Account added to customer: %s", self.full_name)
         self.accounts.append(account)
+        account._owner = self
+        self.touch()
+
+    def assign_account_slots(self, slots):
+        """Record the balance file slot of each account
+        Args:
+            slots (list): Slots in account order
+        """
+        if self._account_data is not None:
+            self._account_data = [dict(account_data, slot=slot) for account_data, slot in zip(self._account_data, slots)]
+        else:
+            for account, slot in zip(self._accounts, slots):
+                account._slot = slot
 
     def remove_account(self, account):
         """Remove an account from the customer's list of accounts
         Args:
             account (BankAccount): The account to remove
         """
-        logger.info(f"Account removed from customer: {self.full_name}")
+        logger.info("Account removed from customer: %s", self.full_name)
         self.accounts.remove(account)
+        account._owner = None
+        self.touch()
 
-    def can_apply_for_service(self, service):
+    def can_apply_for_service(self, service, eligibility_cache=None):
         """Check if the customer can apply for the given service.
         Args:
             service (Service): The service to check.
+            eligibility_cache (EligibilityCache): Optional cache of earlier results.
         Returns:
             bool: True if the customer can apply, False otherwise.
         """
-        if service.can_apply(self):
-            logger.info(f"Customer {self.full_name} is eligible for {service.type} service.")
+        if eligibility_cache is not None:
+            eligible = eligibility_cache.can_apply(self, service)
+        else:
+            eligible = service.can_apply(self)
+        if eligible:
+            logger.info("Customer %s is eligible for %s service.", self.full_name, service.type)
             self.services.append(service)
             return True
         else:
-            logger.info(f"Customer {self.full_name} is not eligible for {service.type} service.")
+            logger.info("Customer %s is not eligible for %s service.", self.full_name, service.type)
             return False
 
     def to_dict(self):
@@ -152,15 +233,46 @@ class Customer:
             'age': self.age,
             'address': self.address,
             'phone_number': self.phone_number,
-            'accounts': [account.to_dict() for account in self.accounts],
-            'services': [service.to_dict() for service in self.services]
+            'version': self._version,
+            'accounts': ([dict(account) for account in self._account_data] if self._account_data is not None
+                         else [account.to_dict() for account in self._accounts]),
+            'services': ([dict(service) for service in self._service_data] if self._service_data is not None
+                         else [service.to_dict() for service in self._services])
         }
 
+    @staticmethod
+    def _account_from_dict(account_data, default_id, trusted=False):
+        """Create the SavingAccount or CheckingAccount for an account dictionary
+        Accounts stored before they had ids get default_id, derived from their position. The id is
+        stored with the account the next time the customer is written, and Bank stores it before
+        recording the account's first transaction, so a later remove_account cannot shift the id
+        that ledger history is filed under.
+        """
+        account_class = SavingAccount if account_data['type'] == Account.Type.SAVINGS.value else CheckingAccount
+        account = account_class.from_dict(account_data, trusted=trusted)
+        if account and account._id is None:
+            account._id = default_id
+        return account
+
+    @staticmethod
+    def _service_from_dict(service_data):
+        """Create the LoanService or CreditCardService for a service dictionary"""
+        service_class = LoanService if service_data['type'] == Service.Type.LOAN.value else CreditCardService
+        return service_class.from_dict(service_data)
+
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, trusted=False):
         """Create Customer object from a dictionary
+        Accounts and services are kept as dictionaries and only turned into
+        objects the first time customer.accounts or customer.services is read.
+
+        With trusted the fields are assigned without running the setter
+        validation, and the accounts are built the same way. Only pass it for
+        records that were validated when they were stored and whose integrity
+        has been checked since, see CustomerRepository.
         Args:
             data (dict): Dictionary containing customer data
+            trusted (bool): Skip the validation of the id, age, phone number and account balances
         Returns:
             Customer: Customer object
         Raises:
@@ -171,6 +283,8 @@ class Customer:
             return None
         
         try:
+            if trusted:
+                return cls._from_trusted_dict(data)
             customer = cls(
                 id=data['id'],
                 first_name=data['first_name'],
@@ -179,30 +293,36 @@ class Customer:
                 address=data['address'],
                 phone_number=data['phone_number']
             )
-            
-            
-            for account_data in data.get('accounts', []):
-                account_class = SavingAccount if account_data['type'] == Account.Type.SAVINGS.value else CheckingAccount
-                account = account_class.from_dict(account_data)
-                if account:
-                    customer.accounts.append(account)
-            
-            for service_data in data.get('services', []):
-                service_class = LoanService if service_data['type'] == Service.Type.LOAN.value else CreditCardService
-                if service_class:
-                    service = service_class.from_dict(service_data)
-                    if service:
-                        customer.services.append(service)
-                
-            return customer    
+            customer._account_data = data.get('accounts') or None
+            customer._service_data = data.get('services') or None
+            customer._version = data.get('version', 0)
+            return customer
         except KeyError as e:
-            logger.error(f"Invalid Customer data: Missing key {str(e)}.")
+            logger.error("Invalid Customer data: Missing key %s.", e)
             raise ValueError(f"Invalid Customer data: Missing key {str(e)}")
     
         except ValueError as e:
-            logger.error(f"Invalid Customer data: {str(e)}")
+            logger.error("Invalid Customer data: %s", e)
             raise ValueError(f"Invalid Customer data: {str(e)}")
         
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             raise ValueError(f"Unexpected error: {str(e)}")
+
+    @classmethod
+    def _from_trusted_dict(cls, data):
+        """Build a Customer straight from stored fields, bypassing __init__ and the setters"""
+        customer = cls.__new__(cls)
+        customer._id = data['id']
+        customer.first_name = data['first_name']
+        customer.last_name = data['last_name']
+        customer.address = data['address']
+        customer._age = data['age']
+        customer._phone_number = data['phone_number']
+        customer._accounts = []
+        customer._services = []
+        customer._account_data = data.get('accounts') or None
+        customer._service_data = data.get('services') or None
+        customer._version = data.get('version', 0)
+        customer._trusted = True
+        return customer
@@ -1,9 +1,12 @@
 from enum import Enum
 
-from utils.logger import logger
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class Employee:
-    
+    __slots__ = ('id', 'first_name', 'last_name', 'position')
+
     class Position(Enum):
         MANAGER = "Manager"
         TELLER = "Teller"
@@ -15,7 +18,7 @@ class Employee:
         self.first_name = first_name
         self.last_name = last_name
         self.position = position
-        logger.info(f"New Employee created: {self.full_name}")
+        logger.debug("New Employee created: %s", self.full_name)
 
     @property
     def full_name(self):
@@ -28,9 +31,9 @@ class Employee:
         """
         approveLoan = self.position.value in {self.Position.MANAGER.value, self.Position.LOAN_OFFICER.value}
         if (approveLoan):
-            logger.info(f"{self.full_name} can approve loans.")
+            logger.info("%s can approve loans.", self.full_name)
         else:
-            logger.info(f"{self.full_name} cannot approve loans.")
+            logger.info("%s cannot approve loans.", self.full_name)
         return approveLoan
     
     def can_open_accounts(self):
@@ -40,9 +43,9 @@ class Employee:
         """
         canOpen = self.position.value in {self.Position.MANAGER.value, self.Position.TELLER.value, self.Position.SENIOR_TELLER.value}
         if (canOpen):
-            logger.info(f"{self.full_name} can open accounts.")
+            logger.info("%s can open accounts.", self.full_name)
         else:
-            logger.info(f"{self.full_name} cannot open accounts.")
+            logger.info("%s cannot open accounts.", self.full_name)
         return canOpen
 
     def to_dict(self):
@@ -75,13 +78,13 @@ class Employee:
                 last_name=data['last_name'],
                 position=cls.Position(data['position'])   )
         except KeyError as e:
-            logger.error(f"Invalid Employee data: Missing key {str(e)}.")
+            logger.error("Invalid Employee data: Missing key %s.", e)
             raise ValueError(f"Invalid Employee data: Missing key {str(e)}")
     
         except ValueError as e:
-            logger.error(f"Invalid Employee data: {str(e)}")
+            logger.error("Invalid Employee data: %s", e)
             raise ValueError(f"Invalid Employee data: {str(e)}")
         
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             raise ValueError(f"Unexpected error: {str(e)}")
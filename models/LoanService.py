@@ -1,13 +1,17 @@
-from utils.logger import logger
+from utils.logger import get_logger
 from models.SavingAccount import SavingAccount
 from models.Service import Service
 from utils.Constants import LoanConstants
 
+logger = get_logger(__name__)
+
 class LoanService(Service):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()  
         self._type = Service.Type.LOAN.value  
-        logger.info("New LoanService created.")
+        logger.debug("New LoanService created.")
 
     def _meets_requirements(self, customer):
         """Check if the customer meets the requirements for this service.
@@ -23,8 +27,8 @@ class LoanService(Service):
         is_eligible_age = customer.age >= LoanConstants.MIN_AGE
 
         logger.debug(
-        f"Loan requirement check for {customer.full_name}: "
-        f"balance_ok={has_sufficient_balance}, age_ok={is_eligible_age}")
+        "Loan requirement check for %s: balance_ok=%s, age_ok=%s",
+        customer.full_name, has_sufficient_balance, is_eligible_age)
         
         return has_sufficient_balance and is_eligible_age
    
@@ -52,13 +56,13 @@ class LoanService(Service):
             service._approved_by = data.get('approved_by')
             return service
         except KeyError as e:
-            logger.error(f"Invalid Loan service data: Missing key {str(e)}.")
+            logger.error("Invalid Loan service data: Missing key %s.", e)
             raise ValueError(f"Invalid Loan service data: Missing key {str(e)}")
     
         except ValueError as e:
-            logger.error(f"Invalid Loan service data: {str(e)}")
+            logger.error("Invalid Loan service data: %s", e)
             raise ValueError(f"Invalid Loan service data: {str(e)}")
         
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             raise ValueError(f"Unexpected error: {str(e)}")
@@ -1,15 +1,19 @@
 
-from utils.logger import logger
+from utils.logger import get_logger
 from models.BankAccount import BankAccount as Account
 from utils.Constants import MINIMUM_BALANCE
 
+logger = get_logger(__name__)
+
 
 class SavingAccount(Account):
+    __slots__ = ('_minimum_balance',)
+
     def __init__(self, created_by=None, balance=0):
         self._minimum_balance = MINIMUM_BALANCE  
         super().__init__(balance, created_by)
-        self._type = Account.Type.SAVING.value
-        logger.info(f"New SavingAccount created by {created_by}.")
+        self._type = Account.Type.SAVINGS.value
+        logger.debug("New SavingAccount created by %s.", created_by)
        
 
     @property
@@ -41,10 +45,10 @@ class SavingAccount(Account):
             bool: True if the withdrawal is successful and False otherwise.
         """
         if self._balance - amount >= self._minimum_balance:
-            logger.info(f"Withdrawal of ${amount} approved.")
+            logger.info("Withdrawal of $%s approved.", amount)
             return super().withdraw(amount)
         else:
-            logger.warning(f"Withdrawal of ${amount} denied.")
+            logger.warning("Withdrawal of $%s denied.", amount)
             return False
     
     def to_dict(self):
@@ -54,11 +58,12 @@ class SavingAccount(Account):
         return data
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, trusted=False):
         """Create SavingAccount object from a dictionary
         Args:
             data (dict): Dictionary containing account data
-            
+            trusted (bool): Assign the stored balance without running the balance validation
+
         Returns:
             SavingAccount: SavingAccount object
             
@@ -70,18 +75,18 @@ class SavingAccount(Account):
             return None
         
         try:
-            account = super().from_dict(data)
+            account = super().from_dict(data, trusted)
             if account:
                 account._minimum_balance = data.get('minimum_balance', MINIMUM_BALANCE)
             return account
         except KeyError as e:
-            logger.error(f"Invalid SavingAccount data: Missing key {str(e)}.")
+            logger.error("Invalid SavingAccount data: Missing key %s.", e)
             raise ValueError(f"Invalid SavingAccount data: Missing key {str(e)}")
     
         except ValueError as e:
-            logger.error(f"Invalid SavingAccount data: {str(e)}")
+            logger.error("Invalid SavingAccount data: %s", e)
             raise ValueError(f"Invalid SavingAccount data: {str(e)}")
         
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             raise ValueError(f"Unexpected error: {str(e)}")
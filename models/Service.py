@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
 from enum import Enum
-from utils.logger import logger
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class Service(ABC):
+    __slots__ = ('_is_active', '_approved_by', '_type')
+
     class Type(Enum):
         LOAN = "loan"
         CREDIT_CARD = "credit_card"
@@ -45,7 +49,7 @@ class Service(ABC):
         """
         self._approved_by = employee.full_name
         self._is_active = True
-        logger.info(f"{self.type} service approved by {employee.full_name}")
+        logger.info("%s service approved by %s", self.type, employee.full_name)
 
     @abstractmethod
     def _meets_requirements(self, customer):
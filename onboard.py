@@ -0,0 +1,72 @@
+"""Bulk customer onboarding from a partner CSV or JSONL file.
+
+Usage:
+    python onboard.py customers.csv --employee-id 1 [--chunk-size 5000]
+    python onboard.py customers.jsonl --employee-id 1
+"""
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+from services.Bank import Bank
+
+
+def read_records(path):
+    """Stream customer records from a CSV (with a header row) or JSONL file.
+
+    A JSONL line that is not valid JSON is yielded as a ValueError naming its
+    line number instead of a record, so Bank.bulk_add_customers reports it
+    and carries on with the next line.
+    Args:
+        path (str): Path of the file, or '-' to read JSONL from stdin
+    Yields:
+        dict: One customer record per row, or ValueError for a line that could not be parsed
+    """
+    if path == '-':
+        yield from _parse_lines(sys.stdin)
+        return
+
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        if Path(path).suffix.lower() == '.csv':
+            yield from csv.DictReader(f)
+        else:
+            yield from _parse_lines(f)
+
+
+def _parse_lines(lines):
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ValueError(f"Line {line_number}: invalid JSON: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Onboard customers in bulk from a CSV or JSONL file.")
+    parser.add_argument("path", help="CSV or JSONL file with one customer per row, '-' for JSONL on stdin")
+    parser.add_argument("--employee-id", default="1", help="id of the employee creating the customers")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="customers per storage write (default: a single write)")
+    args = parser.parse_args(argv)
+
+    bank = Bank()
+    employee = bank.find_employee(args.employee_id)
+    if not employee:
+        print(f"Employee {args.employee_id} not found.")
+        return 1
+
+    report = bank.bulk_add_customers(read_records(args.path), employee, chunk_size=args.chunk_size)
+
+    for error in report['errors']:
+        print(f"Row {error['row']} ({error['id']}): {error['error']}")
+    print(f"\nAdded {report['added']} of {report['rows']} customers, {report['failed']} failed.")
+    print(f"Elapsed {report['elapsed']:.2f}s, {report['rows_per_second']:.0f} rows/s")
+    return 0 if not report['failed'] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+from array import array
+from itertools import compress, repeat
+from operator import eq, lt
+
+from models.BankAccount import BankAccount as Account
+from utils.Constants import MINIMUM_BALANCE, TRANSACTION_LIMIT
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AccountColumns:
+    """Columnar copy of every stored account for portfolio-wide queries.
+
+    Each account is one row spread over parallel typed arrays: the owning
+    customer, the account type code, the balance, the account limit
+    (minimum balance for savings, transaction limit for checking) and the
+    creating employee. The age of each customer is kept in a per-customer
+    array indexed by the values of the customer column. Filters run as single C-level passes over the arrays
+    without hydrating any Customer or BankAccount objects.
+
+    Per-type and per-creator balance totals are maintained as rows are added
+    and cleared, so those aggregates are answered without a scan. Rows of
+    removed customers are cleared in place and reclaimed once they make up
+    half of the columns.
+    """
+    SAVINGS = 1
+    CHECKING = 2
+    TYPE_CODES = {Account.Type.SAVINGS.value: SAVINGS, Account.Type.CHECKING.value: CHECKING}
+    TYPE_NAMES = {SAVINGS: Account.Type.SAVINGS.value, CHECKING: Account.Type.CHECKING.value}
+
+    def __init__(self):
+        self.customer = array('q')
+        self.type_code = array('b')
+        self.balance = array('q')
+        self.limit = array('q')
+        self.creator = array('q')
+        self.age = array('h')
+        self._customer_ids = []
+        self._customer_codes = {}
+        self._creators = []
+        self._creator_codes = {}
+        self._rows = {}
+        self._dead = 0
+        self._type_totals = {self.SAVINGS: 0, self.CHECKING: 0}
+        self._creator_totals = []
+
+    def __len__(self):
+        return len(self.balance) - self._dead
+
+    def put(self, customer_id, customer_dict):
+        """Replace the rows of a customer with its current accounts.
+
+        A customer whose age or account fields are not numbers gets no rows,
+        so one damaged record only drops out of the aggregates instead of
+        stopping the columns from being built.
+        Args:
+            customer_id (str): The id of the customer
+            customer_dict (dict): Customer data in the Customer.to_dict format
+        Returns:
+            bool: True if the customer's rows were stored, False if its data could not be read
+        """
+        self.remove(customer_id)
+        try:
+            age = int(customer_dict['age'])
+            accounts = []
+            for account in customer_dict.get('accounts') or []:
+                type_code = self.type_code_of(account.get('type'))
+                if type_code == self.SAVINGS:
+                    limit = account.get('minimum_balance', MINIMUM_BALANCE)
+                else:
+                    limit = account.get('transaction_limit', TRANSACTION_LIMIT)
+                accounts.append((type_code, int(account.get('balance', 0)), int(limit), account.get('created_by')))
+            # Range-check the values before anything is appended to the columns
+            array('h', (age,))
+            array('q', [value for _, balance, limit, _ in accounts for value in (balance, limit)])
+        except (KeyError, TypeError, ValueError, AttributeError, OverflowError) as e:
+            logger.warning("Customer %s has unreadable account data, left out of the account columns: %s",
+                           customer_id, e)
+            return False
+
+        customer = self._customer_codes.get(customer_id)
+        if customer is None:
+            customer = self._customer_codes[customer_id] = len(self._customer_ids)
+            self._customer_ids.append(customer_id)
+            self.age.append(0)
+        self.age[customer] = age
+
+        rows = []
+        for type_code, balance, limit, created_by in accounts:
+            creator = self._creator_code(created_by)
+            rows.append(len(self.balance))
+            self.customer.append(customer)
+            self.type_code.append(type_code)
+            self.balance.append(balance)
+            self.limit.append(limit)
+            self.creator.append(creator)
+            self._type_totals[type_code] += balance
+            self._creator_totals[creator] += balance
+        if rows:
+            self._rows[customer_id] = rows
+        return True
+
+    def set_balance(self, customer_id, position, balance):
+        """Change the balance of one account of a customer.
+        Args:
+            customer_id (str): The id of the customer
+            position (int): Position of the account among the customer's accounts
+            balance (int): New balance
+        """
+        row = self._rows[customer_id][position]
+        change = balance - self.balance[row]
+        self._type_totals[self.type_code[row]] += change
+        self._creator_totals[self.creator[row]] += change
+        self.balance[row] = balance
+
+    def remove(self, customer_id):
+        """Clear the rows of a customer.
+        Args:
+            customer_id (str): The id of the customer
+        """
+        rows = self._rows.pop(customer_id, None)
+        if not rows:
+            return
+        for row in rows:
+            self._type_totals[self.type_code[row]] -= self.balance[row]
+            self._creator_totals[self.creator[row]] -= self.balance[row]
+            self.customer[row] = -1
+            self.type_code[row] = 0
+            self.balance[row] = 0
+            self.limit[row] = 0
+            self.creator[row] = -1
+        self._dead += len(rows)
+        if self._dead > 1024 and self._dead * 2 > len(self.balance):
+            self._reclaim()
+
+    def total_balance(self, account_type=None):
+        """Sum the balances of all accounts, or of one account type.
+        Args:
+            account_type (str): Account type value to restrict to, or None for all
+        Returns:
+            int: Total balance
+        """
+        if account_type is None:
+            return sum(self._type_totals.values())
+        return self._type_totals[self.type_code_of(account_type)]
+
+    def totals_by_type(self):
+        """Sum balances per account type.
+        Returns:
+            dict: Account type value -> total balance
+        """
+        return {name: self.total_balance(name) for name in self.TYPE_CODES}
+
+    def totals_by_creator(self):
+        """Sum balances per creating employee.
+        Returns:
+            dict: Employee name -> total balance
+        """
+        return dict(zip(self._creators, self._creator_totals))
+
+    def customers_below(self, threshold=MINIMUM_BALANCE, account_type=None):
+        """Find customers holding an account with a balance below a threshold.
+        Args:
+            threshold (int): Balance to compare against
+            account_type (str): Account type value to restrict to, or None for all
+        Returns:
+            list: Ids of the matching customers, in storage order
+        """
+        mask = map(lt, self.balance, repeat(threshold))
+        if account_type is not None:
+            code = self.type_code_of(account_type)
+            mask = map(bool.__and__, mask, map(eq, self.type_code, repeat(code)))
+        codes = dict.fromkeys(compress(self.customer, mask))
+        codes.pop(-1, None)
+        return [self._customer_ids[code] for code in codes]
+
+    def snapshot(self):
+        """Copy the columns for read-only queries.
+        Returns:
+            AccountColumns: Copy that does not support put or remove
+        """
+        columns = AccountColumns.__new__(AccountColumns)
+        for name in ('customer', 'type_code', 'balance', 'limit', 'creator', 'age'):
+            setattr(columns, name, array(getattr(self, name).typecode, getattr(self, name)))
+        columns._customer_ids = list(self._customer_ids)
+        columns._customer_codes = None
+        columns._creators = list(self._creators)
+        columns._creator_codes = None
+        columns._rows = None
+        columns._dead = self._dead
+        columns._type_totals = dict(self._type_totals)
+        columns._creator_totals = list(self._creator_totals)
+        return columns
+
+    def copy(self):
+        """Copy the columns, including the bookkeeping put and remove need.
+        Returns:
+            AccountColumns: Independent copy
+        """
+        columns = self.snapshot()
+        columns._customer_codes = dict(self._customer_codes)
+        columns._creator_codes = dict(self._creator_codes)
+        columns._rows = {customer_id: list(rows) for customer_id, rows in self._rows.items()}
+        return columns
+
+    def set_balances(self, balances):
+        """Replace the whole balance column and recompute the totals.
+        Args:
+            balances (iterable): New balance of every row, cleared rows included
+        """
+        self.balance = array('q', balances)
+        self._type_totals = {self.SAVINGS: 0, self.CHECKING: 0}
+        self._creator_totals = [0] * len(self._creators)
+        for type_code, creator, balance in zip(self.type_code, self.creator, self.balance):
+            if type_code:
+                self._type_totals[type_code] += balance
+                self._creator_totals[creator] += balance
+
+    @classmethod
+    def from_records(cls, records):
+        """Build columns from customer dictionaries.
+        Args:
+            records (iterable): Customer data in the Customer.to_dict format
+        Returns:
+            AccountColumns: The filled columns
+        """
+        columns = cls()
+        for record in records:
+            columns.put(record['id'], record)
+        return columns
+
+    @classmethod
+    def concat(cls, parts):
+        """Join the columns of disjoint sets of customers, such as the shards of a book.
+        Args:
+            parts (iterable): AccountColumns to join
+        Returns:
+            AccountColumns: Joined copy that does not support put or remove
+        """
+        columns = cls()
+        creator_codes = {}
+        for part in parts:
+            offset = len(columns._customer_ids)
+            columns._customer_ids.extend(part._customer_ids)
+            columns.age.extend(part.age)
+            creators = []
+            for name, total in zip(part._creators, part._creator_totals):
+                code = creator_codes.get(name)
+                if code is None:
+                    code = creator_codes[name] = len(columns._creators)
+                    columns._creators.append(name)
+                    columns._creator_totals.append(0)
+                columns._creator_totals[code] += total
+                creators.append(code)
+            columns.customer.extend(code + offset if code >= 0 else -1 for code in part.customer)
+            columns.creator.extend(creators[code] if code >= 0 else -1 for code in part.creator)
+            columns.type_code.extend(part.type_code)
+            columns.balance.extend(part.balance)
+            columns.limit.extend(part.limit)
+            columns._dead += part._dead
+            for type_code, total in part._type_totals.items():
+                columns._type_totals[type_code] += total
+        columns._customer_codes = None
+        columns._creator_codes = None
+        columns._rows = None
+        return columns
+
+    def customer_id(self, code):
+        """Return the customer id for a value of the customer column."""
+        return self._customer_ids[code]
+
+    @classmethod
+    def type_code_of(cls, account_type):
+        """Return the type code for an account type value.
+
+        Anything that is not a savings account is loaded as a checking
+        account by Customer, so it is coded the same way here.
+        """
+        return cls.TYPE_CODES.get(account_type, cls.CHECKING)
+
+    def _creator_code(self, name):
+        code = self._creator_codes.get(name)
+        if code is None:
+            code = self._creator_codes[name] = len(self._creators)
+            self._creators.append(name)
+            self._creator_totals.append(0)
+        return code
+
+    def _reclaim(self):
+        """Drop cleared rows and renumber the rows of the remaining customers."""
+        keep = [row for rows in self._rows.values() for row in rows]
+        keep.sort()
+        for name in ('customer', 'type_code', 'balance', 'limit', 'creator'):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[row] for row in keep)))
+        renumbered = {old: new for new, old in enumerate(keep)}
+        self._rows = {customer_id: [renumbered[row] for row in rows] for customer_id, rows in self._rows.items()}
+        self._dead = 0
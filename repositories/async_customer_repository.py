@@ -0,0 +1,85 @@
+import asyncio
+
+from utils.logger import get_logger
+from repositories.async_writer import AsyncBatchWriter
+from repositories.customer_repository import CustomerRepository
+
+logger = get_logger(__name__)
+
+
+class AsyncCustomerRepository(CustomerRepository):
+    """CustomerRepository whose journal writes are batched off the event loop.
+
+    Reads are already served from the resident index, so only the journal
+    appends block. Here they are queued on an AsyncBatchWriter instead, and
+    every mutation made while a write is in flight goes out in the next single
+    append. The index is updated immediately; ``aflush`` waits until the
+    journal has caught up. The inherited ``flush`` and ``close`` keep their
+    synchronous meaning: ``flush`` hands the entries buffered by ``deferred``
+    to the writer and ``close`` closes the balance file. If a batch fails to write, the index is rebuilt
+    from the files and the entries still waiting to be written are applied to
+    it again, so it does not keep the changes that never reached the disk.
+    Balances already written to a balance file are not rolled back.
+
+    Create instances with ``await AsyncCustomerRepository.open(...)`` so the
+    initial load also runs off the loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._writer = AsyncBatchWriter(self._write_journal, self._journal_written, self._journal_failed,
+                                        name="Customer journal")
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    async def open(cls, *args, **kwargs):
+        """Load a repository in a worker thread and start its writer on the running loop.
+        Args:
+            args: Positional arguments of CustomerRepository
+            kwargs: Keyword arguments of CustomerRepository
+        Returns:
+            AsyncCustomerRepository: The loaded repository
+        """
+        repository = await asyncio.to_thread(cls, *args, **kwargs)
+        repository._writer.start()
+        return repository
+
+    @property
+    def writer(self):
+        """The AsyncBatchWriter that journal entries are queued on."""
+        return self._writer
+
+    async def aflush(self, since=None):
+        """Wait until every queued journal entry has been written.
+        Args:
+            since (int): Value of writer.mark(); failed writes after it are raised, see AsyncBatchWriter.flush
+        """
+        await self._writer.flush(since)
+
+    async def aclose(self):
+        """Write the queued journal entries, stop the writer and close the balance file."""
+        await self._writer.close()
+        self.close()
+
+    def _append_journal(self, *entries):
+        self._writer.submit(*entries)
+
+    def _journal_failed(self, entries, error):
+        """Rebuild the index after a journal write failed, keeping the entries not written yet.
+        Args:
+            entries (list): The journal entries that were not written
+            error (Exception): The error of the write
+        """
+        with self._lock:
+            unwritten = self._writer.queued + list((self._deferred_entries or {}).values())
+            self.invalidate()
+            for entry in unwritten:
+                if entry['op'] == 'put':
+                    self._index[entry['id']] = entry['customer']
+                    self.account_columns.put(entry['id'], self._with_balances(entry['customer']))
+                    self.customer_indexes.put(entry['id'], entry['customer'])
+                else:
+                    self._index.pop(entry['id'], None)
+                    self.account_columns.remove(entry['id'])
+                    self.customer_indexes.remove(entry['id'])
+        logger.warning("Rebuilt the customer index of %s without %s unwritten journal entries.", self.file_path,
+                       len(entries))
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+from utils.logger import get_logger
+from repositories.async_writer import AsyncBatchWriter
+from repositories.employee_repository import EmployeeRepository
+
+logger = get_logger(__name__)
+
+
+class AsyncEmployeeRepository(EmployeeRepository):
+    """EmployeeRepository whose file rewrites are coalesced off the event loop.
+
+    Every save queues a copy of the employee list; the writer then rewrites
+    the file once per batch with the newest copy.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._writer = AsyncBatchWriter(self._write_snapshot, name="Employee file")
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    async def open(cls, *args, **kwargs):
+        """Load a repository in a worker thread and start its writer on the running loop.
+        Args:
+            args: Positional arguments of EmployeeRepository
+            kwargs: Keyword arguments of EmployeeRepository
+        Returns:
+            AsyncEmployeeRepository: The loaded repository
+        """
+        repository = await asyncio.to_thread(cls, *args, **kwargs)
+        repository._writer.start()
+        return repository
+
+    @property
+    def writer(self):
+        """The AsyncBatchWriter that saves are queued on."""
+        return self._writer
+
+    async def aflush(self, since=None):
+        """Wait until every queued save has been written.
+        Args:
+            since (int): Value of writer.mark(); failed writes after it are raised, see AsyncBatchWriter.flush
+        """
+        await self._writer.flush(since)
+
+    async def aclose(self):
+        """Write the queued saves and stop the writer."""
+        await self._writer.close()
+
+    def _save_data(self):
+        self._writer.submit(list(self._data))
+
+    def _write_snapshot(self, snapshots):
+        """Rewrite the employee file with the newest of the queued copies."""
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with self.file_path.open('w') as f:
+                json.dump(snapshots[-1], f, indent=4)
+        except Exception as e:
+            logger.error("Failed to save data to %s: %s", self.file_path, e)
+            raise
@@ -0,0 +1,52 @@
+import asyncio
+
+from repositories.async_writer import AsyncBatchWriter
+from repositories.transaction_ledger import TransactionLedger
+
+
+class AsyncTransactionLedger(TransactionLedger):
+    """TransactionLedger whose line appends are batched off the event loop.
+
+    The in-memory histories are updated immediately, so balance-as-of and
+    statement queries see every recorded transaction; ``aflush`` waits until
+    the file has caught up.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._writer = AsyncBatchWriter(self._write_lines, name="Transaction ledger")
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    async def open(cls, *args, **kwargs):
+        """Load a ledger in a worker thread and start its writer on the running loop.
+        Args:
+            args: Positional arguments of TransactionLedger
+            kwargs: Keyword arguments of TransactionLedger
+        Returns:
+            AsyncTransactionLedger: The loaded ledger
+        """
+        ledger = await asyncio.to_thread(cls, *args, **kwargs)
+        ledger._writer.start()
+        return ledger
+
+    @property
+    def writer(self):
+        """The AsyncBatchWriter that ledger lines are queued on."""
+        return self._writer
+
+    async def aflush(self, since=None):
+        """Wait until every queued ledger line has been written.
+        Args:
+            since (int): Value of writer.mark(); failed writes after it are raised, see AsyncBatchWriter.flush
+        """
+        await self._writer.flush(since)
+
+    async def aclose(self):
+        """Write the queued lines and stop the writer."""
+        await self._writer.close()
+
+    def _append(self, lines):
+        if self._buffer is not None:
+            self._buffer.extend(lines)
+            return
+        self._writer.submit(*lines)
@@ -0,0 +1,144 @@
+import asyncio
+from collections import Counter
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncBatchWriter:
+    """Coalesce writes submitted on an event loop into batches written off the loop.
+
+    ``submit`` only queues items, so it never blocks. A writer task drains the
+    queue and hands everything queued since the last write to ``write`` in a
+    worker thread, so any number of concurrent submitters share one disk
+    write per batch. ``written`` is then called on the loop with the items and
+    the value returned by ``write``. If ``write`` raises, ``failed`` is called
+    in a worker thread with the items and the error before any later batch is
+    written, so the owner can reconcile its state with what reached the disk.
+
+    A failed write is kept until a flush has raised it and no mark taken
+    before its items remains to be flushed.
+
+    Until ``start`` is called, and after ``close``, items are written
+    synchronously, so the owning repository still works outside an event loop.
+    """
+
+    def __init__(self, write, written=None, failed=None, name="writer"):
+        self._write = write
+        self._written_callback = written
+        self._failed_callback = failed
+        self.name = name
+        self._pending = []
+        self._submitted = 0
+        self._written = 0
+        self._failures = []
+        self._marks = Counter()
+        self._wakeup = None
+        self._done = None
+        self._task = None
+        self.batches = 0
+
+    def start(self):
+        """Start the writer task on the running event loop."""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._done = asyncio.Condition()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def mark(self):
+        """Return the number of items submitted so far, to pass to flush.
+
+        Every mark must be passed to flush once, which releases it.
+        """
+        self._marks[self._submitted] += 1
+        return self._submitted
+
+    @property
+    def queued(self):
+        """Items submitted but not yet handed to a write."""
+        return list(self._pending)
+
+    def submit(self, *items):
+        """Queue items for the next batch. Must be called on the writer's event loop.
+        Args:
+            items: The items to write
+        """
+        if self._task is None:
+            result = self._write(list(items))
+            if self._written_callback:
+                self._written_callback(items, result)
+            return
+        self._pending.extend(items)
+        self._submitted += len(items)
+        self._wakeup.set()
+
+    async def flush(self, since=None):
+        """Wait until every item submitted so far has been written.
+        Args:
+            since (int): Value of mark(); failed writes of items submitted after it are raised.
+                Without it the failed writes no flush has raised yet are.
+        Raises:
+            Exception: The error of a failed write covering items submitted after since
+        """
+        target = self._submitted
+        try:
+            if self._task is not None:
+                async with self._done:
+                    await self._done.wait_for(lambda: self._written >= target)
+            failed = [failure for failure in self._failures if failure[0] < target and
+                      (failure[1] > since if since is not None else not failure[3])]
+            for failure in failed:
+                failure[3] = True
+        finally:
+            if since is not None:
+                self._marks[since] -= 1
+                if not self._marks[since]:
+                    del self._marks[since]
+            oldest = min(self._marks, default=None)
+            self._failures = [failure for failure in self._failures
+                              if not failure[3] or (oldest is not None and failure[1] > oldest)]
+        if failed:
+            raise failed[0][2]
+
+    async def close(self):
+        """Write everything still queued and stop the writer task."""
+        if self._task is None:
+            return
+        try:
+            await self.flush()
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            items, self._pending = self._pending, []
+            if not items:
+                continue
+            start, end = self._written, self._written + len(items)
+            try:
+                result = await asyncio.to_thread(self._write, items)
+            except Exception as e:
+                logger.error("%s failed to write %s items: %s", self.name, len(items), e)
+                # start, end, error and whether a flush has raised it
+                self._failures.append([start, end, e, False])
+                if self._failed_callback:
+                    try:
+                        await asyncio.to_thread(self._failed_callback, items, e)
+                    except Exception as error:
+                        logger.error("%s failed to recover from a failed write: %s", self.name, error)
+            else:
+                self.batches += 1
+                if self._written_callback:
+                    self._written_callback(items, result)
+            async with self._done:
+                self._written = end
+                self._done.notify_all()
@@ -0,0 +1,253 @@
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; a second writer is not detected there
+    fcntl = None
+
+from utils.logger import get_logger
+from utils.metrics import registry as metrics
+
+logger = get_logger(__name__)
+
+
+class BalanceFile:
+    """Memory-mapped file of fixed-width account balance records.
+
+    Every account stored by a CustomerRepository with a balance file gets a
+    slot here holding its type code, balance and limit (minimum balance for
+    savings, transaction limit for checking). The customer document keeps
+    only the slot number, so a balance change is an in-place write of one
+    record instead of a new copy of the customer.
+
+    Each record carries a CRC-32 of its fields in what used to be padding,
+    checked by ``read``. Records written before checksums were added hold 0
+    there and are read unchecked.
+
+    A slot whose type code is 0 is free. Slots are handed out from a free
+    list and past the end of the used records, and the file doubles in size
+    when it is full. Slots are only freed by ``reclaim``, which the owning
+    repository runs on open against the slots its documents still reference,
+    so a slot that a not yet written journal entry points to is never reused.
+
+    The allocator state lives in this object only, so a file may be open for
+    writing once at a time: a writable open takes an exclusive lock on it and
+    fails while another one, in this process or any other, holds it.
+    Read-only opens take no lock; ``refresh`` maps the records the writer
+    has added since.
+    """
+    MAGIC = b'BALF'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHQ')
+    RECORD = struct.Struct('<b3xIqq')
+    # Fields covered by the record checksum
+    CHECKED = struct.Struct('<bqq')
+    INITIAL_SLOTS = 1024
+
+    def __init__(self, path="data/balances.bin", sync=False, read_only=False):
+        """Open or create a balance file.
+        Args:
+            path (str): File holding the records
+            sync (bool): Flush every balance update to disk before returning
+            read_only (bool): Map the file for reading only, e.g. in a scan worker process
+        Raises:
+            ValueError: If the file is not a balance file of this version, or is already open for writing.
+        """
+        self.path = Path(path)
+        self.sync = sync
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._free = []
+        if not read_only:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if not self.path.exists():
+                with open(self.path, 'wb') as f:
+                    f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.RECORD.size, 0))
+                    f.truncate(self.HEADER.size + self.INITIAL_SLOTS * self.RECORD.size)
+        self._file = open(self.path, 'rb' if read_only else 'r+b')
+        if not read_only and fcntl is not None:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._file.close()
+                logger.error("Balance file %s is already open for writing", self.path)
+                raise ValueError(f"Balance file {self.path} is already open for writing")
+        self._map = None
+        self._remap()
+
+        magic, version, record_size, _ = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC or version != self.VERSION or record_size != self.RECORD.size:
+            self.close()
+            logger.error("%s is not a version %s balance file", self.path, self.VERSION)
+            raise ValueError(f"{self.path} is not a version {self.VERSION} balance file")
+        self._end = self._used_end()
+
+    def __len__(self):
+        """Return the number of slots the file has room for."""
+        return (len(self._map) - self.HEADER.size) // self.RECORD.size
+
+    def allocate(self, type_code, balance, limit):
+        """Store a new record in a free slot.
+        Args:
+            type_code (int): Account type code, see AccountColumns
+            balance (int): Balance
+            limit (int): Minimum balance or transaction limit
+        Returns:
+            int: The slot of the record
+        """
+        with self._lock:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                if self._end == len(self):
+                    self._grow()
+                slot = self._end
+                self._end += 1
+            self._write(slot, type_code, balance, limit)
+        return slot
+
+    def write(self, slot, type_code, balance, limit):
+        """Overwrite the record of a slot.
+        Args:
+            slot (int): The slot to write
+            type_code (int): Account type code
+            balance (int): Balance
+            limit (int): Minimum balance or transaction limit
+        """
+        with self._lock:
+            self._write(slot, type_code, balance, limit)
+
+    def read(self, slot):
+        """Read the record of a slot.
+        Args:
+            slot (int): The slot to read
+        Returns:
+            tuple: (type code, balance, limit)
+        Raises:
+            ValueError: If the slot is out of range or free, or its checksum does not match.
+        """
+        with self._lock:
+            if not 0 <= slot < self._end:
+                logger.error("Balance slot %s is out of range in %s", slot, self.path)
+                raise ValueError(f"Balance slot {slot} is out of range")
+            type_code, checksum, balance, limit = self.RECORD.unpack_from(self._map, self._offset(slot))
+        if type_code == 0:
+            logger.error("Balance slot %s is free in %s", slot, self.path)
+            raise ValueError(f"Balance slot {slot} is free")
+        if checksum and checksum != self._checksum(type_code, balance, limit):
+            metrics.increment('balance_file.checksum_mismatches')
+            logger.error("Balance slot %s in %s fails its checksum", slot, self.path)
+            raise ValueError(f"Balance slot {slot} fails its checksum")
+        return type_code, balance, limit
+
+    def balances(self):
+        """Read the balance of every slot up to the last one in use.
+        Returns:
+            list: Balance by slot, 0 for free slots
+        """
+        with self._lock:
+            records = self._map[self.HEADER.size:self._offset(self._end)]
+        return [record[2] for record in self.RECORD.iter_unpack(records)]
+
+    def set_balance(self, slot, balance):
+        """Update the balance of a slot in place.
+        Args:
+            slot (int): The slot to update
+            balance (int): New balance
+        """
+        with self._lock:
+            type_code, _, _, limit = self.RECORD.unpack_from(self._map, self._offset(slot))
+            self._write(slot, type_code, balance, limit)
+
+    def reclaim(self, referenced):
+        """Free every slot that is not referenced any more.
+        Args:
+            referenced (set): Slots still referenced by stored customers
+        Returns:
+            int: Number of slots freed
+        """
+        freed = 0
+        with self._lock:
+            self._free = []
+            for slot in range(self._end):
+                if slot in referenced:
+                    continue
+                offset = self._offset(slot)
+                if self._map[offset] != 0:
+                    self._map[offset:offset + self.RECORD.size] = bytes(self.RECORD.size)
+                    freed += 1
+                self._free.append(slot)
+            self._free.reverse()
+        if freed:
+            logger.info("Reclaimed %s unreferenced balance slots in %s", freed, self.path)
+        return freed
+
+    def refresh(self):
+        """Pick up the records another process added since the file was opened read-only.
+
+        A writable file is the only writer of its records, so there is nothing to pick up.
+        """
+        with self._lock:
+            if not self.read_only:
+                return
+            if os.fstat(self._file.fileno()).st_size != len(self._map):
+                self._remap()
+            self._end = self._used_end()
+
+    def flush(self):
+        """Write every changed record to disk."""
+        with self._lock:
+            if not self.read_only:
+                self._map.flush()
+
+    def close(self):
+        """Unmap and close the file, releasing the write lock."""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+    def _offset(self, slot):
+        return self.HEADER.size + slot * self.RECORD.size
+
+    def _checksum(self, type_code, balance, limit):
+        return zlib.crc32(self.CHECKED.pack(type_code, balance, limit))
+
+    def _write(self, slot, type_code, balance, limit):
+        offset = self._offset(slot)
+        self.RECORD.pack_into(self._map, offset, type_code, self._checksum(type_code, balance, limit), balance, limit)
+        if self.sync:
+            self._flush_range(offset, self.RECORD.size)
+        metrics.increment('balance_file.bytes_written', self.RECORD.size)
+
+    def _flush_range(self, offset, size):
+        """Flush the pages holding a byte range; mmap.flush needs a page-aligned offset."""
+        start = offset - offset % mmap.PAGESIZE
+        self._map.flush(start, offset + size - start)
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+        access = mmap.ACCESS_READ if self.read_only else mmap.ACCESS_WRITE
+        self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+
+    def _grow(self):
+        """Double the number of slots."""
+        size = self._offset(2 * len(self))
+        self._map.flush()
+        os.ftruncate(self._file.fileno(), size)
+        self._remap()
+        logger.info("Grew balance file %s to %s slots", self.path, len(self))
+
+    def _used_end(self):
+        """Return the slot after the last record in use."""
+        for slot in range(len(self) - 1, -1, -1):
+            if self._map[self._offset(slot)] != 0:
+                return slot + 1
+        return 0
@@ -0,0 +1,527 @@
+"""Compact binary encoding of customer records in the Customer.to_dict format.
+
+A file is the magic bytes and a format version followed by blocks of up to
+``BLOCK_SIZE`` customers, each prefixed with its length as a varint, so a
+reader can stream a file one block at a time.
+
+Inside a block records are stored by column. Records with the same keys form
+a group, and each key of a group is one column:
+    text         NUL-separated UTF-8, split back with a single str.split
+    integers     packed little-endian array of the narrowest fitting width
+    unsigned     the same with unsigned widths, e.g. 32-bit checksums
+    names        employee names interned once per block, stored as codes
+    enums        account and service types as one-byte codes
+    flags        one byte per value
+    lists        per-record counts plus a nested group table of the items
+Fields are numbered by their position in the schema, so new fields are only
+ever appended and files of an older version read back unchanged. Version 2
+added the record ``checksum``.
+
+A customer that does not fit the schema (an unknown key, a value of an
+unexpected type) is kept as JSON text, so every record round-trips exactly.
+
+Convert an existing JSON book with:
+    python -m repositories.customer_codec to-binary data/customers.json data/customers.bin
+    python -m repositories.customer_codec to-json data/customers.bin data/customers.json
+"""
+import gc
+import json
+import os
+import sys
+from array import array
+from contextlib import contextmanager
+from itertools import accumulate
+
+from utils.logger import get_logger
+from models.BankAccount import BankAccount as Account
+from models.Service import Service
+
+logger = get_logger(__name__)
+
+MAGIC = b'BANKCUST'
+VERSION = 2
+BLOCK_SIZE = 16384
+_INT_TYPECODES = ('b', 'h', 'i', 'q')
+_UINT_TYPECODES = ('B', 'H', 'I', 'Q')
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_ints(out, values):
+    """Write integers as a packed array of the narrowest signed width that holds them all."""
+    low, high = (min(values), max(values)) if values else (0, 0)
+    typecode = next(code for code in _INT_TYPECODES
+                    if -(1 << (8 * array(code).itemsize - 1)) <= low and high < 1 << (8 * array(code).itemsize - 1))
+    packed = array(typecode, values)
+    if _BIG_ENDIAN:
+        packed.byteswap()
+    out.append(ord(typecode))
+    out += packed.tobytes()
+
+
+def _write_uints(out, values):
+    """Write non-negative integers as a packed array of the narrowest unsigned width that holds them all."""
+    high = max(values) if values else 0
+    typecode = next(code for code in _UINT_TYPECODES if high < 1 << (8 * array(code).itemsize))
+    packed = array(typecode, values)
+    if _BIG_ENDIAN:
+        packed.byteswap()
+    out.append(ord(typecode))
+    out += packed.tobytes()
+
+
+def _read_ints(buf, pos, count):
+    packed = array(chr(buf[pos]))
+    end = pos + 1 + count * packed.itemsize
+    packed.frombytes(buf[pos + 1:end])
+    if _BIG_ENDIAN:
+        packed.byteswap()
+    return packed.tolist(), end
+
+
+def _write_text(out, values):
+    data = '\0'.join(values).encode('utf-8')
+    _write_varint(out, len(data))
+    out += data
+
+
+def _read_text(buf, pos, count):
+    size, pos = _read_varint(buf, pos)
+    end = pos + size
+    return (str(buf[pos:end], 'utf-8').split('\0') if count else []), end
+
+
+class _Text:
+    def fits(self, value):
+        return type(value) is str and '\0' not in value
+
+    def write(self, out, values, names):
+        _write_text(out, values)
+
+    def read(self, buf, pos, count, names):
+        return _read_text(buf, pos, count)
+
+
+class _Integer:
+    def fits(self, value):
+        return type(value) is int and -(1 << 63) <= value < 1 << 63
+
+    def write(self, out, values, names):
+        _write_ints(out, values)
+
+    def read(self, buf, pos, count, names):
+        return _read_ints(buf, pos, count)
+
+
+class _Unsigned:
+    def fits(self, value):
+        return type(value) is int and 0 <= value < 1 << 64
+
+    def write(self, out, values, names):
+        _write_uints(out, values)
+
+    def read(self, buf, pos, count, names):
+        return _read_ints(buf, pos, count)
+
+
+class _Name:
+    """Employee name, or None, interned in the block's name table."""
+
+    def fits(self, value):
+        return value is None or (type(value) is str and '\0' not in value)
+
+    def write(self, out, values, names):
+        _write_ints(out, [0 if value is None else names.setdefault(value, len(names) + 1) for value in values])
+
+    def read(self, buf, pos, count, names):
+        codes, pos = _read_ints(buf, pos, count)
+        return list(map(names.__getitem__, codes)), pos
+
+
+class _Flag:
+    def fits(self, value):
+        return type(value) is bool
+
+    def write(self, out, values, names):
+        out += bytes(values)
+
+    def read(self, buf, pos, count, names):
+        return list(map(bool, buf[pos:pos + count])), pos + count
+
+
+class _Enum:
+    def __init__(self, values):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def fits(self, value):
+        return value in self.codes
+
+    def write(self, out, values, names):
+        out += bytes(map(self.codes.__getitem__, values))
+
+    def read(self, buf, pos, count, names):
+        return list(map(self.values.__getitem__, buf[pos:pos + count])), pos + count
+
+
+class _List:
+    """List of nested records, e.g. the accounts of a customer."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def fits(self, value):
+        return type(value) is list and all(self.table.fits(item) for item in value)
+
+    def write(self, out, values, names):
+        _write_ints(out, [len(value) for value in values])
+        self.table.write(out, [item for value in values for item in value], names)
+
+    def read(self, buf, pos, count, names):
+        counts, pos = _read_ints(buf, pos, count)
+        items, pos = self.table.read(buf, pos, names)
+        if counts and min(counts) == max(counts):
+            # Every record holds as many items, e.g. one savings and one checking account
+            return (list(map(list, zip(*[iter(items)] * counts[0]))) if counts[0] else [[] for _ in counts]), pos
+        ends = list(accumulate(counts))
+        return list(map(items.__getitem__, map(slice, [0] + ends[:-1], ends))), pos
+
+
+class _Table:
+    """Column layout of a list of records sharing a schema.
+
+    Layout: number of groups, then for each group its keys (as schema field
+    numbers), its record count and one column per key, then the number of
+    records kept as JSON and their text, then, if there is more than one
+    group, the group of every record in order.
+    """
+
+    def __init__(self, fields, raw=False):
+        self.fields = list(fields)
+        self.kinds = dict(fields)
+        self.numbers = {name: number for number, (name, _) in enumerate(self.fields)}
+        self.raw = raw
+        self._builders = {}
+
+    def fits(self, record):
+        return type(record) is dict and all(
+            key in self.kinds and self.kinds[key].fits(value) for key, value in record.items())
+
+    def write(self, out, records, names):
+        shapes = {}
+        groups = []
+        raw = []
+        order = []
+        for record in records:
+            if self.raw and not self.fits(record):
+                raw.append(json.dumps(record, separators=(',', ':')))
+                order.append(-1)
+                continue
+            keys = tuple(record)
+            number = shapes.get(keys)
+            if number is None:
+                number = shapes[keys] = len(groups)
+                groups.append([])
+            groups[number].append(record)
+            order.append(number)
+
+        _write_varint(out, len(groups))
+        for keys, group in zip(shapes, groups):
+            _write_varint(out, len(keys))
+            for key in keys:
+                _write_varint(out, self.numbers[key])
+            _write_varint(out, len(group))
+            for key in keys:
+                self.kinds[key].write(out, [record[key] for record in group], names)
+        _write_varint(out, len(raw))
+        if raw:
+            _write_text(out, raw)
+        if len(groups) + bool(raw) > 1:
+            _write_ints(out, [len(groups) if number < 0 else number for number in order])
+
+    def read(self, buf, pos, names):
+        group_count, pos = _read_varint(buf, pos)
+        groups = []
+        for _ in range(group_count):
+            key_count, pos = _read_varint(buf, pos)
+            keys = []
+            for _ in range(key_count):
+                number, pos = _read_varint(buf, pos)
+                keys.append(self.fields[number][0])
+            count, pos = _read_varint(buf, pos)
+            columns = []
+            for key in keys:
+                values, pos = self.kinds[key].read(buf, pos, count, names)
+                columns.append(values)
+            groups.append(self._builder(tuple(keys))(columns) if keys else [{} for _ in range(count)])
+        raw_count, pos = _read_varint(buf, pos)
+        if raw_count:
+            texts, pos = _read_text(buf, pos, raw_count)
+            groups.append(list(map(json.loads, texts)))
+        if len(groups) == 1:
+            return groups[0], pos
+        if not groups:
+            return [], pos
+        order, pos = _read_ints(buf, pos, sum(map(len, groups)))
+        iterators = [iter(group) for group in groups]
+        return list(map(next, map(iterators.__getitem__, order))), pos
+
+    def _builder(self, keys):
+        """Return a function building the records of a group from its columns.
+
+        A comprehension with literal keys builds dictionaries about twice as
+        fast as dict(zip(keys, row)), so one is compiled per key set. Keys
+        always come from the schema, never from the file.
+        """
+        builder = self._builders.get(keys)
+        if builder is None:
+            variables = [f"v{number}" for number in range(len(keys))]
+            items = ", ".join(f"{key!r}: {variable}" for key, variable in zip(keys, variables))
+            builder = self._builders[keys] = eval(
+                f"lambda columns: [{{{items}}} for {', '.join(variables)}, in zip(*columns)]")
+        return builder
+
+
+_ACCOUNTS = _Table([
+    ('id', _Text()),
+    ('type', _Enum(account_type.value for account_type in Account.Type)),
+    ('balance', _Integer()),
+    ('created_by', _Name()),
+    ('minimum_balance', _Integer()),
+    ('transaction_limit', _Integer()),
+    ('slot', _Integer()),
+])
+_SERVICES = _Table([
+    ('type', _Enum(service_type.value for service_type in Service.Type)),
+    ('is_active', _Flag()),
+    ('approved_by', _Name()),
+])
+_CUSTOMERS = _Table([
+    ('id', _Text()),
+    ('first_name', _Text()),
+    ('last_name', _Text()),
+    ('age', _Integer()),
+    ('address', _Text()),
+    ('phone_number', _Text()),
+    ('version', _Integer()),
+    ('accounts', _List(_ACCOUNTS)),
+    ('services', _List(_SERVICES)),
+    ('created_by', _Name()),
+    ('checksum', _Unsigned()),
+], raw=True)
+
+
+@contextmanager
+def collection_paused():
+    """Pause the cyclic garbage collector.
+
+    Decoding allocates only acyclic dicts and lists, so the collection passes
+    their sheer number would trigger cannot free anything.
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def encode_block(records):
+    """Encode customer records as one block body.
+    Args:
+        records (list): Customer dictionaries in the Customer.to_dict format
+    Returns:
+        bytes: The block body
+    """
+    names = {}
+    table = bytearray()
+    _CUSTOMERS.write(table, records, names)
+    out = bytearray()
+    _write_varint(out, len(names))
+    _write_text(out, list(names))
+    return bytes(out + table)
+
+
+def decode_block(buf):
+    """Decode one block body.
+    Args:
+        buf (bytes): The block body
+    Returns:
+        list: Customer dictionaries
+    """
+    buf = memoryview(buf)
+    count, pos = _read_varint(buf, 0)
+    names, pos = _read_text(buf, pos, count)
+    records, _ = _CUSTOMERS.read(buf, pos, [None] + names)
+    return records
+
+
+def write_records(f, records, block_size=BLOCK_SIZE):
+    """Write customer records to a binary file object.
+    Args:
+        f: File opened for binary writing
+        records (iterable): Customer dictionaries in the Customer.to_dict format
+        block_size (int): Customers per block
+    Returns:
+        int: Number of bytes written
+    """
+    written = f.write(MAGIC + bytes([VERSION]))
+    block = []
+    for record in records:
+        block.append(record)
+        if len(block) == block_size:
+            written += _write_block(f, block)
+            block = []
+    if block:
+        written += _write_block(f, block)
+    return written
+
+
+def _write_block(f, records):
+    body = encode_block(records)
+    header = bytearray()
+    _write_varint(header, len(body))
+    return f.write(header) + f.write(body)
+
+
+def is_binary(f):
+    """Check whether a binary file object starts with the codec's magic bytes, leaving it at the start."""
+    start = f.read(len(MAGIC))
+    f.seek(0)
+    return start == MAGIC
+
+
+def iter_records(f):
+    """Decode customer records from a binary file object one block at a time.
+    Args:
+        f: File opened for binary reading, positioned at the start
+    Yields:
+        dict: The next customer record
+    Raises:
+        ValueError: If the file is not in this format or was written by a newer version.
+    """
+    for records in iter_blocks(f):
+        yield from records
+
+
+def iter_blocks(f):
+    """Decode the blocks of a binary file object.
+    Args:
+        f: File opened for binary reading, positioned at the start
+    Yields:
+        list: The customer records of the next block
+    Raises:
+        ValueError: If the file is not in this format or was written by a newer version.
+    """
+    header = f.read(len(MAGIC) + 1)
+    if header[:len(MAGIC)] != MAGIC:
+        logger.error("Not a binary customer file: %s", getattr(f, 'name', f))
+        raise ValueError("Not a binary customer file")
+    if header[-1] > VERSION:
+        logger.error("Binary customer file version %s is newer than %s", header[-1], VERSION)
+        raise ValueError(f"Unsupported binary customer file version {header[-1]}")
+    while True:
+        size = shift = 0
+        while True:
+            byte = f.read(1)
+            if not byte:
+                if shift:
+                    logger.error("Truncated block header in binary customer file %s", getattr(f, 'name', f))
+                    raise ValueError("Truncated binary customer file")
+                return
+            size |= (byte[0] & 0x7f) << shift
+            shift += 7
+            if byte[0] < 0x80:
+                break
+        body = f.read(size)
+        if len(body) != size:
+            logger.error("Truncated block in binary customer file %s", getattr(f, 'name', f))
+            raise ValueError("Truncated binary customer file")
+        with collection_paused():
+            records = decode_block(body)
+        yield records
+
+
+def dump(records, path, block_size=BLOCK_SIZE):
+    """Write customer records to a binary file, replacing it atomically.
+    Returns:
+        int: Number of bytes written
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        written = write_records(f, records, block_size)
+    os.replace(tmp_path, path)
+    return written
+
+
+def read_records(f):
+    """Read every customer record of a binary file object.
+    Returns:
+        list: Customer dictionaries
+    """
+    records = []
+    with collection_paused():
+        for block in iter_blocks(f):
+            records.extend(block)
+    return records
+
+
+def load(path):
+    """Read every customer record of a binary file.
+    Returns:
+        list: Customer dictionaries
+    """
+    with open(path, 'rb') as f:
+        return read_records(f)
+
+
+def json_to_binary(json_path, binary_path):
+    """Convert a JSON customer file to the binary format.
+    Returns:
+        int: Number of customers converted
+    """
+    with open(json_path, 'r') as f:
+        records = json.load(f)
+    dump(records, binary_path)
+    logger.info("Converted %s customers from %s to %s", len(records), json_path, binary_path)
+    return len(records)
+
+
+def binary_to_json(binary_path, json_path, indent=4):
+    """Convert a binary customer file back to JSON.
+    Returns:
+        int: Number of customers converted
+    """
+    records = load(binary_path)
+    tmp_path = f"{json_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(records, f, indent=indent)
+    os.replace(tmp_path, json_path)
+    logger.info("Converted %s customers from %s to %s", len(records), binary_path, json_path)
+    return len(records)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ('to-binary', 'to-json'):
+        print("Usage: python -m repositories.customer_codec to-binary|to-json SOURCE TARGET")
+        sys.exit(2)
+    convert = json_to_binary if sys.argv[1] == 'to-binary' else binary_to_json
+    print(f"Converted {convert(sys.argv[2], sys.argv[3])} customers.")
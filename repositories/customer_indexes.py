@@ -0,0 +1,245 @@
+from bisect import bisect_left, bisect_right, insort
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Sorts after every customer id, to bound (key, id) ranges in the sorted indexes
+_LAST = '\U0010ffff'
+
+
+class CustomerIndexes:
+    """Secondary indexes over the customer records of a repository.
+
+    Phone numbers and creating employees are hash indexes mapping each value
+    to the id of the customer holding it, or to a set of ids once several
+    customers share it; phone numbers are nearly unique, so this saves a set
+    per customer. Last names (case-folded) and ages
+    are kept as sorted lists of ``(key, id)`` pairs, so exact and prefix
+    last-name lookups and age ranges are answered with bisect. The indexed
+    values of every customer are remembered so that ``put`` and ``remove``
+    only touch the entries of that customer.
+
+    Records whose age is not a number are left out of the age index.
+
+    ``put`` inserts into the sorted lists with insort, which moves every
+    later entry. Batches of writes go through ``put_many``, which appends the
+    new entries and sorts each list once, so bulk adds stay linear.
+    """
+    # Batches with more sorted-index entries than this are appended and sorted instead of inserted one by one
+    SORT_THRESHOLD = 64
+
+    def __init__(self):
+        self._phone_numbers = {}
+        self._creators = {}
+        self._last_names = []
+        self._ages = []
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build the indexes of many customer records at once.
+        Args:
+            records (iterable): Customer dictionaries with an 'id'
+        Returns:
+            CustomerIndexes: The filled indexes
+        """
+        indexes = cls()
+        keys_of = cls._keys_of
+        indexes._keys = {record['id']: keys_of(record) for record in records}
+        for index, position in ((indexes._phone_numbers, 0), (indexes._creators, 1)):
+            for id, keys in indexes._keys.items():
+                key = keys[position]
+                ids = index.get(key)
+                if ids is None:
+                    index[key] = id
+                elif type(ids) is set:
+                    ids.add(id)
+                else:
+                    index[key] = {ids, id}
+        indexes._last_names = sorted((keys[2], id) for id, keys in indexes._keys.items())
+        indexes._ages = sorted((keys[3], id) for id, keys in indexes._keys.items() if keys[3] is not None)
+        return indexes
+
+    def copy(self):
+        """Copy the indexes so that later puts and removes leave the copy unchanged.
+        Returns:
+            CustomerIndexes: Independent copy
+        """
+        indexes = CustomerIndexes()
+        indexes._phone_numbers = {key: set(ids) if type(ids) is set else ids
+                                  for key, ids in self._phone_numbers.items()}
+        indexes._creators = {key: set(ids) if type(ids) is set else ids for key, ids in self._creators.items()}
+        indexes._last_names = list(self._last_names)
+        indexes._ages = list(self._ages)
+        indexes._keys = dict(self._keys)
+        return indexes
+
+    def put(self, customer_id, record):
+        """Index a new customer record or re-index a changed one.
+        Args:
+            customer_id (str): The id of the customer
+            record (dict): Customer data
+        """
+        keys = self._keys_of(record)
+        old_keys = self._keys.get(customer_id)
+        if keys == old_keys:
+            return
+        if old_keys is not None:
+            self._discard(customer_id, old_keys)
+        self._keys[customer_id] = keys
+        self._add_hashed(customer_id, keys)
+        insort(self._last_names, (keys[2], customer_id))
+        if keys[3] is not None:
+            insort(self._ages, (keys[3], customer_id))
+
+    def put_many(self, items):
+        """Index several new or changed customer records at once.
+        Args:
+            items (iterable): (customer id, record) pairs; for an id given twice the last record counts
+        """
+        last_names = []
+        ages = []
+        for customer_id, record in dict(items).items():
+            keys = self._keys_of(record)
+            old_keys = self._keys.get(customer_id)
+            if keys == old_keys:
+                continue
+            if old_keys is not None:
+                self._discard(customer_id, old_keys)
+            self._keys[customer_id] = keys
+            self._add_hashed(customer_id, keys)
+            last_names.append((keys[2], customer_id))
+            if keys[3] is not None:
+                ages.append((keys[3], customer_id))
+        for entries, new_entries in ((self._last_names, last_names), (self._ages, ages)):
+            if len(new_entries) > self.SORT_THRESHOLD:
+                entries.extend(new_entries)
+                entries.sort()
+            else:
+                for entry in new_entries:
+                    insort(entries, entry)
+
+    def remove(self, customer_id):
+        """Drop a customer from the indexes.
+        Args:
+            customer_id (str): The id of the customer
+        """
+        keys = self._keys.pop(customer_id, None)
+        if keys is not None:
+            self._discard(customer_id, keys)
+
+    def search(self, phone_number=None, last_name=None, last_name_prefix=None, created_by=None,
+               min_age=None, max_age=None):
+        """Find the ids of the customers matching every given criterion.
+
+        The candidates come from one index, a hash index if any hashed
+        criterion is given, and are then checked against the remaining
+        criteria using their indexed values.
+        Args:
+            phone_number (str): Exact phone number
+            last_name (str): Last name, ignoring case
+            last_name_prefix (str): Start of the last name, ignoring case
+            created_by (str): Full name of the employee who created the customer
+            min_age (int): Lowest age, inclusive
+            max_age (int): Highest age, inclusive
+        Returns:
+            set: Ids of the matching customers
+        Raises:
+            ValueError: If no criterion is given or an age bound is not a number.
+        """
+        if phone_number is None and last_name is None and last_name_prefix is None and created_by is None \
+                and min_age is None and max_age is None:
+            logger.error("Customer search needs at least one criterion")
+            raise ValueError("Customer search needs at least one criterion")
+        try:
+            min_age = None if min_age is None else int(min_age)
+            max_age = None if max_age is None else int(max_age)
+        except (TypeError, ValueError):
+            logger.error("Age bounds must be valid numbers")
+            raise ValueError("Age bounds must be valid numbers")
+        last_name = None if last_name is None else last_name.casefold()
+        last_name_prefix = None if last_name_prefix is None else last_name_prefix.casefold()
+
+        hashed = []
+        if phone_number is not None:
+            hashed.append(self._hashed_ids(self._phone_numbers, phone_number))
+        if created_by is not None:
+            hashed.append(self._hashed_ids(self._creators, created_by))
+        if hashed:
+            ids = set.intersection(*sorted(hashed, key=len))
+        elif last_name is not None:
+            ids = self._range(self._last_names, (last_name,), (last_name, _LAST))
+        elif last_name_prefix is not None:
+            ids = self._range(self._last_names, (last_name_prefix,), (last_name_prefix + _LAST,))
+        else:
+            ids = self._range(self._ages, None if min_age is None else (min_age,),
+                              None if max_age is None else (max_age, _LAST))
+        return {id for id in ids if self._matches(self._keys[id], last_name, last_name_prefix, min_age, max_age)}
+
+    @staticmethod
+    def _range(entries, low, high):
+        """Return the ids of the (key, id) entries between low and high, either of which may be None."""
+        start = 0 if low is None else bisect_left(entries, low)
+        end = len(entries) if high is None else bisect_right(entries, high)
+        return {id for _, id in entries[start:end]}
+
+    @staticmethod
+    def _matches(keys, last_name, last_name_prefix, min_age, max_age):
+        """Check the indexed values of one customer against the sorted-index criteria."""
+        if last_name is not None and keys[2] != last_name:
+            return False
+        if last_name_prefix is not None and not keys[2].startswith(last_name_prefix):
+            return False
+        if min_age is not None and (keys[3] is None or keys[3] < min_age):
+            return False
+        if max_age is not None and (keys[3] is None or keys[3] > max_age):
+            return False
+        return True
+
+    @staticmethod
+    def _keys_of(record):
+        """Return the indexed values of a record: (phone number, creator, folded last name, age)."""
+        try:
+            age = int(record.get('age'))
+        except (TypeError, ValueError):
+            age = None
+        return (record.get('phone_number'), record.get('created_by'), str(record.get('last_name') or '').casefold(),
+                age)
+
+    @staticmethod
+    def _hashed_ids(index, key):
+        """Return the set of ids a hash index holds for a value."""
+        ids = index.get(key)
+        if ids is None:
+            return set()
+        return ids if type(ids) is set else {ids}
+
+    def _add_hashed(self, customer_id, keys):
+        for index, key in ((self._phone_numbers, keys[0]), (self._creators, keys[1])):
+            ids = index.get(key)
+            if ids is None:
+                index[key] = customer_id
+            elif type(ids) is set:
+                ids.add(customer_id)
+            else:
+                index[key] = {ids, customer_id}
+
+    def _discard(self, customer_id, keys):
+        for index, key in ((self._phone_numbers, keys[0]), (self._creators, keys[1])):
+            ids = index.get(key)
+            if ids == customer_id:
+                del index[key]
+            elif type(ids) is set:
+                ids.discard(customer_id)
+                if len(ids) == 1:
+                    index[key] = ids.pop()
+        for entries, key in ((self._last_names, keys[2]), (self._ages, keys[3])):
+            if key is None:
+                continue
+            position = bisect_left(entries, (key, customer_id))
+            if position < len(entries) and entries[position] == (key, customer_id):
+                del entries[position]
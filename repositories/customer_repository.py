@@ -1,111 +1,1139 @@
+import hashlib
 import json
+import os
+import pickle
+import threading
+import time
+import zlib
+from array import array
+from contextlib import contextmanager
+from itertools import repeat
 from pathlib import Path
-from utils.logger import logger
+from utils.logger import get_logger
+from utils.metrics import registry as metrics, timed
 from models.Customer import Customer
+from repositories.account_columns import AccountColumns
+from repositories.balance_file import BalanceFile
+from repositories.customer_indexes import CustomerIndexes
+from repositories import customer_codec
+from utils.Constants import MINIMUM_BALANCE, TRANSACTION_LIMIT
+
+logger = get_logger(__name__)
 
 class CustomerRepository:
-    def __init__(self, file_path="data/customers.json"):
+    """Customer storage made of a JSON snapshot plus an append-only journal.
+
+    Mutations append one line per customer to the journal instead of rewriting
+    the snapshot, so a write costs the same however many customers are stored.
+    Once the journal grows past ``compact_threshold`` entries it is folded into
+    the snapshot by a background thread.
+
+    All records are kept resident in an ``id -> record`` index that is built
+    once and updated on every mutation, so lookups never touch the disk. With
+    ``identity_map`` enabled the hydrated Customer objects are cached as well;
+    every caller then gets the same object, so callers on several threads must
+    serialize all access to it, reads included, and a mutation that fails
+    half way stays visible.
+    Every account is also mirrored in ``account_columns`` for portfolio-wide
+    aggregates, and ``customer_indexes`` keeps secondary indexes on phone
+    number, creating employee, last name and age for ``search_customers``.
+
+    With a ``balance_file`` the type, balance and limit of every account live
+    in a memory-mapped BalanceFile and the stored documents keep only the
+    account's slot in it. ``update_balance`` then rewrites a balance in place
+    without a journal entry. Documents written before the balance file was
+    enabled keep their inline balances until the customer is next written.
+    The balance file in use is recorded in a ``.balance_file`` marker next to
+    the snapshot: a repository opened without one attaches the recorded file,
+    and one opened with a different file is refused, so slot-only documents
+    are never read without their balances. ``export_records`` returns the
+    documents with the balances filled back in, for copying a book elsewhere.
+
+    With ``binary_snapshot`` the snapshot is written in the compact format of
+    customer_codec instead of indented JSON. Either format is read back,
+    whichever the file holds.
+
+    With ``warm_start`` the parsed index is also pickled to a cache file next
+    to the snapshot, stamped with the size, modification time and hash of the
+    snapshot and the length and hash of the journal it includes. A later
+    start whose files still match loads the cache and replays only the
+    journal entries written since, instead of parsing the whole book. The
+    cache is rewritten after a cold start and after every compaction. How the
+    last start went is kept in ``startup``.
+
+    Records written from Customer objects carry a ``checksum`` of the fields
+    the model setters validate. A record whose checksum matches is hydrated
+    with ``Customer.from_dict(trusted=True)``, skipping that validation;
+    records without one, such as those stored by ``import_records``, and
+    records that fail it are validated in full. With ``verify`` every record
+    is validated in full, and ``audit`` checks the whole book at once.
+    """
+    # Account fields kept in the balance file instead of the customer document
+    BALANCE_FIELDS = ('type', 'balance', 'minimum_balance', 'transaction_limit')
+    # Layout version of the warm-start cache file
+    WARM_CACHE_FORMAT = 2
+
+    def __init__(self, file_path="data/customers.json", journal_path=None, compact_threshold=1000,
+                 identity_map=False, balance_file=None, binary_snapshot=False, warm_start=False, verify=False):
         self.file_path = Path(file_path)
+        self.journal_path = Path(journal_path) if journal_path else self.file_path.with_suffix('.journal')
+        self._compacting_path = self.journal_path.with_name(self.journal_path.name + '.compacting')
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._compaction_thread = None
+        self._journal_entries = 0
+        self._deferred_entries = None
+        self._deferred_depth = 0
+        self.identity_map = identity_map
+        self._identities = {}
+        self._signature = None
+        self.binary_snapshot = binary_snapshot
+        self.warm_start = warm_start
+        self.warm_cache_path = self.file_path.with_name(self.file_path.name + '.warm')
+        self.startup = None
+        self._warm_cache_lock = threading.Lock()
+        self.verify = verify
+        self.balance_file_marker_path = self.file_path.with_name(self.file_path.name + '.balance_file')
+
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self.balance_file = self._attach_balance_file(balance_file)
         if not self.file_path.exists():
             self._save_customers([])
+        self._build_index()
+        if self.balance_file is not None and not self.balance_file.read_only:
+            self.balance_file.reclaim({account['slot'] for customer in self._index.values()
+                                       for account in customer.get('accounts') or [] if 'slot' in account})
 
+    @timed("customer_repository.add_customer")
     def add_customer(self, new_customer, employee):
         """Add a new customer to local storage with employee tracking.
         Args:
             new_customer (Customer): The customer object to add
             employee (Employee): The employee who created the customer
+        Raises:
+            ValueError: If a customer with the same id already exists.
+        """
+        with self._lock:
+            if new_customer.id in self._index:
+                logger.error("Attempted to add an existing customer with ID: %s", new_customer.id)
+                raise ValueError(f"Customer with ID {new_customer.id} already exists")
+            customer_dict = new_customer.to_dict()
+            customer_dict['created_by'] = employee.full_name
+            balance_writes = []
+            stored = self._sealed(self._store_balances(customer_dict, balance_writes, new_customer), new_customer)
+            self._append_journal({'op': 'put', 'id': new_customer.id, 'customer': stored})
+            self._write_balances(balance_writes)
+            self._index[new_customer.id] = stored
+            self.account_columns.put(new_customer.id, customer_dict)
+            self.customer_indexes.put(new_customer.id, stored)
+            if self.identity_map:
+                self._identities[new_customer.id] = new_customer
+        logger.info("Customer %s added successfully.", new_customer.full_name)
+
+    @timed("customer_repository.add_customers")
+    def add_customers(self, new_customers, employee):
+        """Add several new customers with a single journal write.
+        Args:
+            new_customers (iterable): The customer objects to add
+            employee (Employee): The employee who created the customers
+        Returns:
+            list: Ids that were skipped because they already exist
+        """
+        duplicates = []
+        entries = []
+        with self._lock:
+            batch = {}
+            balance_writes = []
+            for new_customer in new_customers:
+                if new_customer.id in self._index or new_customer.id in batch:
+                    duplicates.append(new_customer.id)
+                    continue
+                customer_dict = new_customer.to_dict()
+                customer_dict['created_by'] = employee.full_name
+                stored = self._sealed(self._store_balances(customer_dict, balance_writes, new_customer), new_customer)
+                batch[new_customer.id] = (new_customer, customer_dict, stored)
+                entries.append({'op': 'put', 'id': new_customer.id, 'customer': stored})
+            if entries:
+                self._append_journal(*entries)
+            self._write_balances(balance_writes)
+            for id, (new_customer, customer_dict, stored) in batch.items():
+                self._index[id] = stored
+                self.account_columns.put(id, customer_dict)
+                if self.identity_map:
+                    self._identities[id] = new_customer
+            self.customer_indexes.put_many((id, stored) for id, (_, _, stored) in batch.items())
+        if duplicates:
+            logger.warning("Skipped %s customers with existing IDs.", len(duplicates))
+        logger.info("%s customers added successfully.", len(entries))
+        return duplicates
+
+    @timed("customer_repository.export_records")
+    def export_records(self):
+        """Return every stored customer dictionary with the account balances filled in.
+
+        Accounts lose their balance file slot, so the records can be imported
+        into another repository whatever its balance file.
+        Returns:
+            list: Customer data in the Customer.to_dict format
         """
-        customers = self._load_customers()
-        customer_dict = new_customer.to_dict()
-        customer_dict['created_by'] = employee.full_name
-        customers.append(customer_dict)
-        self._save_customers(customers)
-        logger.info(f"Customer {new_customer.full_name} added successfully.")
+        with self._lock:
+            records = [self._with_balances(record) for record in self._index.values()]
+        return [{**record, 'accounts': [{key: value for key, value in account.items() if key != 'slot'}
+                                        for account in record['accounts']]}
+                if record.get('accounts') else record for record in records]
 
+    @timed("customer_repository.import_records")
+    def import_records(self, records):
+        """Store customer dictionaries as they are with a single journal write.
+
+        The records are not validated by the model here, and any checksum
+        they carry is dropped: a CRC-32 only detects accidental damage, so
+        anyone can forge one for a record that never passed validation.
+        Imported customers are validated in full when first hydrated and
+        sealed again the next time they are written. Every record is checked
+        for the shape and numeric fields the indexes need before anything is
+        written, and one record failing the check rejects the whole batch.
+        Args:
+            records (iterable): Customer dictionaries in the Customer.to_dict format
+        Returns:
+            int: Number of customers imported
+        Raises:
+            ValueError: If a record is not a customer dictionary the repository can index.
+        """
+        records = [self._checked_import(record) for record in records]
+        with self._lock:
+            balance_writes = []
+            batch = {record['id']: self._imported(record, balance_writes) for record in records}
+            if batch:
+                self._append_journal(*({'op': 'put', 'id': id, 'customer': record} for id, record in batch.items()))
+            self._write_balances(balance_writes)
+            for id, record in batch.items():
+                self._index[id] = record
+                self.account_columns.put(id, self._with_balances(record))
+                self._identities.pop(id, None)
+            self.customer_indexes.put_many(batch.items())
+        logger.info("Imported %s customers into %s", len(batch), self.file_path)
+        return len(batch)
+
+    @timed("customer_repository.update_customer")
     def update_customer(self, customer_id, customer):
         """Update an existing customer
         Args:
             customer_id (str): The id of the customer to update
             customer (Customer): The updated customer object
         """
-        customers = self._load_customers()
-        for i, cust in enumerate(customers):
-            if cust['id'] == customer_id:
+        if not self._update([(customer_id, customer)]):
+            logger.info("Customer %s updated successfully.", customer.full_name)
+
+    @timed("customer_repository.update_customers")
+    def update_customers(self, customers):
+        """Update several existing customers with a single journal write.
+        Args:
+            customers (iterable): The updated customer objects
+        Returns:
+            list: Ids that were skipped because they do not exist
+        """
+        missing = self._update((customer.id, customer) for customer in customers)
+        logger.info("Customers updated successfully.")
+        return missing
+
+    def _update(self, updates):
+        """Journal and index updates of existing customers.
+        Args:
+            updates (iterable): (customer id, Customer) pairs
+        Returns:
+            list: Ids that were skipped because they do not exist
+        """
+        missing = []
+        with self._lock:
+            entries = []
+            updated = {}
+            balance_writes = []
+            for customer_id, customer in updates:
+                existing = self._index.get(customer_id)
+                if existing is None:
+                    missing.append(customer_id)
+                    continue
                 customer_dict = customer.to_dict()
-                customers[i] = customer_dict
-                self._save_customers(customers)
-                logger.info(f"Customer {customer.full_name} updated successfully.")
-                updated = True
-                break
-        if not updated:
-            logger.warning(f"Attempted to update non-existent customer with ID: {customer_id}")
+                if 'created_by' in existing:
+                    customer_dict['created_by'] = existing['created_by']
+                stored = self._sealed(self._store_balances(customer_dict, balance_writes, customer), customer)
+                entries.append({'op': 'put', 'id': customer_id, 'customer': stored})
+                updated[customer_id] = (customer, customer_dict, stored)
+            if entries:
+                self._append_journal(*entries)
+            self._write_balances(balance_writes)
+            for customer_id, (customer, customer_dict, stored) in updated.items():
+                self._index[customer_id] = stored
+                self.account_columns.put(customer_id, customer_dict)
+                if self.identity_map:
+                    self._identities[customer_id] = customer
+            self.customer_indexes.put_many((customer_id, stored) for customer_id, (_, _, stored) in updated.items())
+        for customer_id in missing:
+            logger.warning("Attempted to update non-existent customer with ID: %s", customer_id)
+        return missing
 
+    @timed("customer_repository.update_balance")
+    def update_balance(self, customer, account):
+        """Store the new balance of one account of a customer.
+
+        If the account has a slot in the balance file and its stored document
+        already holds its id, only its balance record is rewritten in place and
+        no journal entry is written. Otherwise the whole customer is updated,
+        which also stores the id of an account stored before accounts had ids.
+        Args:
+            customer (Customer): The customer holding the account
+            account (BankAccount): The account whose balance changed
+        """
+        if self.balance_file is None or account.slot is None:
+            self.update_customer(customer.id, customer)
+            return
+        with self._lock:
+            existing = self._index.get(customer.id)
+            position = next((position for position, held in enumerate(customer.accounts) if held is account), None)
+            stored_accounts = (existing.get('accounts') or []) if existing is not None else []
+            if position is None or position >= len(stored_accounts) \
+                    or stored_accounts[position].get('slot') != account.slot \
+                    or stored_accounts[position].get('id') != account.id:
+                self.update_customer(customer.id, customer)
+                return
+            self.balance_file.set_balance(account.slot, account.balance)
+            self.account_columns.set_balance(customer.id, position, account.balance)
+            # Keep the resident version current so cached eligibility results of the old balance are not reused
+            self._index[customer.id] = {**existing, 'version': customer.version}
+            if self.identity_map:
+                self._identities[customer.id] = customer
+        logger.info("Balance of account %s of customer %s updated in place.", account.id, customer.id)
+
+    @timed("customer_repository.remove_customer")
     def remove_customer(self, id):
         """Remove a customer by their id.
+
+        Balance file slots of the customer's accounts are freed the next time
+        the repository is opened.
         Args:
             id (str): The id of the customer to remove
         """
-        
-        customers = self._load_customers()
-        primary_len = len(customers)
-        customers = [customer for customer in customers if customer['id'] != id]
-        if primary_len == len(customers):
-            logger.warning(f"Attempted to remove non-existent customer with ID: {id}")
-            return 
-        else:
-            self._save_customers(customers)
-            logger.info(f"Customer with ID {id} removed successfully.")
+        with self._lock:
+            if id not in self._index:
+                logger.warning("Attempted to remove non-existent customer with ID: %s", id)
+                return
+            self._append_journal({'op': 'delete', 'id': id})
+            del self._index[id]
+            self.account_columns.remove(id)
+            self.customer_indexes.remove(id)
+            self._identities.pop(id, None)
+        logger.info("Customer with ID %s removed successfully.", id)
 
+    @timed("customer_repository.get_all_customers")
     def get_all_customers(self):
         """Get all customers."""
-        customers = self._load_customers()
-        return [Customer.from_dict(customer) for customer in customers]
+        return list(self.iter_customers())
+
+    def iter_customers(self):
+        """Yield customers one at a time, hydrating each only when it is reached.
 
+        Only the list of ids is copied up front, so callers that do not keep the
+        customers use constant memory on top of the resident index.
+        Yields:
+            Customer: The next customer
+        """
+        with self._lock:
+            ids = list(self._index)
+        for id in ids:
+            customer = self._hydrate(id)
+            if customer:
+                yield customer
+
+    @timed("customer_repository.find_customer")
     def find_customer(self, id):
         """Find a customer by their id.
         Args:
             id (str): The id of the customer to find
         """
-        customers = self._load_customers()
-        customer_data = next(
-            (c for c in customers if c['id'] == id), 
-            None
-        )
-
-        if customer_data:
-          logger.info(f"Customer with ID {id} found successfully.")
-          return Customer.from_dict(customer_data)
+        customer = self._hydrate(id)
+        if customer:
+          logger.info("Customer with ID %s found successfully.", id)
+          return customer
         else:
-            logger.warning(f"Attempted to find non-existent customer with ID: {id}")
+            logger.warning("Attempted to find non-existent customer with ID: %s", id)
             return None
 
-    def _load_customers(self):
-        """Load customers from JSON file.
+    @timed("customer_repository.total_balance")
+    def total_balance(self, account_type=None):
+        """Sum the balances of all accounts, or of one account type.
+        Args:
+            account_type (str): Account type value to restrict to, or None for all
+        Returns:
+            int: Total balance
+        """
+        with self._lock:
+            return self.account_columns.total_balance(account_type)
+
+    @timed("customer_repository.balance_totals")
+    def balance_totals(self, by='type'):
+        """Sum account balances per account type or per creating employee.
+        Args:
+            by (str): 'type' or 'created_by'
+        Returns:
+            dict: Account type or employee name -> total balance
+        """
+        with self._lock:
+            if by == 'type':
+                return self.account_columns.totals_by_type()
+            if by == 'created_by':
+                return self.account_columns.totals_by_creator()
+        raise ValueError(f"Cannot group balances by {by}")
+
+    @timed("customer_repository.customers_below_balance")
+    def customers_below_balance(self, threshold=MINIMUM_BALANCE, account_type=None):
+        """Find the ids of customers holding an account with a balance below a threshold.
+        Args:
+            threshold (int): Balance to compare against
+            account_type (str): Account type value to restrict to, or None for all
+        Returns:
+            list: Ids of the matching customers
+        """
+        with self._lock:
+            return self.account_columns.customers_below(threshold, account_type)
+
+    @timed("customer_repository.search_customers")
+    def search_customers(self, phone_number=None, last_name=None, last_name_prefix=None, created_by=None,
+                         min_age=None, max_age=None, limit=None):
+        """Find the customers matching every given criterion through the secondary indexes.
+
+        Only the matching customers are hydrated.
+        Args:
+            phone_number (str): Exact phone number
+            last_name (str): Last name, ignoring case
+            last_name_prefix (str): Start of the last name, ignoring case
+            created_by (str): Full name of the employee who created the customer
+            min_age (int): Lowest age, inclusive
+            max_age (int): Highest age, inclusive
+            limit (int): Return at most this many customers, or None for all
+        Returns:
+            list: Matching customers in id order
+        Raises:
+            ValueError: If no criterion is given or an age bound is not a number.
+        """
+        with self._lock:
+            ids = sorted(self.customer_indexes.search(phone_number, last_name, last_name_prefix, created_by,
+                                                      min_age, max_age))
+        customers = [customer for customer in map(self._hydrate, ids[:limit]) if customer]
+        logger.info("Customer search matched %s customers.", len(ids))
+        return customers
+
+    @timed("customer_repository.get_account_columns")
+    def get_account_columns(self):
+        """Return a read-only snapshot of the account columns.
+        Returns:
+            AccountColumns: Copy of the columns that later writes do not change
+        """
+        with self._lock:
+            return self.account_columns.snapshot()
+
+    @timed("customer_repository.invalidate")
+    def invalidate(self):
+        """Drop the resident index and identity map and rebuild them from disk.
+
+        Call this after another process has written to the customer files.
+        """
+        with self._lock:
+            self._identities.clear()
+            if self.balance_file is not None:
+                self.balance_file.refresh()
+            self._build_index()
+        logger.info("Customer index for %s invalidated and rebuilt.", self.file_path)
+
+    def close(self):
+        """Close the balance file, if any, so that another repository can open it for writing."""
+        if self.balance_file is not None:
+            self.balance_file.close()
+
+    def refresh_if_changed(self):
+        """Rebuild the index if the files changed since this repository last touched them.
+        Returns:
+            bool: True if the index was rebuilt, False otherwise
+        """
+        with self._lock:
+            if self._file_signature() == self._signature:
+                return False
+            self.invalidate()
+            return True
+
+    @timed("customer_repository.hydrate")
+    def _hydrate(self, id):
+        """Build the Customer for an id from the resident index.
+        Args:
+            id (str): The id of the customer
+        Returns:
+            Customer: The customer object, or None if the id is unknown
+        """
+        with self._lock:
+            customer = self._identities.get(id)
+            if customer is not None:
+                metrics.increment('customer_repository.identity_map_hits')
+                return customer
+            customer_data = self._index.get(id)
+        if customer_data is None:
+            return None
+        customer = Customer.from_dict(self._with_balances(customer_data), trusted=self._is_trusted(customer_data))
+        metrics.increment('customer_repository.customers_hydrated')
+        if self.identity_map:
+            with self._lock:
+                customer = self._identities.setdefault(id, customer)
+        return customer
+
+    def _build_index(self):
+        """Load every customer record into the resident id index, from the warm-start cache when it is current."""
+        start = time.perf_counter()
+        with self._lock:
+            mode = 'warm' if self.warm_start and self._load_warm_cache() else 'cold'
+            if mode == 'cold':
+                self._index = {customer['id']: customer for customer in self._load_customers()}
+                self.account_columns = AccountColumns()
+                for id, customer in self._index.items():
+                    self.account_columns.put(id, self._with_balances(customer))
+                self.customer_indexes = CustomerIndexes.from_records(self._index.values())
+                if self.warm_start:
+                    self._save_warm_cache_in_background()
+            self._signature = self._file_signature()
+        elapsed = time.perf_counter() - start
+        self.startup = {'mode': mode, 'seconds': elapsed, 'customers': len(self._index)}
+        metrics.observe(f"customer_repository.{mode}_start", elapsed)
+        logger.info("Loaded %s customers from %s in %.3fs (%s start)", len(self._index), self.file_path, elapsed, mode)
+
+    def _load_warm_cache(self):
+        """Load the index from the warm-start cache if it matches the files on disk.
+
+        Journal entries appended after the cache was written are replayed on top of it.
+        Returns:
+            bool: True if the cache was loaded
+        """
+        try:
+            with open(self.warm_cache_path, 'rb') as f:
+                header = pickle.load(f)
+                if header.get('format') != self.WARM_CACHE_FORMAT or not self._warm_stamp_matches(header['stamp']):
+                    logger.info("Warm-start cache %s is out of date.", self.warm_cache_path)
+                    return False
+                with customer_codec.collection_paused():
+                    index, columns, indexes, row_slots = pickle.load(f)
+            if (row_slots is not None) != (self.balance_file is not None):
+                logger.info("Warm-start cache %s was written with a different balance file setting.",
+                            self.warm_cache_path)
+                return False
+            if row_slots is not None:
+                # Balances change in place without journal entries, so the cached ones are refreshed from the file
+                slot_balances = self.balance_file.balances()
+                columns.set_balances([balance if slot < 0 else slot_balances[slot]
+                                      for slot, balance in zip(row_slots, columns.balance)])
+            touched = set()
+            replayed = self._replay_journal(self.journal_path, index, offset=header['stamp']['journal'][0],
+                                            touched=touched)
+            for id in touched:
+                if id in index:
+                    columns.put(id, self._with_balances(index[id]))
+                else:
+                    columns.remove(id)
+                    indexes.remove(id)
+            indexes.put_many((id, index[id]) for id in touched if id in index)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning("Ignoring unusable warm-start cache %s: %s", self.warm_cache_path, e)
+            return False
+        self._index = index
+        self.account_columns = columns
+        self.customer_indexes = indexes
+        self._journal_entries = header['journal_entries'] + replayed
+        return True
+
+    def _save_warm_cache_in_background(self):
+        """Write the warm-start cache for the index just loaded from disk without delaying startup."""
+        journal_size = self.journal_path.stat().st_size if self.journal_path.exists() else 0
+        args = (dict(self._index), self.account_columns.copy(), self.customer_indexes.copy(), journal_size,
+                self._journal_entries, self._file_signature()[:2])
+        threading.Thread(target=self._save_warm_cache, args=args, name="warm-cache", daemon=True).start()
+
+    @timed("customer_repository.save_warm_cache")
+    def _save_warm_cache(self, index, columns, indexes, journal_size, journal_entries, signature):
+        """Write the warm-start cache.
+        Args:
+            index (dict): Stored customers keyed by id, as of the files below
+            columns (AccountColumns): Account columns of the index
+            indexes (CustomerIndexes): Secondary indexes of the index
+            journal_size (int): Length of the journal prefix included in the index
+            journal_entries (int): Number of entries in that prefix
+            signature (tuple): Size and modification time of the snapshot and rotated journal the index was read from
+        """
+        try:
+            with self._warm_cache_lock:
+                stamp = self._warm_stamp(journal_size)
+                if tuple(entry and entry[:2] for entry in (stamp['snapshot'], stamp['compacting'])) != signature:
+                    logger.info("Customer files changed while writing the warm-start cache; skipping it.")
+                    return
+                row_slots = None
+                if self.balance_file is not None:
+                    # Balance file slot of every column row, -1 for rows whose balance is stored inline
+                    row_slots = array('q', repeat(-1, len(columns.balance)))
+                    for id, rows in columns._rows.items():
+                        for row, account in zip(rows, index[id].get('accounts') or []):
+                            if 'slot' in account and 'balance' not in account:
+                                row_slots[row] = account['slot']
+                tmp_path = self.warm_cache_path.with_name(self.warm_cache_path.name + '.tmp')
+                with open(tmp_path, 'wb') as f:
+                    header = {'format': self.WARM_CACHE_FORMAT, 'stamp': stamp, 'journal_entries': journal_entries}
+                    pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    pickle.dump((index, columns, indexes, row_slots), f, protocol=pickle.HIGHEST_PROTOCOL)
+                    metrics.increment('customer_repository.bytes_written', f.tell())
+                os.replace(tmp_path, self.warm_cache_path)
+                logger.info("Wrote warm-start cache %s for %s customers.", self.warm_cache_path, len(index))
+        except Exception as e:
+            logger.error("Failed to write warm-start cache %s: %s", self.warm_cache_path, e)
+
+    def _warm_stamp(self, journal_size):
+        """Identify the file contents a warm-start cache was built from.
+        Args:
+            journal_size (int): Length of the journal prefix included in the cache
+        Returns:
+            dict: Size, modification time and hash of the snapshot and rotated journal,
+                and the length and hash of the journal prefix
+        """
+        return {
+            'snapshot': self._file_stamp(self.file_path),
+            'compacting': self._file_stamp(self._compacting_path),
+            'journal': (journal_size, self._hash_file(self.journal_path, journal_size))
+        }
+
+    def _warm_stamp_matches(self, stamp):
+        """Check a warm-start cache stamp against the files, hashing only files whose size and time match."""
+        for path, recorded in ((self.file_path, stamp['snapshot']), (self._compacting_path, stamp['compacting'])):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                if recorded is not None:
+                    return False
+                continue
+            if recorded is None or (stat.st_size, stat.st_mtime_ns) != recorded[:2] \
+                    or self._hash_file(path) != recorded[2]:
+                return False
+        journal_size, journal_hash = stamp['journal']
+        current_size = self.journal_path.stat().st_size if self.journal_path.exists() else 0
+        return current_size >= journal_size and self._hash_file(self.journal_path, journal_size) == journal_hash
+
+    @staticmethod
+    def _file_stamp(path):
+        """Return the size, modification time and hash of a file, or None if it does not exist."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns, CustomerRepository._hash_file(path))
+
+    @staticmethod
+    def _hash_file(path, size=None):
+        """Hash a file, or its first size bytes.
+        Returns:
+            str: Hex digest, or None if the file does not exist
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        if size != 0:
+            if not path.exists():
+                return None
+            with open(path, 'rb') as f:
+                remaining = size
+                while remaining is None or remaining > 0:
+                    chunk = f.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    if remaining is not None:
+                        remaining -= len(chunk)
+        return digest.hexdigest()
+
+    @timed("customer_repository.audit")
+    def audit(self, reseal=False):
+        """Check every stored customer against its checksum and the full model validation.
+
+        With reseal, the customers that pass the full validation but have no
+        matching checksum are sealed with a new one in a single journal
+        write, so that an imported, legacy or hand-edited book is hydrated
+        trusted from then on. Invalid customers are never sealed.
+        Args:
+            reseal (bool): Seal the valid customers that lack a matching checksum
+        Returns:
+            dict: Number of customers checked and of those without a checksum, the ids failing
+                their checksum, the validation error of every invalid customer by id and, with
+                reseal, the number of customers 'resealed'
+        """
+        with self._lock:
+            records = list(self._index.values())
+        report = {'customers': len(records), 'unchecked': 0, 'checksum_mismatches': [], 'invalid': {}}
+        unsealed = []
+        for record in records:
+            checksum = record.get('checksum')
+            if checksum is None:
+                report['unchecked'] += 1
+            elif checksum != self._checksum(record):
+                report['checksum_mismatches'].append(record['id'])
+            try:
+                # Reading the accounts builds them, running the balance validation too
+                Customer.from_dict(self._with_balances(record)).accounts
+            except ValueError as e:
+                report['invalid'][record['id']] = str(e)
+                continue
+            if checksum is None or checksum != self._checksum(record):
+                unsealed.append(record)
+        if reseal:
+            report['resealed'] = self._reseal(unsealed)
+        logger.info("Audited %s customers in %s: %s checksum mismatches, %s invalid", len(records), self.file_path,
+                    len(report['checksum_mismatches']), len(report['invalid']))
+        return report
+
+    def _reseal(self, records):
+        """Store validated records again with a checksum.
+
+        Records changed since they were validated are skipped.
+        Args:
+            records (list): Stored records that passed the full validation
+        Returns:
+            int: Number of records sealed
+        """
+        with self._lock:
+            sealed = [dict(record, checksum=self._checksum(record)) for record in records
+                      if self._index.get(record['id']) is record]
+            if sealed:
+                self._append_journal(*({'op': 'put', 'id': record['id'], 'customer': record} for record in sealed))
+            for record in sealed:
+                self._index[record['id']] = record
+        logger.info("Sealed %s customers in %s", len(sealed), self.file_path)
+        return len(sealed)
+
+    def _is_trusted(self, record):
+        """Check whether a stored record can be hydrated without validation.
+        Args:
+            record (dict): Stored customer data
+        Returns:
+            bool: True if the record has a matching checksum and verify is off
+        """
+        checksum = record.get('checksum')
+        if checksum is None:
+            metrics.increment('customer_repository.unchecked_hydrations')
+            return False
+        if checksum != self._checksum(record):
+            metrics.increment('customer_repository.checksum_mismatches')
+            logger.warning("Customer %s fails its checksum; validating it in full.", record.get('id'))
+            return False
+        return not self.verify
+
+    def _sealed(self, stored, customer):
+        """Add the checksum to a record about to be stored for a validated customer.
+        Args:
+            stored (dict): Customer data to store
+            customer (Customer): The customer the data was taken from
+        Returns:
+            dict: The record with a checksum, or without one if the customer holds unvalidated account data
+        """
+        stored.pop('checksum', None)
+        if customer.validated:
+            stored['checksum'] = self._checksum(stored)
+        return stored
+
+    @staticmethod
+    def _checked_import(record):
+        """Check that a record for import_records can be stored and indexed.
+
+        Balance file slots are dropped, since they refer to the file of the
+        repository the record came from.
+        Args:
+            record (dict): Customer data in the Customer.to_dict format
+        Returns:
+            dict: The record with its accounts copied without slots
+        Raises:
+            ValueError: If the record is not a dictionary with a string id, readable numbers and account dictionaries.
+        """
+        try:
+            if not isinstance(record, dict):
+                raise ValueError(f"expected a dictionary, got {type(record).__name__}")
+            if not isinstance(record.get('id'), str) or not record['id']:
+                raise ValueError("missing or non-string id")
+            int(record['age'])
+            accounts = record.get('accounts') or []
+            if not isinstance(accounts, list) or not all(isinstance(account, dict) for account in accounts):
+                raise ValueError("accounts must be a list of dictionaries")
+            for account in accounts:
+                if 'balance' not in account and 'slot' in account:
+                    raise ValueError("account keeps its balance in a balance file, export the records first")
+                for field in ('balance', 'minimum_balance', 'transaction_limit'):
+                    if field in account and not -2 ** 63 <= int(account[field]) < 2 ** 63:
+                        raise ValueError(f"{field} out of range")
+        except (KeyError, TypeError, ValueError) as e:
+            id = record.get('id') if isinstance(record, dict) else None
+            logger.error("Rejected import of customer %s: %s", id, e)
+            raise ValueError(f"Invalid customer record {id}: {e}")
+        if not accounts:
+            return record
+        return {**record, 'accounts': [{key: value for key, value in account.items() if key != 'slot'}
+                                       for account in accounts]}
+
+    def _imported(self, record, balance_writes):
+        """Prepare a customer dictionary for import_records, dropping any checksum it carries."""
+        return self._store_balances({key: value for key, value in record.items() if key != 'checksum'},
+                                    balance_writes)
+
+    @staticmethod
+    def _checksum(record):
+        """Return the CRC-32 of the fields of a stored record that trusted hydration does not validate."""
+        fields = [record.get('id'), record.get('age'), record.get('phone_number')]
+        for account in record.get('accounts') or ():
+            fields += (account.get('type'), account.get('balance'), account.get('slot'),
+                       account.get('minimum_balance'), account.get('transaction_limit'))
+        return zlib.crc32(repr(fields).encode())
+
+    def _store_balances(self, customer_dict, balance_writes, customer=None):
+        """Move the account balances of a customer dictionary into the balance file.
+
+        Accounts without a slot get a new one, which is also recorded on the
+        customer object so later balance updates can be made in place. New
+        slots are written at once, since no stored document refers to them
+        yet. Records of slots already in use are only added to balance_writes;
+        the caller writes them with _write_balances once the journal append has
+        succeeded, so a failed write leaves the stored balances unchanged.
+        Args:
+            customer_dict (dict): Customer data in the Customer.to_dict format
+            balance_writes (list): Collects the (slot, type code, balance, limit) records still to write
+            customer (Customer): The customer the data was taken from, if any
+        Returns:
+            dict: The dictionary to store, with a slot instead of the balance fields of each account
+        """
+        accounts = customer_dict.get('accounts')
+        if self.balance_file is None or not accounts:
+            return customer_dict
+        stored_accounts = []
+        slots = []
+        for account in accounts:
+            if 'balance' not in account and 'slot' in account:
+                stored_accounts.append(account)
+                slots.append(account['slot'])
+                continue
+            type_code = AccountColumns.type_code_of(account.get('type'))
+            if type_code == AccountColumns.SAVINGS:
+                limit = account.get('minimum_balance', MINIMUM_BALANCE)
+            else:
+                limit = account.get('transaction_limit', TRANSACTION_LIMIT)
+            balance = int(account.get('balance', 0))
+            slot = account.get('slot')
+            if slot is None:
+                slot = self.balance_file.allocate(type_code, balance, int(limit))
+            else:
+                balance_writes.append((slot, type_code, balance, int(limit)))
+            stored_account = {key: value for key, value in account.items() if key not in self.BALANCE_FIELDS}
+            stored_account['slot'] = slot
+            stored_accounts.append(stored_account)
+            slots.append(slot)
+        if customer is not None:
+            customer.assign_account_slots(slots)
+        return {**customer_dict, 'accounts': stored_accounts}
+
+    def _write_balances(self, balance_writes):
+        """Write the balance file records collected by _store_balances.
+        Args:
+            balance_writes (list): (slot, type code, balance, limit) records
+        """
+        for record in balance_writes:
+            self.balance_file.write(*record)
+
+    def _with_balances(self, customer_dict):
+        """Fill the account balances of a stored customer dictionary back in from the balance file.
+        Args:
+            customer_dict (dict): Stored customer data
+        Returns:
+            dict: Customer data in the Customer.to_dict format, a copy if anything was filled in
+        Raises:
+            ValueError: If an account keeps its balance in a balance file this repository does not have.
+        """
+        accounts = customer_dict.get('accounts')
+        if not accounts or not any('slot' in account for account in accounts):
+            return customer_dict
+        if self.balance_file is None:
+            if any('balance' not in account for account in accounts):
+                logger.error("Customer %s of %s keeps its balances in a balance file, "
+                             "open the repository with balance_file", customer_dict.get('id'), self.file_path)
+                raise ValueError(f"Customer {customer_dict.get('id')} of {self.file_path} keeps its balances "
+                                 f"in a balance file, open the repository with balance_file")
+            return customer_dict
+        filled = []
+        for account in accounts:
+            if 'slot' in account and 'balance' not in account:
+                type_code, balance, limit = self.balance_file.read(account['slot'])
+                account = dict(account, type=AccountColumns.TYPE_NAMES[type_code], balance=balance)
+                account['minimum_balance' if type_code == AccountColumns.SAVINGS else 'transaction_limit'] = limit
+            filled.append(account)
+        return {**customer_dict, 'accounts': filled}
+
+    def _attach_balance_file(self, balance_file):
+        """Open the balance file of the repository and check it against the one recorded for the snapshot.
+        Args:
+            balance_file (BalanceFile or str): The balance file passed to the constructor, or None
+        Returns:
+            BalanceFile: The balance file to use, the recorded one if none was passed, or None
+        Raises:
+            ValueError: If the snapshot was written with a different balance file.
+        """
+        recorded = None
+        if self.balance_file_marker_path.exists():
+            with open(self.balance_file_marker_path, 'r') as f:
+                recorded = self.file_path.parent / json.load(f)['balance_file']
+        if balance_file is None:
+            if recorded is None:
+                return None
+            logger.info("Attaching balance file %s recorded for %s", recorded, self.file_path)
+            return BalanceFile(recorded)
+        path = balance_file.path if isinstance(balance_file, BalanceFile) else Path(balance_file)
+        if recorded is not None and os.path.abspath(recorded) != os.path.abspath(path):
+            logger.error("%s uses balance file %s, not %s", self.file_path, recorded, path)
+            raise ValueError(f"{self.file_path} uses balance file {recorded}, not {path}")
+        if not isinstance(balance_file, BalanceFile):
+            balance_file = BalanceFile(balance_file)
+        if recorded is None and not balance_file.read_only:
+            with open(self.balance_file_marker_path, 'w') as f:
+                json.dump({'balance_file': os.path.relpath(path, self.file_path.parent)}, f)
+        return balance_file
+
+    def _file_signature(self):
+        """Return the size and modification time of the snapshot and journal files."""
+        signature = []
+        for path in (self.file_path, self._compacting_path, self.journal_path):
+            try:
+                stat = path.stat()
+                signature.append((stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    @timed("customer_repository.compact")
+    def compact(self):
+        """Fold the journal into the snapshot file.
+
+        The live journal is first rotated aside so writers can keep appending
+        while the new snapshot is being written.
+        Raises:
+            Exception: If the snapshot exists but cannot be read; the snapshot and journal are left as they are.
+        """
+        with self._compaction_lock:
+            with self._lock:
+                if not self._compacting_path.exists():
+                    if not self.journal_path.exists() or self.journal_path.stat().st_size == 0:
+                        return
+                    with self._journal_lock:
+                        os.replace(self.journal_path, self._compacting_path)
+                    self._journal_entries = 0
+                    self._signature = self._file_signature()
+
+            # An unreadable snapshot aborts the compaction, which would otherwise replace it with the journal
+            # alone; the rotated journal is kept and folded in by the next compaction
+            customers = {customer['id']: customer for customer in self._read_snapshot(strict=True)}
+            self._replay_journal(self._compacting_path, customers)
+            tmp_path = self.file_path.with_name(self.file_path.name + '.tmp')
+            self._write_snapshot(tmp_path, list(customers.values()))
+
+            with self._lock:
+                os.replace(tmp_path, self.file_path)
+                self._compacting_path.unlink()
+                self._signature = self._file_signature()
+            logger.info("Compacted journal %s into %s", self.journal_path, self.file_path)
+            if self.warm_start:
+                columns = AccountColumns.from_records(self._with_balances(customer) for customer in customers.values())
+                self._save_warm_cache(customers, columns, CustomerIndexes.from_records(customers.values()), 0, 0,
+                                      self._signature[:2])
+
+    def _maybe_compact(self):
+        """Start a background compaction once the journal is long enough."""
+        if self._journal_entries < self.compact_threshold:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self._compact_in_background, daemon=True)
+        self._compaction_thread.start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error("Failed to compact journal %s: %s", self.journal_path, e)
+
+    @contextmanager
+    def deferred(self):
+        """Buffer the journal entries written inside the block and append them in one write at the end.
+
+        Entries for the same customer are coalesced, so only its last state is
+        written. The index is updated immediately; changes still buffered are
+        lost if the process dies, so call flush() at checkpoints.
+        """
+        with self._lock:
+            if self._deferred_depth == 0:
+                self._deferred_entries = {}
+            self._deferred_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred_depth -= 1
+                if self._deferred_depth == 0:
+                    entries, self._deferred_entries = self._deferred_entries, None
+                    if entries:
+                        self._append_journal(*entries.values())
+
+    def flush(self):
+        """Write the journal entries buffered by deferred() so far without leaving the block.
+
+        Balance records updated in place are flushed to disk as well.
+        """
+        with self._lock:
+            if self._deferred_entries:
+                entries = list(self._deferred_entries.values())
+                self._deferred_entries = {}
+                self._journal_written(entries, self._write_journal(entries))
+            if self.balance_file is not None:
+                self.balance_file.flush()
+
+    def _append_journal(self, *entries):
+        """Append entries to the journal file in a single write.
+        Args:
+            entries (dict): Journal entries with an 'op' of 'put' or 'delete'
+        """
+        if self._deferred_entries is not None:
+            for entry in entries:
+                self._deferred_entries.pop(entry['id'], None)
+                self._deferred_entries[entry['id']] = entry
+            return
+        signature = self._write_journal(entries)
+        self._journal_written(entries, signature)
+
+    @timed("customer_repository.write_journal")
+    def _write_journal(self, entries):
+        """Write entries to the journal file.
+        Args:
+            entries (list): Journal entries with an 'op' of 'put' or 'delete'
+        Returns:
+            tuple: The file signature after the write
+        """
+        try:
+            with self._journal_lock, open(self.journal_path, 'a') as f:
+                metrics.increment('customer_repository.bytes_written',
+                                  f.write(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries)))
+        except Exception as e:
+            logger.error("Failed to append to journal %s: %s", self.journal_path, e)
+            raise
+        return self._file_signature()
+
+    def _journal_written(self, entries, signature):
+        """Record that entries reached the journal and start a compaction if it is long enough."""
+        with self._lock:
+            self._journal_entries += len(entries)
+            self._signature = signature
+            self._maybe_compact()
+
+    @timed("customer_repository.replay_journal")
+    def _replay_journal(self, path, customers, offset=0, touched=None):
+        """Apply the entries of a journal file to a dict of customers keyed by id.
+        Args:
+            path (Path): Journal file to replay
+            customers (dict): Customers keyed by id, updated in place
+            offset (int): Byte offset of the first entry to apply
+            touched (set): If given, the ids of the applied entries are added to it
+        Returns:
+            int: Number of entries applied
+        """
+        if not path.exists():
+            return 0
+        applied = 0
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            if metrics.enabled:
+                metrics.increment('customer_repository.bytes_read', os.fstat(f.fileno()).st_size - offset)
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Skipping corrupt journal entry at %s:%s", path, line_number)
+                    continue
+                if entry['op'] == 'put':
+                    customers[entry['id']] = entry['customer']
+                elif entry['op'] == 'delete':
+                    customers.pop(entry['id'], None)
+                if touched is not None:
+                    touched.add(entry['id'])
+                applied += 1
+        return applied
+
+    @timed("customer_repository.read_snapshot")
+    def _read_snapshot(self, strict=False):
+        """Read the snapshot file.
+        Args:
+            strict (bool): Raise if the snapshot exists but cannot be read, instead of returning no customers
         returns:
             list: List of customers
         """
         if not self.file_path.exists():
-            logger.error(f"Customers file({self.file_path}) not found.")
+            logger.error("Customers file(%s) not found.", self.file_path)
             return []
         try:
-            with open(self.file_path, 'r') as f:
-                logger.info(f"Customers in {self.file_path} found and loaded successfully.")
+            with open(self.file_path, 'rb') as f:
+                if metrics.enabled:
+                    metrics.increment('customer_repository.bytes_read', os.fstat(f.fileno()).st_size)
+                if customer_codec.is_binary(f):
+                    return customer_codec.read_records(f)
                 return json.load(f)
         except Exception as e:
-            logger.error(f"Failed to load customers from {self.file_path}: {e}")
+            logger.error("Failed to load customers from %s: %s", self.file_path, e)
+            if strict:
+                raise
             return []
-    
 
+    @timed("customer_repository.load_customers")
+    def _load_customers(self):
+        """Load customers from the snapshot and replay the journal on top of it.
+        returns:
+            list: List of customers
+        """
+        with self._lock:
+            customers = {customer['id']: customer for customer in self._read_snapshot()}
+            self._replay_journal(self._compacting_path, customers)
+            self._journal_entries = self._replay_journal(self.journal_path, customers)
+        logger.info("Customers in %s found and loaded successfully.", self.file_path)
+        return list(customers.values())
+
+    @timed("customer_repository.save_customers")
     def _save_customers(self, customers):
         """Save customers to JSON file.
         Args:
             customers (list): List of customers
         """
         try:
-            with open(self.file_path, 'w') as f:
-                json.dump(customers, f, indent=4)
-            logger.info(f"Successfully saved customers to {self.file_path}")
+            tmp_path = self.file_path.with_name(self.file_path.name + '.tmp')
+            self._write_snapshot(tmp_path, customers)
+            os.replace(tmp_path, self.file_path)
+            logger.info("Successfully saved customers to %s", self.file_path)
         except Exception as e:
-            logger.error(f"Failed to save customers from {self.file_path}: {e}")
+            logger.error("Failed to save customers from %s: %s", self.file_path, e)
             raise
+
+    def _write_snapshot(self, path, customers):
+        """Write customers to a snapshot file in the configured format.
+        Args:
+            path (Path): File to write
+            customers (list): List of customers
+        """
+        if self.binary_snapshot:
+            with open(path, 'wb') as f:
+                written = customer_codec.write_records(f, customers)
+        else:
+            with open(path, 'w') as f:
+                json.dump(customers, f, indent=4)
+                written = f.tell()
+        metrics.increment('customer_repository.bytes_written', written)
@@ -1,16 +1,22 @@
 import json
+import threading
 from pathlib import Path
 
-from utils.logger import logger
+from utils.logger import get_logger
+from utils.metrics import registry as metrics, timed
 from models.Employee import Employee
 
+logger = get_logger(__name__)
+
 
 class EmployeeRepository:
     def __init__(self, file_path="data/employees.json"):
         self.file_path = Path(file_path)
         self._data = []
+        self._lock = threading.RLock()
         self._load_data()  
 
+    @timed("employee_repository.load_data")
     def _load_data(self):
         """Load data from the JSON file, if it exists."""
         if self.file_path.exists():
@@ -19,20 +25,23 @@ class EmployeeRepository:
                     self._data = json.load(f)
                 logger.info("Data loaded successfully.")
             except Exception as e:
-                logger.error(f"An unexpected error occurred: {e}")
+                logger.error("An unexpected error occurred: %s", e)
         else:
-            logger.warning(f"{self.file_path} does not exist.")
+            logger.warning("%s does not exist.", self.file_path)
 
 
+    @timed("employee_repository.save_data")
     def _save_data(self):
         """Save the current data to the JSON file."""
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
         try:
-            with self.file_path.open('w') as f:
+            with self._lock, self.file_path.open('w') as f:
                 json.dump(self._data, f, indent=4)
+                metrics.increment('employee_repository.bytes_written', f.tell())
         except Exception as e:
-            logger.error(f"Failed to save data to {self.file_path}: {e}")
+            logger.error("Failed to save data to %s: %s", self.file_path, e)
 
+    @timed("employee_repository.add_employee")
     def add_employee(self, new_employee):
         """Add an employee to the list if the id doesn't already exist.
         Args:
@@ -42,27 +51,31 @@ class EmployeeRepository:
         employee_dict = new_employee.to_dict()
 
         # Check if the employee already exists by id
-        if any(employee['id'] == employee_dict['id'] for employee in self._data):
-            logger.warning(f"Attempted to add an existing employee with ID: {employee_dict['id']}")
-            return
-        self._data.append(employee_dict)
-        self._save_data()
-        logger.info(f"Employee {new_employee.full_name} added successfully.")
+        with self._lock:
+            if any(employee['id'] == employee_dict['id'] for employee in self._data):
+                logger.warning("Attempted to add an existing employee with ID: %s", employee_dict['id'])
+                return
+            self._data.append(employee_dict)
+            self._save_data()
+        logger.info("Employee %s added successfully.", new_employee.full_name)
 
+    @timed("employee_repository.delete_employee")
     def delete_employee(self, id):
         """Delete an employee by id.
         Args:
             id (str): The id of the employee to delete.
         """
-        self._data = [employee for employee in self._data if employee['id'] != id]
-        if not self._data:
-            logger.warning(f"Attempted to remove non-existent employee with ID: {id}")
-            return
-        else:
-            logger.info(f"Employee with ID {id} removed successfully.")
-            self._save_data()
+        with self._lock:
+            self._data = [employee for employee in self._data if employee['id'] != id]
+            if not self._data:
+                logger.warning("Attempted to remove non-existent employee with ID: %s", id)
+                return
+            else:
+                logger.info("Employee with ID %s removed successfully.", id)
+                self._save_data()
     
 
+    @timed("employee_repository.get_all_employees")
     def get_all_employees(self):
         """Get the list of all employees.
         Returns:
@@ -70,6 +83,7 @@ class EmployeeRepository:
         """
         return self._data
 
+    @timed("employee_repository.find_employee_by")
     def find_employee_by(self, id):
         """Find and return an Employee object by id.
         Args:
@@ -79,11 +93,11 @@ class EmployeeRepository:
         """
         data = next((employee for employee in self._data if employee['id'] == id), None)
         if not data:
-            logger.warning(f"Attempted to find non-existent employee with ID: {id}")
+            logger.warning("Attempted to find non-existent employee with ID: %s", id)
             print(f"Employee with ID {id} not found.")
             return None
         else:
-            logger.info(f"Employee with ID {id} found successfully.")
+            logger.info("Employee with ID %s found successfully.", id)
             return Employee.from_dict(data) 
 
 
@@ -0,0 +1,388 @@
+"""Customer storage partitioned over several CustomerRepository shards.
+
+Split an existing JSON book into shards with:
+    python -m repositories.sharded_customer_repository [customers.json] [shard directory] [shard count]
+"""
+import heapq
+import json
+import multiprocessing
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import chain, islice
+from pathlib import Path
+
+from utils.logger import get_logger, listen_to_queue, log_to_queue, logger as bank_logger
+from repositories.account_columns import AccountColumns
+from repositories.balance_file import BalanceFile
+from repositories.customer_repository import CustomerRepository
+from utils.Constants import MINIMUM_BALANCE
+
+logger = get_logger(__name__)
+
+
+def _scan_shard(file_path, balance_path, function, args):
+    """Load one shard in a worker process and run a scan function over it."""
+    balance_file = BalanceFile(balance_path, read_only=True) if balance_path else None
+    return function(CustomerRepository(file_path, balance_file=balance_file), *args)
+
+
+def _matching_ids(repository, predicate):
+    """Return the ids of the customers of a shard that satisfy a predicate."""
+    return [customer.id for customer in repository.iter_customers() if predicate(customer)]
+
+
+class ShardedCustomerRepository:
+    """Customer storage routing every customer id to one of ``shard_count`` shards.
+
+    Each shard is a CustomerRepository with its own snapshot and journal in
+    ``directory``, so single-customer operations parse, lock and append to one
+    shard only. Numeric ids are routed by their value modulo the shard count,
+    which spreads sequential ids evenly. The shard count is recorded in
+    ``shards.json`` and must match when the directory is reopened.
+
+    Aggregates are merged from the resident per-shard indexes. Full scans that
+    run Python code on every customer go through ``scan``, which loads each
+    shard in a separate worker process and merges the per-shard results.
+    """
+
+    def __init__(self, directory="data/shards", shard_count=8, workers=None, balances=False, **repository_options):
+        """Open or create the shards of a directory.
+        Args:
+            directory (str): Directory holding the shard files
+            shard_count (int): Number of shards
+            workers (int): Number of scan worker processes, the number of CPUs by default
+            balances (bool): Keep account balances in one balance file per shard
+            repository_options: Extra keyword arguments of CustomerRepository
+        Raises:
+            ValueError: If the directory was created with a different shard count.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.directory / "shards.json"
+        if manifest_path.exists():
+            with open(manifest_path, 'r') as f:
+                recorded = json.load(f)['shards']
+            if recorded != shard_count:
+                logger.error("%s holds %s shards, not %s", self.directory, recorded, shard_count)
+                raise ValueError(f"{self.directory} holds {recorded} shards, not {shard_count}")
+        else:
+            with open(manifest_path, 'w') as f:
+                json.dump({'shards': shard_count}, f)
+
+        self.shard_count = shard_count
+        self.workers = workers
+        self._pool = None
+        self._log_queue = None
+        self._log_listener = None
+        self.shards = [
+            CustomerRepository(self.directory / f"customers-{n:03d}.json",
+                               balance_file=self.directory / f"balances-{n:03d}.bin" if balances else None,
+                               **repository_options)
+            for n in range(shard_count)
+        ]
+        logger.info("Opened %s customer shards in %s", shard_count, self.directory)
+
+    def shard_index(self, customer_id):
+        """Return the number of the shard that owns a customer id.
+        Args:
+            customer_id (str): The id of the customer
+        Returns:
+            int: Shard number
+        """
+        customer_id = str(customer_id)
+        if customer_id.isdigit():
+            return int(customer_id) % self.shard_count
+        return zlib.crc32(customer_id.encode()) % self.shard_count
+
+    def shard_for(self, customer_id):
+        """Return the shard that owns a customer id.
+        Args:
+            customer_id (str): The id of the customer
+        Returns:
+            CustomerRepository: The owning shard
+        """
+        return self.shards[self.shard_index(customer_id)]
+
+    def add_customer(self, new_customer, employee):
+        """Add a new customer to its shard.
+        Args:
+            new_customer (Customer): The customer object to add
+            employee (Employee): The employee who created the customer
+        Raises:
+            ValueError: If a customer with the same id already exists.
+        """
+        self.shard_for(new_customer.id).add_customer(new_customer, employee)
+
+    def add_customers(self, new_customers, employee):
+        """Add several new customers with one journal write per shard.
+        Args:
+            new_customers (iterable): The customer objects to add
+            employee (Employee): The employee who created the customers
+        Returns:
+            list: Ids that were skipped because they already exist
+        """
+        duplicates = []
+        for shard, customers in self._group(new_customers, lambda customer: customer.id):
+            duplicates.extend(shard.add_customers(customers, employee))
+        return duplicates
+
+    def import_records(self, records):
+        """Store customer dictionaries as they are with one journal write per shard.
+
+        Every record is checked before any shard is written, so a rejected
+        record leaves all shards unchanged.
+        Args:
+            records (iterable): Customer dictionaries in the Customer.to_dict format
+        Returns:
+            int: Number of customers imported
+        Raises:
+            ValueError: If a record is not a customer dictionary the shards can index.
+        """
+        records = [CustomerRepository._checked_import(record) for record in records]
+        return sum(shard.import_records(group) for shard, group in self._group(records, lambda record: record['id']))
+
+    def update_customer(self, customer_id, customer):
+        """Update an existing customer in its shard.
+        Args:
+            customer_id (str): The id of the customer to update
+            customer (Customer): The updated customer object
+        """
+        self.shard_for(customer_id).update_customer(customer_id, customer)
+
+    def update_customers(self, customers):
+        """Update several existing customers with one journal write per shard.
+        Args:
+            customers (iterable): The updated customer objects
+        Returns:
+            list: Ids that were skipped because they do not exist
+        """
+        missing = []
+        for shard, group in self._group(customers, lambda customer: customer.id):
+            missing.extend(shard.update_customers(group))
+        return missing
+
+    def update_balance(self, customer, account):
+        """Store the new balance of one account in the customer's shard.
+        Args:
+            customer (Customer): The customer holding the account
+            account (BankAccount): The account whose balance changed
+        """
+        self.shard_for(customer.id).update_balance(customer, account)
+
+    def remove_customer(self, id):
+        """Remove a customer by their id.
+        Args:
+            id (str): The id of the customer to remove
+        """
+        self.shard_for(id).remove_customer(id)
+
+    def find_customer(self, id):
+        """Find a customer by their id in its shard.
+        Args:
+            id (str): The id of the customer to find
+        """
+        return self.shard_for(id).find_customer(id)
+
+    def get_all_customers(self):
+        """Get all customers."""
+        return list(self.iter_customers())
+
+    def iter_customers(self):
+        """Yield the customers of every shard in turn, hydrating each only when it is reached.
+        Yields:
+            Customer: The next customer
+        """
+        return chain.from_iterable(shard.iter_customers() for shard in self.shards)
+
+    def total_balance(self, account_type=None):
+        """Sum the balances of all accounts, or of one account type.
+        Args:
+            account_type (str): Account type value to restrict to, or None for all
+        Returns:
+            int: Total balance
+        """
+        return sum(shard.total_balance(account_type) for shard in self.shards)
+
+    def balance_totals(self, by='type'):
+        """Sum account balances per account type or per creating employee.
+        Args:
+            by (str): 'type' or 'created_by'
+        Returns:
+            dict: Account type or employee name -> total balance
+        """
+        totals = {}
+        for shard in self.shards:
+            for key, total in shard.balance_totals(by).items():
+                totals[key] = totals.get(key, 0) + total
+        return totals
+
+    def customers_below_balance(self, threshold=MINIMUM_BALANCE, account_type=None):
+        """Find the ids of customers holding an account with a balance below a threshold.
+        Args:
+            threshold (int): Balance to compare against
+            account_type (str): Account type value to restrict to, or None for all
+        Returns:
+            list: Ids of the matching customers
+        """
+        return [id for shard in self.shards for id in shard.customers_below_balance(threshold, account_type)]
+
+    def search_customers(self, phone_number=None, last_name=None, last_name_prefix=None, created_by=None,
+                         min_age=None, max_age=None, limit=None):
+        """Find the customers matching every given criterion through the secondary indexes of every shard.
+        Args:
+            phone_number (str): Exact phone number
+            last_name (str): Last name, ignoring case
+            last_name_prefix (str): Start of the last name, ignoring case
+            created_by (str): Full name of the employee who created the customer
+            min_age (int): Lowest age, inclusive
+            max_age (int): Highest age, inclusive
+            limit (int): Return at most this many customers, or None for all
+        Returns:
+            list: Matching customers in id order
+        Raises:
+            ValueError: If no criterion is given or an age bound is not a number.
+        """
+        results = [shard.search_customers(phone_number, last_name, last_name_prefix, created_by, min_age, max_age,
+                                          limit)
+                   for shard in self.shards]
+        return list(islice(heapq.merge(*results, key=lambda customer: customer.id), limit))
+
+    def audit(self, reseal=False):
+        """Check every customer of every shard against its checksum and the full model validation.
+        Args:
+            reseal (bool): Seal the valid customers that lack a matching checksum, see CustomerRepository.audit
+        Returns:
+            dict: The merged reports of the shards, see CustomerRepository.audit
+        """
+        report = {'customers': 0, 'unchecked': 0, 'checksum_mismatches': [], 'invalid': {}}
+        if reseal:
+            report['resealed'] = 0
+        for shard in self.shards:
+            shard_report = shard.audit(reseal)
+            report['customers'] += shard_report['customers']
+            report['unchecked'] += shard_report['unchecked']
+            if reseal:
+                report['resealed'] += shard_report['resealed']
+            report['checksum_mismatches'].extend(shard_report['checksum_mismatches'])
+            report['invalid'].update(shard_report['invalid'])
+        return report
+
+    def get_account_columns(self):
+        """Return a read-only snapshot of the account columns of every shard.
+        Returns:
+            AccountColumns: Joined copy of the shard columns
+        """
+        return AccountColumns.concat(shard.get_account_columns() for shard in self.shards)
+
+    @contextmanager
+    def deferred(self):
+        """Buffer the journal writes of every shard until the end of the block."""
+        with ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(shard.deferred())
+            yield self
+
+    def flush(self):
+        """Write the journal entries buffered by deferred() in every shard."""
+        for shard in self.shards:
+            shard.flush()
+
+    def scan(self, function, *args):
+        """Run a function over every shard in worker processes.
+
+        Each worker loads one shard from disk and calls ``function(shard, *args)``
+        with it, so CPU-bound scans run in parallel. Writes buffered by
+        ``deferred`` are flushed first and compaction is held off while the
+        workers read. The workers are started with ``spawn``, so they do not
+        inherit the locks and threads of this process, and their log records
+        are sent back and written here. ``function`` and ``args`` must be
+        picklable, so the function has to be defined at module level, and a
+        script calling scan needs an ``if __name__ == "__main__"`` guard.
+        Args:
+            function (callable): Function taking a CustomerRepository and args
+            args: Extra arguments for the function
+        Returns:
+            list: The result of each shard, in shard order
+        """
+        # The workers read the files, so journal entries buffered by deferred() have to reach them first
+        self.flush()
+        with ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(shard._compaction_lock)
+            futures = [self._process_pool().submit(_scan_shard, shard.file_path,
+                                                   shard.balance_file.path if shard.balance_file else None,
+                                                   function, args)
+                       for shard in self.shards]
+            results = [future.result() for future in futures]
+        logger.info("Scanned %s shards with %s", self.shard_count, function.__name__)
+        return results
+
+    def scan_customers(self, predicate):
+        """Find the ids of every customer satisfying a predicate, hydrating shards in parallel.
+        Args:
+            predicate (callable): Module-level function taking a Customer and returning a bool
+        Returns:
+            list: Ids of the matching customers, in shard order
+        """
+        return [id for ids in self.scan(_matching_ids, predicate) for id in ids]
+
+    def invalidate(self):
+        """Drop the resident indexes of every shard and rebuild them from disk."""
+        for shard in self.shards:
+            shard.invalidate()
+
+    def refresh_if_changed(self):
+        """Rebuild the index of every shard whose files changed.
+        Returns:
+            bool: True if any shard was rebuilt, False otherwise
+        """
+        return any([shard.refresh_if_changed() for shard in self.shards])
+
+    def compact(self):
+        """Fold the journal of every shard into its snapshot, several shards at a time."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(lambda shard: shard.compact(), self.shards))
+
+    def close(self):
+        """Shut down the scan worker processes and close the shards' balance files."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+            self._log_listener.stop()
+            self._log_queue.close()
+        for shard in self.shards:
+            shard.close()
+
+    def _process_pool(self):
+        if self._pool is None:
+            context = multiprocessing.get_context('spawn')
+            self._log_queue = context.Queue()
+            self._log_listener = listen_to_queue(self._log_queue)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=log_to_queue,
+                                             initargs=(self._log_queue, bank_logger.level))
+        return self._pool
+
+    def _group(self, items, key):
+        """Group items by owning shard.
+        Returns:
+            list: (shard, items) pairs for the shards that received items
+        """
+        groups = {}
+        for item in items:
+            groups.setdefault(self.shard_index(key(item)), []).append(item)
+        return [(self.shards[index], group) for index, group in sorted(groups.items())]
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else "data/customers.json"
+    directory = sys.argv[2] if len(sys.argv) > 2 else "data/shards"
+    shard_count = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    repository = ShardedCustomerRepository(directory, shard_count)
+    source_repository = CustomerRepository(source)
+    count = repository.import_records(source_repository.export_records())
+    source_repository.close()
+    repository.compact()
+    repository.close()
+    print(f"Split {count} customers from {source} into {shard_count} shards in {directory}.")
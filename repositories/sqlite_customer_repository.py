@@ -0,0 +1,452 @@
+import sqlite3
+import threading
+from itertools import groupby
+from pathlib import Path
+from utils.logger import get_logger
+from models.Customer import Customer
+from models.BankAccount import BankAccount as Account
+from repositories.account_columns import AccountColumns
+from utils.Constants import MINIMUM_BALANCE
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id TEXT PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    address TEXT,
+    phone_number TEXT NOT NULL,
+    created_by TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    customer_id TEXT NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    account_id TEXT,
+    type TEXT,
+    balance INTEGER NOT NULL,
+    created_by TEXT,
+    minimum_balance INTEGER,
+    transaction_limit INTEGER
+);
+CREATE TABLE IF NOT EXISTS services (
+    id INTEGER PRIMARY KEY,
+    customer_id TEXT NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    type TEXT,
+    is_active INTEGER NOT NULL,
+    approved_by TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_customers_phone_number ON customers(phone_number);
+CREATE INDEX IF NOT EXISTS idx_customers_last_name ON customers(last_name);
+CREATE INDEX IF NOT EXISTS idx_customers_last_name_nocase ON customers(last_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_customers_created_by ON customers(created_by);
+CREATE INDEX IF NOT EXISTS idx_customers_age ON customers(age);
+CREATE INDEX IF NOT EXISTS idx_accounts_customer_id ON accounts(customer_id, position);
+CREATE INDEX IF NOT EXISTS idx_accounts_type ON accounts(type);
+CREATE INDEX IF NOT EXISTS idx_services_customer_id ON services(customer_id, position);
+"""
+
+
+def connect(db_path):
+    """Open a SQLite connection in WAL mode with foreign keys enforced.
+    Args:
+        db_path (str): Path of the database file
+    Returns:
+        sqlite3.Connection: The open connection
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    return connection
+
+
+class SqliteCustomerRepository:
+    """Customer storage in normalized SQLite tables.
+
+    Has the same methods as CustomerRepository. Each mutation is one
+    transaction that only touches the rows of the affected customer.
+    """
+
+    def __init__(self, db_path="data/bank.db"):
+        self.db_path = Path(db_path)
+        self._lock = threading.RLock()
+        self._connection = connect(self.db_path)
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+            self._ensure_column('customers', 'version', 'INTEGER NOT NULL DEFAULT 0')
+            self._ensure_column('accounts', 'account_id', 'TEXT')
+
+    def add_customer(self, new_customer, employee):
+        """Add a new customer to the database with employee tracking.
+        Args:
+            new_customer (Customer): The customer object to add
+            employee (Employee): The employee who created the customer
+        Raises:
+            ValueError: If a customer with the same id already exists.
+        """
+        customer_dict = new_customer.to_dict()
+        customer_dict['created_by'] = employee.full_name
+        try:
+            with self._lock, self._connection:
+                self._insert_record(customer_dict)
+        except sqlite3.IntegrityError:
+            logger.error("Attempted to add an existing customer with ID: %s", new_customer.id)
+            raise ValueError(f"Customer with ID {new_customer.id} already exists")
+        logger.info("Customer %s added successfully.", new_customer.full_name)
+
+    def add_customers(self, new_customers, employee):
+        """Add several new customers in a single transaction.
+        Args:
+            new_customers (iterable): The customer objects to add
+            employee (Employee): The employee who created the customers
+        Returns:
+            list: Ids that were skipped because they already exist
+        """
+        duplicates = []
+        added = 0
+        with self._lock, self._connection:
+            for new_customer in new_customers:
+                customer_dict = new_customer.to_dict()
+                customer_dict['created_by'] = employee.full_name
+                try:
+                    self._insert_record(customer_dict)
+                    added += 1
+                except sqlite3.IntegrityError:
+                    duplicates.append(new_customer.id)
+        if duplicates:
+            logger.warning("Skipped %s customers with existing IDs.", len(duplicates))
+        logger.info("%s customers added successfully.", added)
+        return duplicates
+
+    def update_customer(self, customer_id, customer):
+        """Update an existing customer
+        Args:
+            customer_id (str): The id of the customer to update
+            customer (Customer): The updated customer object
+        """
+        with self._lock, self._connection:
+            updated = self._update_record(customer_id, customer.to_dict())
+        if not updated:
+            logger.warning("Attempted to update non-existent customer with ID: %s", customer_id)
+            return
+        logger.info("Customer %s updated successfully.", customer.full_name)
+
+    def update_customers(self, customers):
+        """Update several existing customers in a single transaction.
+        Args:
+            customers (iterable): The updated customer objects
+        Returns:
+            list: Ids that were skipped because they do not exist
+        """
+        missing = []
+        with self._lock, self._connection:
+            for customer in customers:
+                if not self._update_record(customer.id, customer.to_dict()):
+                    missing.append(customer.id)
+        for customer_id in missing:
+            logger.warning("Attempted to update non-existent customer with ID: %s", customer_id)
+        logger.info("Customers updated successfully.")
+        return missing
+
+    def remove_customer(self, id):
+        """Remove a customer by their id.
+        Args:
+            id (str): The id of the customer to remove
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute("DELETE FROM customers WHERE id = ?", (id,))
+        if cursor.rowcount == 0:
+            logger.warning("Attempted to remove non-existent customer with ID: %s", id)
+            return
+        logger.info("Customer with ID %s removed successfully.", id)
+
+    def get_all_customers(self):
+        """Get all customers."""
+        return list(self.iter_customers())
+
+    def iter_customers(self):
+        """Yield customers one at a time straight from a database cursor.
+        Yields:
+            Customer: The next customer
+        """
+        with self._lock:
+            cursor = self._connection.execute("SELECT * FROM customers ORDER BY rowid")
+        while True:
+            with self._lock:
+                row = cursor.fetchone()
+                if row is None:
+                    return
+                customer_data = self._load_record(row)
+            yield Customer.from_dict(customer_data)
+
+    def find_customer(self, id):
+        """Find a customer by their id.
+        Args:
+            id (str): The id of the customer to find
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM customers WHERE id = ?", (id,)).fetchone()
+            customer_data = self._load_record(row) if row else None
+
+        if customer_data:
+            logger.info("Customer with ID %s found successfully.", id)
+            return Customer.from_dict(customer_data)
+        else:
+            logger.warning("Attempted to find non-existent customer with ID: %s", id)
+            return None
+
+    def search_customers(self, phone_number=None, last_name=None, last_name_prefix=None, created_by=None,
+                         min_age=None, max_age=None, limit=None):
+        """Find the customers matching every given criterion with one indexed query.
+
+        Last names are compared ignoring ASCII case only.
+        Args:
+            phone_number (str): Exact phone number
+            last_name (str): Last name, ignoring case
+            last_name_prefix (str): Start of the last name, ignoring case
+            created_by (str): Full name of the employee who created the customer
+            min_age (int): Lowest age, inclusive
+            max_age (int): Highest age, inclusive
+            limit (int): Return at most this many customers, or None for all
+        Returns:
+            list: Matching customers in id order
+        Raises:
+            ValueError: If no criterion is given or an age bound is not a number.
+        """
+        conditions = []
+        params = []
+        if phone_number is not None:
+            conditions.append("phone_number = ?")
+            params.append(phone_number)
+        if last_name is not None:
+            conditions.append("last_name = ? COLLATE NOCASE")
+            params.append(last_name)
+        if last_name_prefix is not None:
+            conditions.append("last_name >= ? COLLATE NOCASE AND last_name < ? COLLATE NOCASE")
+            params.extend((last_name_prefix, last_name_prefix + '\U0010ffff'))
+        if created_by is not None:
+            conditions.append("created_by = ?")
+            params.append(created_by)
+        try:
+            if min_age is not None:
+                conditions.append("age >= ?")
+                params.append(int(min_age))
+            if max_age is not None:
+                conditions.append("age <= ?")
+                params.append(int(max_age))
+        except (TypeError, ValueError):
+            logger.error("Age bounds must be valid numbers")
+            raise ValueError("Age bounds must be valid numbers")
+        if not conditions:
+            logger.error("Customer search needs at least one criterion")
+            raise ValueError("Customer search needs at least one criterion")
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT * FROM customers WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?",
+                (*params, -1 if limit is None else limit)).fetchall()
+            records = [self._load_record(row) for row in rows]
+        logger.info("Customer search matched %s customers.", len(records))
+        return [Customer.from_dict(record) for record in records]
+
+    def total_balance(self, account_type=None):
+        """Sum the balances of all accounts, or of one account type.
+        Args:
+            account_type (str): Account type value to restrict to, or None for all
+        Returns:
+            int: Total balance
+        """
+        query = "SELECT COALESCE(SUM(balance), 0) FROM accounts"
+        condition, params = self._type_condition(account_type)
+        with self._lock:
+            return self._connection.execute(f"{query} WHERE {condition}", params).fetchone()[0]
+
+    def balance_totals(self, by='type'):
+        """Sum account balances per account type or per creating employee.
+        Args:
+            by (str): 'type' or 'created_by'
+        Returns:
+            dict: Account type or employee name -> total balance
+        """
+        if by == 'type':
+            return {account_type.value: self.total_balance(account_type.value) for account_type in Account.Type}
+        if by != 'created_by':
+            raise ValueError(f"Cannot group balances by {by}")
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT created_by, SUM(balance) FROM accounts GROUP BY created_by").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def customers_below_balance(self, threshold=MINIMUM_BALANCE, account_type=None):
+        """Find the ids of customers holding an account with a balance below a threshold.
+        Args:
+            threshold (int): Balance to compare against
+            account_type (str): Account type value to restrict to, or None for all
+        Returns:
+            list: Ids of the matching customers
+        """
+        condition, params = self._type_condition(account_type)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT DISTINCT customer_id FROM accounts WHERE balance < ? AND {condition}",
+                (threshold, *params)).fetchall()
+        return [row[0] for row in rows]
+
+    def get_account_columns(self):
+        """Load every account into columns with a single query.
+        Returns:
+            AccountColumns: The filled columns
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT c.id, c.age, a.type, a.balance, a.created_by, a.minimum_balance, a.transaction_limit "
+                "FROM customers c LEFT JOIN accounts a ON a.customer_id = c.id "
+                "ORDER BY c.rowid, a.position").fetchall()
+        return AccountColumns.from_records(
+            {
+                'id': id,
+                'age': group[0]['age'],
+                'accounts': [
+                    {key: row[key] for key in ('type', 'balance', 'created_by', 'minimum_balance', 'transaction_limit')
+                     if row[key] is not None}
+                    for row in group if row['balance'] is not None
+                ]
+            }
+            for id, group in ((id, list(group)) for id, group in groupby(rows, key=lambda row: row['id'])))
+
+    def import_records(self, records):
+        """Insert customer dictionaries in a single transaction.
+        Args:
+            records (iterable): Customer dictionaries in the Customer.to_dict format
+        Returns:
+            int: Number of customers inserted
+        """
+        count = 0
+        with self._lock, self._connection:
+            for record in records:
+                self._insert_record(record)
+                count += 1
+        logger.info("Imported %s customers into %s", count, self.db_path)
+        return count
+
+    def close(self):
+        """Close the database connection."""
+        self._connection.close()
+
+    def _ensure_column(self, table, column, definition):
+        """Add a column missing from a database created by an older version."""
+        columns = {row['name'] for row in self._connection.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            self._connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    @staticmethod
+    def _type_condition(account_type):
+        """Build the SQL condition selecting one account type, matching how Customer loads accounts."""
+        if account_type is None:
+            return "1", ()
+        if account_type == Account.Type.SAVINGS.value:
+            return "type = ?", (account_type,)
+        return "(type IS NULL OR type != ?)", (Account.Type.SAVINGS.value,)
+
+    def _update_record(self, customer_id, customer_dict):
+        """Replace the row and child rows of an existing customer.
+        Args:
+            customer_id (str): The id of the customer to update
+            customer_dict (dict): Customer data in the Customer.to_dict format
+        Returns:
+            bool: True if the customer exists, False otherwise
+        """
+        cursor = self._connection.execute(
+            "UPDATE customers SET first_name = ?, last_name = ?, age = ?, address = ?, phone_number = ?, "
+            "version = ? WHERE id = ?",
+            (customer_dict['first_name'], customer_dict['last_name'], customer_dict['age'],
+             customer_dict['address'], customer_dict['phone_number'], customer_dict.get('version', 0),
+             customer_id))
+        if cursor.rowcount == 0:
+            return False
+        self._connection.execute("DELETE FROM accounts WHERE customer_id = ?", (customer_id,))
+        self._connection.execute("DELETE FROM services WHERE customer_id = ?", (customer_id,))
+        self._insert_children(customer_id, customer_dict)
+        return True
+
+    def _insert_record(self, customer_dict):
+        """Insert a customer dictionary and its accounts and services.
+        Args:
+            customer_dict (dict): Customer data in the Customer.to_dict format
+        """
+        self._connection.execute(
+            "INSERT INTO customers (id, first_name, last_name, age, address, phone_number, created_by, version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (customer_dict['id'], customer_dict['first_name'], customer_dict['last_name'], customer_dict['age'],
+             customer_dict['address'], customer_dict['phone_number'], customer_dict.get('created_by'),
+             customer_dict.get('version', 0)))
+        self._insert_children(customer_dict['id'], customer_dict)
+
+    def _insert_children(self, customer_id, customer_dict):
+        """Insert the accounts and services of a customer dictionary.
+        Args:
+            customer_id (str): The id of the owning customer
+            customer_dict (dict): Customer data in the Customer.to_dict format
+        """
+        self._connection.executemany(
+            "INSERT INTO accounts (customer_id, position, account_id, type, balance, created_by, minimum_balance, "
+            "transaction_limit) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(customer_id, position, account.get('id'), account['type'], account['balance'], account.get('created_by'),
+              account.get('minimum_balance'), account.get('transaction_limit'))
+             for position, account in enumerate(customer_dict.get('accounts', []))])
+        self._connection.executemany(
+            "INSERT INTO services (customer_id, position, type, is_active, approved_by) VALUES (?, ?, ?, ?, ?)",
+            [(customer_id, position, service['type'], int(service.get('is_active', True)), service.get('approved_by'))
+             for position, service in enumerate(customer_dict.get('services', []))])
+
+    def _load_record(self, row):
+        """Build a customer dictionary from a customers row and its child rows.
+        Args:
+            row (sqlite3.Row): Row of the customers table
+        Returns:
+            dict: Customer data in the Customer.to_dict format
+        """
+        customer_dict = {
+            'id': row['id'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'age': row['age'],
+            'address': row['address'],
+            'phone_number': row['phone_number'],
+            'version': row['version'],
+            'accounts': [],
+            'services': []
+        }
+        if row['created_by'] is not None:
+            customer_dict['created_by'] = row['created_by']
+
+        for account in self._connection.execute(
+                "SELECT * FROM accounts WHERE customer_id = ? ORDER BY position", (row['id'],)):
+            account_dict = {
+                'type': account['type'],
+                'balance': account['balance'],
+                'created_by': account['created_by']
+            }
+            if account['account_id'] is not None:
+                account_dict['id'] = account['account_id']
+            if account['minimum_balance'] is not None:
+                account_dict['minimum_balance'] = account['minimum_balance']
+            if account['transaction_limit'] is not None:
+                account_dict['transaction_limit'] = account['transaction_limit']
+            customer_dict['accounts'].append(account_dict)
+
+        for service in self._connection.execute(
+                "SELECT * FROM services WHERE customer_id = ? ORDER BY position", (row['id'],)):
+            customer_dict['services'].append({
+                'type': service['type'],
+                'is_active': bool(service['is_active']),
+                'approved_by': service['approved_by']
+            })
+        return customer_dict
@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+from utils.logger import get_logger
+from models.Employee import Employee
+from repositories.sqlite_customer_repository import connect
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    id TEXT PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    position TEXT NOT NULL
+);
+"""
+
+
+class SqliteEmployeeRepository:
+    """Employee storage in a SQLite table with the same methods as EmployeeRepository."""
+
+    def __init__(self, db_path="data/bank.db"):
+        self.db_path = Path(db_path)
+        self._lock = threading.RLock()
+        self._connection = connect(self.db_path)
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def add_employee(self, new_employee):
+        """Add an employee if the id doesn't already exist.
+        Args:
+            new_employee (Employee): The Employee object to add.
+        """
+        employee_dict = new_employee.to_dict()
+        try:
+            with self._lock, self._connection:
+                self._insert_record(employee_dict)
+        except sqlite3.IntegrityError:
+            logger.warning("Attempted to add an existing employee with ID: %s", employee_dict['id'])
+            return
+        logger.info("Employee %s added successfully.", new_employee.full_name)
+
+    def delete_employee(self, id):
+        """Delete an employee by id.
+        Args:
+            id (str): The id of the employee to delete.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute("DELETE FROM employees WHERE id = ?", (id,))
+        if cursor.rowcount == 0:
+            logger.warning("Attempted to remove non-existent employee with ID: %s", id)
+            return
+        logger.info("Employee with ID %s removed successfully.", id)
+
+    def get_all_employees(self):
+        """Get the list of all employees.
+        Returns:
+            list: List of all employees.
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT * FROM employees ORDER BY rowid").fetchall()
+        return [dict(row) for row in rows]
+
+    def find_employee_by(self, id):
+        """Find and return an Employee object by id.
+        Args:
+            id (str): The id of the employee to find.
+        Returns:
+            Employee: The Employee object if found, None otherwise.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM employees WHERE id = ?", (id,)).fetchone()
+        if not row:
+            logger.warning("Attempted to find non-existent employee with ID: %s", id)
+            print(f"Employee with ID {id} not found.")
+            return None
+        else:
+            logger.info("Employee with ID %s found successfully.", id)
+            return Employee.from_dict(dict(row))
+
+    def import_records(self, records):
+        """Insert employee dictionaries in a single transaction.
+        Args:
+            records (iterable): Employee dictionaries in the Employee.to_dict format
+        Returns:
+            int: Number of employees inserted
+        """
+        count = 0
+        with self._lock, self._connection:
+            for record in records:
+                self._insert_record(record)
+                count += 1
+        logger.info("Imported %s employees into %s", count, self.db_path)
+        return count
+
+    def close(self):
+        """Close the database connection."""
+        self._connection.close()
+
+    def _insert_record(self, employee_dict):
+        self._connection.execute(
+            "INSERT INTO employees (id, first_name, last_name, position) VALUES (?, ?, ?, ?)",
+            (employee_dict['id'], employee_dict['first_name'], employee_dict['last_name'], employee_dict['position']))
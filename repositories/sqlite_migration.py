@@ -0,0 +1,54 @@
+"""One-shot migration of the JSON customer and employee files into SQLite.
+
+Usage:
+    python -m repositories.sqlite_migration [customers.json] [employees.json] [bank.db]
+"""
+import sys
+from pathlib import Path
+
+from utils.logger import get_logger
+from repositories.customer_repository import CustomerRepository
+from repositories.employee_repository import EmployeeRepository
+from repositories.sqlite_customer_repository import SqliteCustomerRepository
+from repositories.sqlite_employee_repository import SqliteEmployeeRepository
+
+logger = get_logger(__name__)
+
+
+def migrate(customers_path="data/customers.json", employees_path="data/employees.json", db_path="data/bank.db"):
+    """Copy every customer and employee from the JSON files into a SQLite database.
+    Args:
+        customers_path (str): Path of the customers JSON snapshot; its journal is replayed too
+        employees_path (str): Path of the employees JSON file
+        db_path (str): Path of the SQLite database to fill
+    Returns:
+        tuple: Number of customers and employees migrated
+    Raises:
+        ValueError: If the database already holds customers or employees.
+    """
+    customer_repository = SqliteCustomerRepository(db_path)
+    employee_repository = SqliteEmployeeRepository(db_path)
+    try:
+        if customer_repository.get_all_customers() or employee_repository.get_all_employees():
+            logger.error("Database %s is not empty, refusing to migrate.", db_path)
+            raise ValueError(f"Database {db_path} is not empty")
+
+        customers = 0
+        if Path(customers_path).exists():
+            source = CustomerRepository(customers_path)
+            try:
+                customers = customer_repository.import_records(source.export_records())
+            finally:
+                source.close()
+        employees = employee_repository.import_records(EmployeeRepository(employees_path).get_all_employees())
+    finally:
+        customer_repository.close()
+        employee_repository.close()
+
+    logger.info("Migrated %s customers and %s employees into %s", customers, employees, db_path)
+    return customers, employees
+
+
+if __name__ == "__main__":
+    customers, employees = migrate(*sys.argv[1:4])
+    print(f"Migrated {customers} customers and {employees} employees.")
@@ -0,0 +1,244 @@
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils.logger import get_logger
+from utils.metrics import registry as metrics, timed
+
+logger = get_logger(__name__)
+
+
+class AccountHistory:
+    """In-memory transaction history of one account.
+
+    ``snapshots[j]`` is the balance after the first ``j * interval`` entries,
+    so the balance at any point is one snapshot plus fewer than ``interval``
+    amounts.
+    """
+    __slots__ = ('opened_at', 'times', 'kinds', 'amounts', 'snapshots')
+
+    def __init__(self, opened_at, opening_balance):
+        self.opened_at = opened_at
+        self.times = []
+        self.kinds = []
+        self.amounts = []
+        self.snapshots = [opening_balance]
+
+    def balance_after(self, count, interval):
+        """Balance after the first ``count`` entries."""
+        base = count // interval
+        return self.snapshots[base] + sum(self.amounts[base * interval:count])
+
+
+class TransactionLedger:
+    """Append-only ledger of deposits and withdrawals keyed by account id.
+
+    Every transaction is appended as one JSON line to ``file_path`` and kept in
+    memory per account, with a balance snapshot every ``snapshot_interval``
+    transactions. Balance-as-of queries bisect the transaction times and
+    replay at most one interval, and statements bisect both ends of the range,
+    so both cost O(log n + k) instead of a full replay.
+
+    ``batch`` groups the transactions one thread records into a unit that is
+    recorded whole at the end of the block or, if the block raises, not at
+    all. ``deferred`` is a write buffer shared by every thread: lines are
+    still recorded one at a time, but reach the file only at ``flush`` or at
+    the end of the block.
+    """
+
+    def __init__(self, file_path="data/transactions.jsonl", snapshot_interval=64):
+        self.file_path = Path(file_path)
+        self.snapshot_interval = snapshot_interval
+        self._accounts = {}
+        self._lock = threading.RLock()
+        self._buffer = None
+        self._deferred_depth = 0
+        self._local = threading.local()
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    @timed("transaction_ledger.record")
+    def record(self, account_id, kind, amount, balance):
+        """Append a transaction for an account.
+        Args:
+            account_id (str): The id of the account
+            kind (str): 'deposit' or 'withdraw'
+            amount (int): The amount moved, always positive
+            balance (int): The account balance after the transaction
+        """
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending.append((account_id, kind, amount, balance))
+            return
+        with self._lock:
+            self._append(self._lines(account_id, kind, amount, balance))
+
+    @contextmanager
+    def batch(self):
+        """Record the transactions this thread records inside the block together at the end.
+
+        If the block raises they are dropped, so neither the file nor the
+        in-memory histories see them. Transactions recorded by other threads
+        in the meantime are not part of the batch. A batch opened inside
+        another joins it.
+        """
+        if getattr(self._local, 'pending', None) is not None:
+            yield self
+            return
+        pending = self._local.pending = []
+        try:
+            yield self
+        except BaseException:
+            if pending:
+                logger.warning("Dropped %s ledger transactions of a failed batch", len(pending))
+            raise
+        finally:
+            self._local.pending = None
+        with self._lock:
+            lines = []
+            for transaction in pending:
+                lines += self._lines(*transaction)
+            if lines:
+                self._append(lines)
+
+    @contextmanager
+    def deferred(self):
+        """Buffer the ledger lines written inside the block and append them in one write at the end.
+
+        The buffer is shared by every thread and is written even if the block
+        raises, like the deferred journal of CustomerRepository; use batch to
+        make a group of transactions all-or-nothing.
+        """
+        with self._lock:
+            if self._deferred_depth == 0:
+                self._buffer = []
+            self._deferred_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred_depth -= 1
+                if self._deferred_depth == 0:
+                    lines, self._buffer = self._buffer, None
+                    if lines:
+                        self._append(lines)
+
+    def flush(self):
+        """Write the lines buffered by deferred() so far without leaving the block."""
+        with self._lock:
+            if self._buffer:
+                lines, self._buffer = self._buffer, []
+                self._write_lines(lines)
+
+    @timed("transaction_ledger.balance_as_of")
+    def balance_as_of(self, account_id, when):
+        """Reconstruct the balance of an account at a point in time.
+        Args:
+            account_id (str): The id of the account
+            when (float): Unix timestamp
+        Returns:
+            int: The balance, or None if the ledger has no history for the account at that time
+        """
+        with self._lock:
+            history = self._accounts.get(account_id)
+            if history is None or when < history.opened_at:
+                return None
+            return history.balance_after(bisect_right(history.times, when), self.snapshot_interval)
+
+    @timed("transaction_ledger.statement")
+    def statement(self, account_id, start=None, end=None):
+        """List the transactions of an account in a time range with running balances.
+        Args:
+            account_id (str): The id of the account
+            start (float): First Unix timestamp to include, or None for the beginning
+            end (float): Last Unix timestamp to include, or None for now
+        Returns:
+            list: Dictionaries with time, type, amount and balance
+        """
+        with self._lock:
+            history = self._accounts.get(account_id)
+            if history is None:
+                return []
+            first = 0 if start is None else bisect_left(history.times, start)
+            last = len(history.times) if end is None else bisect_right(history.times, end)
+            balance = history.balance_after(first, self.snapshot_interval)
+            entries = []
+            for i in range(first, last):
+                balance += history.amounts[i]
+                entries.append({
+                    'time': history.times[i],
+                    'type': history.kinds[i],
+                    'amount': abs(history.amounts[i]),
+                    'balance': balance
+                })
+            return entries
+
+    def _lines(self, account_id, kind, amount, balance):
+        """Apply a transaction to its account's history and return the ledger lines for it."""
+        signed = amount if kind == 'deposit' else -amount
+        now = time.time()
+        lines = []
+        history = self._accounts.get(account_id)
+        if history is None:
+            history = self._open(account_id, now, balance - signed)
+            lines.append({'account': account_id, 'op': 'open', 'time': now, 'balance': balance - signed})
+        now = max(now, history.times[-1]) if history.times else now
+        self._apply(history, now, kind, signed)
+        lines.append({'account': account_id, 'op': kind, 'time': now, 'amount': amount, 'balance': balance})
+        return lines
+
+    def _open(self, account_id, when, opening_balance):
+        history = self._accounts[account_id] = AccountHistory(when, opening_balance)
+        return history
+
+    def _apply(self, history, when, kind, signed):
+        history.times.append(when)
+        history.kinds.append(kind)
+        history.amounts.append(signed)
+        if len(history.amounts) % self.snapshot_interval == 0:
+            history.snapshots.append(history.balance_after(len(history.amounts) - 1, self.snapshot_interval)
+                                     + signed)
+
+    def _append(self, lines):
+        if self._buffer is not None:
+            self._buffer.extend(lines)
+            return
+        self._write_lines(lines)
+
+    @timed("transaction_ledger.write_lines")
+    def _write_lines(self, lines):
+        try:
+            with open(self.file_path, 'a') as f:
+                metrics.increment('transaction_ledger.bytes_written',
+                                  f.write(''.join(json.dumps(line, separators=(',', ':')) + '\n' for line in lines)))
+        except Exception as e:
+            logger.error("Failed to append to ledger %s: %s", self.file_path, e)
+            raise
+
+    @timed("transaction_ledger.load")
+    def _load(self):
+        """Rebuild the in-memory histories from the ledger file."""
+        if not self.file_path.exists():
+            return
+        with open(self.file_path, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Skipping corrupt ledger entry at %s:%s", self.file_path, line_number)
+                    continue
+                op = entry['op']
+                if op == 'open':
+                    self._open(entry['account'], entry['time'], entry['balance'])
+                elif op in ('deposit', 'withdraw'):
+                    signed = entry['amount'] if op == 'deposit' else -entry['amount']
+                    history = self._accounts.get(entry['account'])
+                    if history is None:
+                        history = self._open(entry['account'], entry['time'], entry['balance'] - signed)
+                    self._apply(history, entry['time'], op, signed)
+        logger.info("Ledger %s loaded with %s accounts.", self.file_path, len(self._accounts))
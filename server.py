@@ -0,0 +1,307 @@
+"""HTTP JSON API over Bank.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8080] [--workers 32] [--data-dir data] [--flush-interval 0]
+
+Endpoints:
+    GET    /customers?offset=0&limit=100     List customers
+    GET    /customers/search?last_name=...   Search customers by phone_number, last_name, last_name_prefix,
+                                             created_by, min_age and max_age, up to limit
+    POST   /customers                        Add a customer
+    GET    /customers/{id}                   Find a customer
+    DELETE /customers/{id}                   Remove a customer
+    POST   /customers/{id}/accounts          Open an account
+    POST   /customers/{id}/services          Apply for a service
+    POST   /customers/{id}/deposit           Deposit into an account
+    POST   /customers/{id}/withdraw          Withdraw from an account
+    GET    /employees                        List employees
+    POST   /employees                        Add an employee
+    GET    /employees/{id}                   Find an employee
+    GET    /metrics                          Bank.metrics() snapshot
+
+Adding a customer, opening an account and applying for a service act on
+behalf of the employee named by ``employee_id`` in the request body, whose
+permissions are checked; a request without one is answered with 400.
+"""
+import argparse
+import contextlib
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from itertools import islice
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from utils.logger import get_logger
+from repositories.customer_repository import CustomerRepository
+from repositories.employee_repository import EmployeeRepository
+from repositories.transaction_ledger import TransactionLedger
+from services.Bank import Bank
+
+logger = get_logger(__name__)
+
+
+class NotFound(Exception):
+    """Raised by a route when the requested resource does not exist."""
+
+
+def list_customers(bank, query, body):
+    offset = int(query.get('offset', 0))
+    limit = int(query.get('limit', 100))
+    return 200, [customer.to_dict() for customer in islice(bank.iter_customers(), offset, offset + limit)]
+
+
+def search_customers(bank, query, body):
+    criteria = {key: query[key] for key in ('phone_number', 'last_name', 'last_name_prefix', 'created_by',
+                                            'min_age', 'max_age') if key in query}
+    limit = int(query.get('limit', 100))
+    return 200, [customer.to_dict() for customer in bank.search_customers(limit=limit, **criteria)]
+
+
+def _employee_id(body):
+    """Return the id of the employee making a request.
+    Raises:
+        ValueError: If the body names no employee, answered with 400.
+    """
+    value = body.get('employee_id')
+    if not value:
+        raise ValueError("employee_id is required")
+    return value
+
+
+def add_customer(bank, query, body):
+    employee = bank.find_employee(_employee_id(body))
+    if not employee:
+        raise ValueError("Employee not found")
+    customer = bank.add_customer(body.get('id'), body.get('first_name'), body.get('last_name'), body.get('age'),
+                                 body.get('address'), body.get('phone_number'), employee)
+    return 201, customer.to_dict()
+
+
+def find_customer(bank, query, body, customer_id):
+    customer = bank.find_customer(customer_id)
+    if not customer:
+        raise NotFound(f"Customer {customer_id} not found")
+    return 200, customer.to_dict()
+
+
+def remove_customer(bank, query, body, customer_id):
+    if not bank.find_customer(customer_id):
+        raise NotFound(f"Customer {customer_id} not found")
+    bank.remove_customer(customer_id)
+    return 200, {'id': customer_id, 'removed': True}
+
+
+def open_account(bank, query, body, customer_id):
+    account = bank.open_account(customer_id, body.get('account_type'), body.get('initial_deposit', 0),
+                                _employee_id(body))
+    return 201, account.to_dict()
+
+
+def apply_for_service(bank, query, body, customer_id):
+    approved = bank.apply_for_service(customer_id, body.get('service_type'), _employee_id(body))
+    return 200, {'approved': approved}
+
+
+def deposit(bank, query, body, customer_id):
+    return 200, {'balance': bank.deposit(customer_id, body.get('account_type'), body.get('amount'))}
+
+
+def withdraw(bank, query, body, customer_id):
+    return 200, {'applied': bank.withdraw(customer_id, body.get('account_type'), body.get('amount'))}
+
+
+def list_employees(bank, query, body):
+    return 200, bank.get_all_employees()
+
+
+def add_employee(bank, query, body):
+    employee = bank.add_employee(body.get('id'), body.get('first_name'), body.get('last_name'), body.get('position'))
+    return 201, employee.to_dict()
+
+
+def find_employee(bank, query, body, employee_id):
+    employee = bank.find_employee(employee_id)
+    if not employee:
+        raise NotFound(f"Employee {employee_id} not found")
+    return 200, employee.to_dict()
+
+
+def metrics(bank, query, body):
+    return 200, bank.metrics()
+
+
+ROUTES = [
+    ('GET', r'/customers', list_customers),
+    ('POST', r'/customers', add_customer),
+    ('GET', r'/customers/search', search_customers),
+    ('GET', r'/customers/([^/]+)', find_customer),
+    ('DELETE', r'/customers/([^/]+)', remove_customer),
+    ('POST', r'/customers/([^/]+)/accounts', open_account),
+    ('POST', r'/customers/([^/]+)/services', apply_for_service),
+    ('POST', r'/customers/([^/]+)/deposit', deposit),
+    ('POST', r'/customers/([^/]+)/withdraw', withdraw),
+    ('GET', r'/employees', list_employees),
+    ('POST', r'/employees', add_employee),
+    ('GET', r'/employees/([^/]+)', find_employee),
+    ('GET', r'/metrics', metrics),
+]
+ROUTES = [(method, re.compile(pattern + r'/?'), handler) for method, pattern, handler in ROUTES]
+
+
+class BankRequestHandler(BaseHTTPRequestHandler):
+    """Route JSON requests to Bank, keeping the connection open between requests."""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, which Nagle's algorithm would delay on keep-alive connections
+    disable_nagle_algorithm = True
+    # Idle keep-alive connections are closed after this many seconds to free their worker
+    timeout = 30
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            body = self._read_body()
+            for route_method, pattern, handler in ROUTES:
+                match = pattern.fullmatch(url.path)
+                if match and route_method == method:
+                    status, payload = handler(self.server.bank, query, body, *match.groups())
+                    break
+            else:
+                raise NotFound(f"No route for {method} {url.path}")
+        except NotFound as e:
+            status, payload = 404, {'error': str(e)}
+        except (ValueError, TypeError) as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            logger.error("Unexpected error handling %s %s: %s", method, self.path, e)
+            status, payload = 500, {'error': "Internal server error"}
+        self._send_json(status, payload)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON body: {e}")
+        if not isinstance(body, dict):
+            raise ValueError("JSON body must be an object")
+        return body
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - " + format, self.client_address[0], *args)
+
+
+class BankHTTPServer(HTTPServer):
+    """HTTP server handing each connection to a bounded pool of worker threads.
+
+    A connection keeps its worker until the client closes it or it idles past
+    the handler timeout. Once every worker is busy and ``backlog`` more
+    connections are waiting, the accept loop stops taking new connections
+    until a worker frees up.
+    """
+
+    def __init__(self, address, bank, workers=32, backlog=None):
+        super().__init__(address, BankRequestHandler)
+        self.bank = bank
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http-worker")
+        self._slots = threading.BoundedSemaphore(workers + (workers if backlog is None else backlog))
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def make_bank(data_dir):
+    """Create a Bank over the files of a data directory with a balance file.
+
+    The customer repository has no identity map: every request hydrates its
+    own Customer from the resident index, so worker threads never share a
+    model object and a failed mutation leaves nothing behind.
+    """
+    data_dir = Path(data_dir)
+    return Bank(
+        CustomerRepository(data_dir / "customers.json", balance_file=data_dir / "balances.bin", warm_start=True),
+        EmployeeRepository(data_dir / "employees.json"),
+        TransactionLedger(data_dir / "transactions.jsonl")
+    )
+
+
+def serve(host="127.0.0.1", port=8080, workers=32, data_dir="data", flush_interval=0):
+    """Serve the bank until interrupted.
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on
+        workers (int): Number of worker threads
+        data_dir (str): Directory of the customer, employee and ledger files
+        flush_interval (float): If positive, buffer writes and flush them every this many seconds
+    """
+    bank = make_bank(data_dir)
+    server = BankHTTPServer((host, port), bank, workers=workers)
+    stop = threading.Event()
+    with bank.deferred() if flush_interval > 0 else contextlib.nullcontext():
+        if flush_interval > 0:
+            def flush():
+                while not stop.wait(flush_interval):
+                    bank.flush()
+            threading.Thread(target=flush, name="bank-flush", daemon=True).start()
+        logger.warning("Serving the bank API on http://%s:%s with %s workers", host, server.server_port, workers)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            server.server_close()
+    logger.warning("Bank API stopped.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the bank as a JSON HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=32, help="worker threads, i.e. concurrent connections")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--flush-interval", type=float, default=0,
+                        help="buffer writes and flush them every this many seconds (default: write every request)")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.data_dir, args.flush_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from utils.logger import get_logger
+from repositories.async_customer_repository import AsyncCustomerRepository
+from repositories.async_employee_repository import AsyncEmployeeRepository
+from repositories.async_transaction_ledger import AsyncTransactionLedger
+from services.Bank import Bank
+from utils.Constants import MINIMUM_BALANCE
+
+logger = get_logger(__name__)
+
+class AsyncBank:
+    """Coroutine facade over Bank for serving many requests from one event loop.
+
+    The wrapped Bank runs on the async repositories, whose state is resident
+    in memory and whose disk writes are queued on batch writers. Mutations
+    therefore run directly on the loop without blocking, and each one then
+    awaits the writers, so every request that arrives while a write is in
+    flight is committed by the next single write. Full scans are run in a
+    worker thread.
+    """
+
+    def __init__(self, bank):
+        """Wrap a Bank built on async repositories
+        Args:
+            bank (Bank): Bank using AsyncCustomerRepository, AsyncEmployeeRepository and AsyncTransactionLedger
+        """
+        self.bank = bank
+        self._writers = [bank.customer_repository.writer, bank.employee_repository.writer,
+                         bank.transaction_ledger.writer]
+
+    @classmethod
+    async def open(cls, customers_path="data/customers.json", employees_path="data/employees.json",
+                   transactions_path="data/transactions.jsonl", **repository_options):
+        """Load the repositories off the loop and start their writers
+        Args:
+            customers_path (str): Customer snapshot file
+            employees_path (str): Employee file
+            transactions_path (str): Transaction ledger file
+            repository_options: Extra keyword arguments of CustomerRepository
+        Returns:
+            AsyncBank: The opened bank
+        """
+        customer_repository, employee_repository, transaction_ledger = await asyncio.gather(
+            AsyncCustomerRepository.open(customers_path, **repository_options),
+            AsyncEmployeeRepository.open(employees_path),
+            AsyncTransactionLedger.open(transactions_path)
+        )
+        logger.info("Async bank opened.")
+        return cls(Bank(customer_repository, employee_repository, transaction_ledger))
+
+    async def close(self):
+        """Write everything still queued, stop the writers and close the balance file"""
+        await asyncio.gather(self.bank.customer_repository.aclose(), self.bank.employee_repository.aclose(),
+                             self.bank.transaction_ledger.aclose())
+        logger.info("Async bank closed.")
+
+    async def flush(self):
+        """Wait until every queued write has reached the disk"""
+        await asyncio.gather(*(writer.flush() for writer in self._writers))
+
+    @asynccontextmanager
+    async def _committed(self):
+        """Run a mutation and wait until its writes are on disk
+        Raises:
+            Exception: The error of a failed write that carried the mutation
+        """
+        marks = [writer.mark() for writer in self._writers]
+        try:
+            yield
+        finally:
+            # Also waited for when the mutation raised, which releases the marks
+            await asyncio.gather(*(writer.flush(mark) for writer, mark in zip(self._writers, marks)))
+
+    async def add_employee(self, id, first_name, last_name, position):
+        """Add a new employee to the bank, see Bank.add_employee"""
+        async with self._committed():
+            return self.bank.add_employee(id, first_name, last_name, position)
+
+    async def find_employee(self, id):
+        """Find an employee by their id, see Bank.find_employee"""
+        return self.bank.find_employee(id)
+
+    async def get_all_employees(self):
+        """Get all employees, see Bank.get_all_employees"""
+        return self.bank.get_all_employees()
+
+    async def add_customer(self, id, first_name, last_name, age, address, phone_number, employee):
+        """Add a new customer to the bank, see Bank.add_customer"""
+        async with self._committed():
+            return self.bank.add_customer(id, first_name, last_name, age, address, phone_number, employee)
+
+    async def bulk_add_customers(self, records, employee, chunk_size=None):
+        """Add many customers from dictionaries, see Bank.bulk_add_customers"""
+        async with self._committed():
+            return self.bank.bulk_add_customers(records, employee, chunk_size)
+
+    async def find_customer(self, id):
+        """Find a customer by their id, see Bank.find_customer"""
+        return self.bank.find_customer(id)
+
+    async def get_all_customers(self):
+        """Get all customers, hydrated in a worker thread, see Bank.get_all_customers"""
+        return await asyncio.to_thread(self.bank.get_all_customers)
+
+    async def search_customers(self, phone_number=None, last_name=None, last_name_prefix=None, created_by=None,
+                               min_age=None, max_age=None, limit=None):
+        """Find customers through the secondary indexes, see Bank.search_customers"""
+        return self.bank.search_customers(phone_number, last_name, last_name_prefix, created_by, min_age, max_age,
+                                          limit)
+
+    async def remove_customer(self, id):
+        """Remove a customer by their id, see Bank.remove_customer"""
+        async with self._committed():
+            return self.bank.remove_customer(id)
+
+    async def open_account(self, customer_id, account_type, initial_deposit, employee_id):
+        """Open a new account for a customer, see Bank.open_account"""
+        async with self._committed():
+            return self.bank.open_account(customer_id, account_type, initial_deposit, employee_id)
+
+    async def apply_for_service(self, customer_id, service_type, employee_id):
+        """Apply for a service for a customer, see Bank.apply_for_service"""
+        async with self._committed():
+            return self.bank.apply_for_service(customer_id, service_type, employee_id)
+
+    async def deposit(self, customer_id, account_type, amount):
+        """Deposit into an account of a customer, see Bank.deposit"""
+        async with self._committed():
+            return self.bank.deposit(customer_id, account_type, amount)
+
+    async def withdraw(self, customer_id, account_type, amount):
+        """Withdraw from an account of a customer, see Bank.withdraw"""
+        async with self._committed():
+            return self.bank.withdraw(customer_id, account_type, amount)
+
+    async def apply_transactions(self, postings):
+        """Apply a stream of postings in one pass, see Bank.apply_transactions"""
+        async with self._committed():
+            return self.bank.apply_transactions(postings)
+
+    async def eligible_customers(self, service_type=None):
+        """Find eligible customers in a worker thread, see Bank.eligible_customers"""
+        return await asyncio.to_thread(self.bank.eligible_customers, service_type)
+
+    async def total_balance(self, account_type=None):
+        """Total balance held across all accounts, see Bank.total_balance"""
+        return self.bank.total_balance(account_type)
+
+    async def balance_totals(self, by='type'):
+        """Total balances per account type or creator, see Bank.balance_totals"""
+        return self.bank.balance_totals(by)
+
+    async def customers_below_balance(self, threshold=MINIMUM_BALANCE, account_type=None):
+        """Find customers below a balance in a worker thread, see Bank.customers_below_balance"""
+        return await asyncio.to_thread(self.bank.customers_below_balance, threshold, account_type)
+
+    async def balance_as_of(self, account_id, when):
+        """Balance of an account at a point in time, see Bank.balance_as_of"""
+        return self.bank.balance_as_of(account_id, when)
+
+    async def account_statement(self, account_id, start=None, end=None):
+        """Transactions of an account in a time range, see Bank.account_statement"""
+        return self.bank.account_statement(account_id, start, end)
+
+    async def refresh_if_changed(self):
+        """Reload the customer index in a worker thread if another process changed the files
+        Returns:
+            bool: True if the index was rebuilt, False otherwise
+        """
+        await self.flush()
+        return await asyncio.to_thread(self.bank.customer_repository.refresh_if_changed)
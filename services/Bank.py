@@ -1,4 +1,9 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
 
+from utils.logger import get_logger
+from utils.metrics import registry, timed
 from models.CheckingAccount import CheckingAccount
 from models.SavingAccount import SavingAccount
 from models.CreditCardService import CreditCardService
@@ -9,12 +14,54 @@ from models.Employee import Employee
 from repositories.customer_repository import CustomerRepository
 from repositories.employee_repository import EmployeeRepository
 from models.Customer import Customer
+from services.EligibilityEngine import EligibilityEngine
+from services.EligibilityCache import EligibilityCache
+from utils.Constants import MINIMUM_BALANCE
+
+logger = get_logger(__name__)
 
 class Bank:
-    def __init__(self):
-        self.customer_repository = CustomerRepository()
-        self.employee_repository = EmployeeRepository()
+    # Number of striped locks guarding customer mutations
+    LOCK_STRIPES = 64
+
+    def __init__(self, customer_repository=None, employee_repository=None, transaction_ledger=None):
+        """Create a bank on top of customer and employee repositories
+        Args:
+            customer_repository: Customer storage, a JSON CustomerRepository by default
+            employee_repository: Employee storage, a JSON EmployeeRepository by default
+            transaction_ledger (TransactionLedger): Ledger that deposits and withdrawals are recorded in,
+                or None to keep no transaction history
+        """
+        self.customer_repository = customer_repository or CustomerRepository()
+        self.employee_repository = employee_repository or EmployeeRepository()
+        self.transaction_ledger = transaction_ledger
+        self.eligibility_cache = EligibilityCache()
+        self._customer_locks = [threading.RLock() for _ in range(self.LOCK_STRIPES)]
+
+    def customer_lock(self, customer_id):
+        """Lock serializing every read-modify-write of one customer
+        Customers are spread over a fixed set of striped locks, so the lock may be
+        shared with other customers but is always the same for a given id.
+        Args:
+            customer_id (str): The customer's id
+        Returns:
+            threading.RLock: The lock for the customer
+        """
+        return self._customer_locks[hash(customer_id) % self.LOCK_STRIPES]
+
+    def _lock_customers(self, customer_ids):
+        """Acquire the locks of several customers in a fixed order to avoid deadlocks
+        Args:
+            customer_ids (iterable): The customers' ids
+        Returns:
+            ExitStack: Context manager holding the locks
+        """
+        stack = ExitStack()
+        for stripe in sorted({hash(customer_id) % self.LOCK_STRIPES for customer_id in customer_ids}):
+            stack.enter_context(self._customer_locks[stripe])
+        return stack
 
+    @timed("bank.add_employee")
     def add_employee(self, id, first_name, last_name, position):
         """Add a new employee to the bank
         Args:
@@ -32,6 +79,7 @@ class Bank:
         self.employee_repository.add_employee(employee)
         return employee
 
+    @timed("bank.find_employee")
     def find_employee(self, id):
         """Find an employee by their id
         Args:
@@ -41,6 +89,7 @@ class Bank:
         """
         return self.employee_repository.find_employee_by(id)
 
+    @timed("bank.get_all_employees")
     def get_all_employees(self):
         """Get all employees
         Returns:
@@ -48,6 +97,7 @@ class Bank:
         """
         return self.employee_repository.get_all_employees()
 
+    @timed("bank.apply_for_service")
     def apply_for_service(self, customer_id, service_type, employee_id):
         """Apply for a service for a customer
         Args:
@@ -68,17 +118,33 @@ class Bank:
         else:
             return False
         
-        customer = self.find_customer(customer_id)
-        if not customer:
-            return False
+        with self.customer_lock(customer_id):
+            customer = self.find_customer(customer_id)
+            if not customer:
+                return False
 
-        canApply = customer.can_apply_for_service(service)
-        if canApply:
-            service.approve(self.find_employee(employee_id))
-        customer.services.append(service)
-        self.customer_repository.update_customer(customer.id, customer)
+            canApply = customer.can_apply_for_service(service, self.eligibility_cache)
+            if canApply:
+                service.approve(self.find_employee(employee_id))
+            customer.services.append(service)
+            self.customer_repository.update_customer(customer.id, customer)
         return canApply
 
+    @timed("bank.eligible_customers")
+    def eligible_customers(self, service_type=None):
+        """Find every customer eligible for a service in one pass over the account columns
+        Args:
+            service_type (str): Service type to check, or None for every service type
+        Returns:
+            list: Eligible customer ids when service_type is given
+            dict: Service type -> eligible customer ids otherwise
+        """
+        engine = EligibilityEngine(self.customer_repository.get_account_columns())
+        if service_type is None:
+            return engine.evaluate()
+        return engine.eligible_ids(service_type)
+
+    @timed("bank.open_account")
     def open_account(self, customer_id, account_type, initial_deposit, employee_id):
         """Open a new account for a customer
         Args:
@@ -94,10 +160,6 @@ class Bank:
         if not employee.can_open_accounts():
             raise ValueError("Employee is not authorized to open accounts")
 
-        customer = self.find_customer(customer_id)
-        if not customer:
-            raise ValueError("Customer not found")
-        
         if account_type == Account.Type.SAVINGS.value:
             account = SavingAccount(created_by=employee.full_name, balance=initial_deposit)
         elif account_type == Account.Type.CHECKING.value:
@@ -105,10 +167,86 @@ class Bank:
         else:
             raise ValueError("Invalid account type")
 
-        customer.add_account(account)
-        self.customer_repository.update_customer(customer.id, customer)
+        with self.customer_lock(customer_id):
+            customer = self.find_customer(customer_id)
+            if not customer:
+                raise ValueError("Customer not found")
+
+            customer.add_account(account)
+            self.customer_repository.update_customer(customer.id, customer)
         return account
 
+    @timed("bank.deposit")
+    def deposit(self, customer_id, account_type, amount):
+        """Deposit into the first account of a type held by a customer
+        Args:
+            customer_id (str): The customer's id
+            account_type (str): The type of account to deposit into
+            amount (int): The amount to deposit
+        Returns:
+            int: The new balance
+        Raises:
+            ValueError: If the customer or account is not found, or the amount is invalid
+        """
+        with self.customer_lock(customer_id):
+            customer, account = self._find_account(customer_id, account_type)
+            account.deposit(amount)
+            self._store_balance(customer, account)
+            self._record(account, 'deposit', int(amount))
+            return account.balance
+
+    @timed("bank.withdraw")
+    def withdraw(self, customer_id, account_type, amount):
+        """Withdraw from the first account of a type held by a customer
+        Args:
+            customer_id (str): The customer's id
+            account_type (str): The type of account to withdraw from
+            amount (int): The amount to withdraw
+        Returns:
+            bool: True if the withdrawal was applied, False if the account rules denied it
+        Raises:
+            ValueError: If the customer or account is not found, or the amount is invalid
+        """
+        amount = int(amount)
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
+        with self.customer_lock(customer_id):
+            customer, account = self._find_account(customer_id, account_type)
+            if not account.withdraw(amount):
+                return False
+            self._store_balance(customer, account)
+            self._record(account, 'withdraw', amount)
+            return True
+
+    def _store_balance(self, customer, account):
+        """Persist a balance change, in place if the repository keeps a balance file"""
+        update_balance = getattr(self.customer_repository, 'update_balance', None)
+        if update_balance is not None:
+            update_balance(customer, account)
+        else:
+            self.customer_repository.update_customer(customer.id, customer)
+
+    def _record(self, account, kind, amount):
+        """Write a deposit or withdrawal to the transaction ledger, if the bank keeps one
+        Called once the new balance is stored, so the account id the ledger files it under is stored too.
+        """
+        if self.transaction_ledger is not None:
+            self.transaction_ledger.record(account.id, kind, amount, account.balance)
+
+    def _find_account(self, customer_id, account_type):
+        """Find a customer and its first account of a type
+        Raises:
+            ValueError: If the customer or account is not found
+        """
+        customer = self.find_customer(customer_id)
+        if not customer:
+            raise ValueError("Customer not found")
+        account = next((acc for acc in customer.accounts if acc.type == account_type), None)
+        if not account:
+            raise ValueError(f"No {account_type} account found for this customer")
+        return customer, account
+
+    @timed("bank.add_customer")
     def add_customer(self, id, first_name, last_name, age, address, phone_number, employee):
         """Add a new customer to the bank
         Args:
@@ -130,13 +268,193 @@ class Bank:
         self.customer_repository.add_customer(customer,employee)
         return customer
 
+    @timed("bank.bulk_add_customers")
+    def bulk_add_customers(self, records, employee, chunk_size=None):
+        """Add many customers from an iterable of dictionaries
+        Each record is validated through the Customer setters. Invalid rows,
+        rows that are not dictionaries, duplicate ids and rows the reader
+        could not parse (yielded as exceptions, see onboard.read_records) are
+        reported without aborting the batch. If the records iterable itself
+        raises, the rows read before it are still stored.
+        Args:
+            records (iterable): Dictionaries with id, first_name, last_name, age, address and phone_number
+            employee (Employee): The employee who created the customers
+            chunk_size (int): Number of customers per repository write, or None for a single write
+        Returns:
+            dict: Counts of added and failed rows, per-row errors, elapsed seconds and rows per second
+        """
+        start = time.perf_counter()
+        added = 0
+        rows = 0
+        errors = []
+        pending = []
+        pending_rows = {}
+
+        def flush():
+            nonlocal added
+            duplicates = self.customer_repository.add_customers(pending, employee)
+            for id in duplicates:
+                errors.append({'row': pending_rows[id], 'id': id, 'error': f"Customer with ID {id} already exists"})
+            added += len(pending) - len(duplicates)
+            pending.clear()
+            pending_rows.clear()
+
+        try:
+            for row, record in enumerate(records, 1):
+                rows = row
+                if isinstance(record, Exception):
+                    errors.append({'row': row, 'id': None, 'error': str(record)})
+                    continue
+                if not isinstance(record, dict):
+                    errors.append({'row': row, 'id': None,
+                                   'error': f"Expected a customer object, got {type(record).__name__}"})
+                    continue
+                try:
+                    customer = Customer(
+                        id=record.get('id'),
+                        first_name=record.get('first_name'),
+                        last_name=record.get('last_name'),
+                        age=record.get('age'),
+                        address=record.get('address'),
+                        phone_number=record.get('phone_number')
+                    )
+                except (ValueError, TypeError, AttributeError) as e:
+                    errors.append({'row': row, 'id': record.get('id'), 'error': str(e)})
+                    continue
+                if customer.id in pending_rows:
+                    errors.append({'row': row, 'id': customer.id,
+                                   'error': f"Customer with ID {customer.id} already exists"})
+                    continue
+                pending.append(customer)
+                pending_rows[customer.id] = row
+                if chunk_size and len(pending) >= chunk_size:
+                    flush()
+        finally:
+            if pending:
+                flush()
+
+        elapsed = time.perf_counter() - start
+        report = {
+            'rows': rows,
+            'added': added,
+            'failed': len(errors),
+            'errors': sorted(errors, key=lambda error: error['row']),
+            'elapsed': elapsed,
+            'rows_per_second': rows / elapsed if elapsed > 0 else 0.0
+        }
+        logger.info("Bulk onboarding added %s of %s customers in %.2fs (%.0f rows/s)",
+                    added, rows, elapsed, report['rows_per_second'])
+        return report
+
+    @timed("bank.apply_transactions")
+    def apply_transactions(self, postings):
+        """Apply a stream of deposit and withdrawal postings in one pass
+        Postings are grouped by customer and applied in their original order with
+        the SavingAccount/CheckingAccount withdraw rules. Every touched customer is
+        persisted in a single repository write, and the applied postings are
+        recorded in the ledger only once that write has succeeded.
+        Args:
+            postings (iterable): Dictionaries with customer_id, operation ('deposit' or 'withdraw'),
+                amount, and either account_id or account_type
+        Returns:
+            dict: Per-posting results, counts, elapsed seconds and postings per second
+        """
+        start = time.perf_counter()
+        results = []
+        by_customer = {}
+        for number, posting in enumerate(postings, 1):
+            result = {
+                'posting': number,
+                'customer_id': posting.get('customer_id'),
+                'operation': posting.get('operation'),
+                'amount': posting.get('amount')
+            }
+            results.append(result)
+            by_customer.setdefault(result['customer_id'], []).append((posting, result))
+
+        touched = []
+        with self._lock_customers(by_customer), \
+                (self.transaction_ledger.batch() if self.transaction_ledger is not None else nullcontext()):
+            for customer_id, group in by_customer.items():
+                customer = self.find_customer(customer_id)
+                if not customer:
+                    for _, result in group:
+                        result.update(status='error', error="Customer not found")
+                    continue
+                applied = [self._apply_posting(customer, posting, result) for posting, result in group]
+                if any(applied):
+                    touched.append(customer)
+            if touched:
+                self.customer_repository.update_customers(touched)
+
+        elapsed = time.perf_counter() - start
+        counts = {status: 0 for status in ('applied', 'rejected', 'error')}
+        for result in results:
+            counts[result['status']] += 1
+        report = {
+            'postings': len(results),
+            **counts,
+            'customers': len(touched),
+            'results': results,
+            'elapsed': elapsed,
+            'postings_per_second': len(results) / elapsed if elapsed > 0 else 0.0
+        }
+        logger.info("Applied %s of %s postings for %s customers in %.2fs (%.0f postings/s)",
+                    counts['applied'], len(results), len(touched), elapsed, report['postings_per_second'])
+        return report
+
+    def _apply_posting(self, customer, posting, result):
+        """Apply one posting to a hydrated customer and fill in its result
+        Args:
+            customer (Customer): The customer owning the account
+            posting (dict): The posting to apply
+            result (dict): The result entry to update with status, balance or error
+        Returns:
+            bool: True if the posting changed a balance, False otherwise
+        """
+        account = next(
+            (acc for acc in customer.accounts
+             if acc.id == posting.get('account_id') or
+             (not posting.get('account_id') and acc.type == posting.get('account_type'))),
+            None
+        )
+        if not account:
+            result.update(status='error', error="Account not found")
+            return False
+
+        try:
+            amount = int(posting.get('amount'))
+            if amount <= 0:
+                raise ValueError("Amount must be positive")
+            if posting.get('operation') == 'deposit':
+                account.deposit(amount)
+                result['status'] = 'applied'
+            elif posting.get('operation') == 'withdraw':
+                result['status'] = 'applied' if account.withdraw(amount) else 'rejected'
+            else:
+                raise ValueError(f"Unknown operation: {posting.get('operation')}")
+        except (TypeError, ValueError) as e:
+            result.update(status='error', error=str(e))
+            return False
+
+        result['account_id'] = account.id
+        result['balance'] = account.balance
+        if result['status'] != 'applied':
+            return False
+        self._record(account, posting['operation'], amount)
+        return True
+
+    @timed("bank.remove_customer")
     def remove_customer(self, id):
         """Remove a customer by their id
         Args:
             id (str): The id of the customer to remove
         """
-        return self.customer_repository.remove_customer(id)
+        with self.customer_lock(id):
+            self.eligibility_cache.invalidate(id)
+            return self.customer_repository.remove_customer(id)
 
+    @timed("bank.get_all_customers")
     def get_all_customers(self):
         """Get all customers
         Returns:
@@ -144,6 +462,14 @@ class Bank:
         """
         return self.customer_repository.get_all_customers()
 
+    def iter_customers(self):
+        """Iterate over all customers without building a list
+        Returns:
+            iterator: Customers, hydrated one at a time
+        """
+        return self.customer_repository.iter_customers()
+
+    @timed("bank.find_customer")
     def find_customer(self, id):
         """Find a customer by their id
         Args:
@@ -151,5 +477,147 @@ class Bank:
         """
         return self.customer_repository.find_customer(id)
 
+    @timed("bank.search_customers")
+    def search_customers(self, phone_number=None, last_name=None, last_name_prefix=None, created_by=None,
+                         min_age=None, max_age=None, limit=None):
+        """Find customers by phone number, last name, creating employee or age range
+        The repository answers from its secondary indexes, so customers that do not match are never loaded.
+        Args:
+            phone_number (str): Exact phone number
+            last_name (str): Last name, ignoring case
+            last_name_prefix (str): Start of the last name, ignoring case
+            created_by (str): Full name of the employee who created the customer
+            min_age (int): Lowest age, inclusive
+            max_age (int): Highest age, inclusive
+            limit (int): Return at most this many customers, or None for all
+        Returns:
+            list: Customers matching every given criterion, in id order
+        Raises:
+            ValueError: If no criterion is given or an age bound is not a number.
+        """
+        return self.customer_repository.search_customers(phone_number, last_name, last_name_prefix, created_by,
+                                                         min_age, max_age, limit)
+
+    @timed("bank.balance_as_of")
+    def balance_as_of(self, account_id, when):
+        """Balance of an account at a point in time, from the transaction ledger
+        Args:
+            account_id (str): The id of the account
+            when (float): Unix timestamp
+        Returns:
+            int: The balance, or None if the ledger has no history for the account at that time
+        Raises:
+            ValueError: If the bank keeps no transaction ledger.
+        """
+        return self._ledger().balance_as_of(account_id, when)
+
+    @timed("bank.account_statement")
+    def account_statement(self, account_id, start=None, end=None):
+        """Transactions of an account in a time range, with running balances
+        Args:
+            account_id (str): The id of the account
+            start (float): First Unix timestamp to include, or None for the beginning
+            end (float): Last Unix timestamp to include, or None for now
+        Returns:
+            list: Dictionaries with time, type, amount and balance
+        Raises:
+            ValueError: If the bank keeps no transaction ledger.
+        """
+        return self._ledger().statement(account_id, start, end)
+
+    def _ledger(self):
+        """Return the transaction ledger
+        Raises:
+            ValueError: If the bank keeps no transaction ledger.
+        """
+        if self.transaction_ledger is None:
+            logger.error("This bank keeps no transaction ledger")
+            raise ValueError("This bank keeps no transaction ledger")
+        return self.transaction_ledger
+
+    @timed("bank.total_balance")
+    def total_balance(self, account_type=None):
+        """Total balance held across all accounts
+        Args:
+            account_type (str): Account type to restrict to, or None for all accounts
+        Returns:
+            int: Total balance
+        """
+        return self.customer_repository.total_balance(account_type)
+
+    @timed("bank.balance_totals")
+    def balance_totals(self, by='type'):
+        """Total balances grouped by account type or by the employee who opened the account
+        Args:
+            by (str): 'type' or 'created_by'
+        Returns:
+            dict: Group -> total balance
+        """
+        return self.customer_repository.balance_totals(by)
 
+    @timed("bank.customers_below_balance")
+    def customers_below_balance(self, threshold=MINIMUM_BALANCE, account_type=None):
+        """Ids of customers holding an account with a balance below a threshold
+        Args:
+            threshold (int): Balance to compare against, MINIMUM_BALANCE by default
+            account_type (str): Account type to restrict to, or None for all accounts
+        Returns:
+            list: Customer ids
+        """
+        return self.customer_repository.customers_below_balance(threshold, account_type)
+
+    @timed("bank.audit_customers")
+    def audit_customers(self, reseal=False):
+        """Check every stored customer against its checksum and the full model validation
+        Args:
+            reseal (bool): Seal the valid customers that lack a matching checksum, so they load trusted
+        Returns:
+            dict: 'customers' checked, how many are 'unchecked' for lack of a checksum,
+                'checksum_mismatches' ids, the 'invalid' customers' errors by id and, with reseal,
+                how many customers were 'resealed'
+        Raises:
+            ValueError: If the customer repository does not support audits.
+        """
+        audit = getattr(self.customer_repository, 'audit', None)
+        if not audit:
+            logger.error("%s does not support audits", type(self.customer_repository).__name__)
+            raise ValueError(f"{type(self.customer_repository).__name__} does not support audits")
+        return audit(reseal)
 
+    @contextmanager
+    def deferred(self):
+        """Defer persistence of everything done inside the block to a single flush at the end
+        Customer journal entries and ledger lines are buffered in memory; call flush()
+        at checkpoints to bound what a crash can lose. Repositories without deferred
+        writes keep persisting every call.
+        """
+        with ExitStack() as stack:
+            deferred = getattr(self.customer_repository, 'deferred', None)
+            if deferred:
+                stack.enter_context(deferred())
+            if self.transaction_ledger is not None:
+                stack.enter_context(self.transaction_ledger.deferred())
+            yield self
+
+    def flush(self):
+        """Write the changes buffered by deferred() so far"""
+        flush = getattr(self.customer_repository, 'flush', None)
+        if flush:
+            flush()
+        if self.transaction_ledger is not None:
+            self.transaction_ledger.flush()
+        logger.info("Bank changes flushed to storage.")
+
+    def metrics(self, reset=False):
+        """Snapshot of the latency histograms and I/O and hydration counters
+        Metrics are recorded once utils.metrics.registry.enable() is called or BANK_METRICS=1 is set.
+        Args:
+            reset (bool): Clear the metrics after reading them
+        Returns:
+            dict: 'latency' per Bank and repository method, 'counters', the eligibility cache statistics
+                and how the customer repository started ('mode', 'seconds', 'customers'), if it reports it
+        """
+        snapshot = registry.snapshot(reset)
+        snapshot['eligibility_cache'] = self.eligibility_cache.stats()
+        snapshot['startup'] = getattr(self.customer_repository, 'startup', None)
+        return snapshot
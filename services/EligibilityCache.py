@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class EligibilityCache:
+    """Bounded LRU cache of service eligibility results.
+
+    Results are keyed on (customer id, service type, customer version). The
+    version is bumped by the account balance setter, Customer.add_account,
+    Customer.remove_account and age updates, so any change that can affect
+    eligibility makes the old entry unreachable and it ages out of the LRU.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def can_apply(self, customer, service):
+        """Check eligibility through the cache, calling service.can_apply on a miss.
+        Args:
+            customer (Customer): The customer to check
+            service (Service): The service to check
+        Returns:
+            bool: True if the customer can apply, False otherwise
+        """
+        if not service.is_active:
+            return service.can_apply(customer)
+
+        key = (customer.id, service.type, customer.version)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = service.can_apply(customer)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, customer_id=None):
+        """Drop the cached results of one customer, or of every customer.
+        Args:
+            customer_id (str): The id of the customer, or None to clear the cache
+        """
+        with self._lock:
+            if customer_id is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == customer_id]:
+                    del self._entries[key]
+        logger.debug("Eligibility cache invalidated for %s", customer_id or 'all customers')
+
+    def stats(self):
+        """Return the cache counters.
+        Returns:
+            dict: Hits, misses, current size and maximum size
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'max_size': self.max_size
+            }
@@ -0,0 +1,61 @@
+from itertools import compress, repeat
+from operator import eq, ge
+
+from utils.logger import get_logger
+from models.Service import Service
+from repositories.account_columns import AccountColumns
+from utils.Constants import MINIMUM_BALANCE, LoanConstants, CreditCardConstants
+
+logger = get_logger(__name__)
+
+
+class EligibilityEngine:
+    """Evaluate the LoanService and CreditCardService rules for every customer at once.
+
+    Works on AccountColumns instead of hydrated customers and gives the same
+    answers as Service.can_apply for a newly created service:
+
+    - Loan: a savings account with a balance of at least its minimum balance,
+      and an age of at least LoanConstants.MIN_AGE.
+    - Credit card: any account with a balance of at least MINIMUM_BALANCE,
+      and an age of at least CreditCardConstants.MIN_AGE.
+    """
+
+    def __init__(self, account_columns):
+        self.columns = account_columns
+
+    def eligible_ids(self, service_type):
+        """Find every customer eligible for a service.
+        Args:
+            service_type (str): Service type value
+        Returns:
+            list: Ids of the eligible customers, in storage order
+        Raises:
+            ValueError: If the service type is unknown.
+        """
+        columns = self.columns
+        if service_type == Service.Type.LOAN.value:
+            mask = map(bool.__and__,
+                       map(eq, columns.type_code, repeat(AccountColumns.SAVINGS)),
+                       map(ge, columns.balance, columns.limit))
+            min_age = LoanConstants.MIN_AGE
+        elif service_type == Service.Type.CREDIT_CARD.value:
+            mask = map(ge, columns.balance, repeat(MINIMUM_BALANCE))
+            min_age = CreditCardConstants.MIN_AGE
+        else:
+            raise ValueError(f"Unknown service type: {service_type}")
+
+        codes = dict.fromkeys(compress(columns.customer, mask))
+        codes.pop(-1, None)
+        age = columns.age
+        return [columns.customer_id(code) for code in codes if age[code] >= min_age]
+
+    def evaluate(self):
+        """Find the eligible customers for every service type.
+        Returns:
+            dict: Service type value -> list of eligible customer ids
+        """
+        results = {service_type.value: self.eligible_ids(service_type.value) for service_type in Service.Type}
+        logger.info("Eligibility evaluated: %s",
+                    ", ".join(f"{service_type}={len(ids)}" for service_type, ids in results.items()))
+        return results
@@ -1,23 +1,92 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 
 os.makedirs("logs", exist_ok=True)
 
-logger = logging.getLogger("bank_logger")
-logger.setLevel(logging.DEBUG)
+# Every module logs through a child of this logger, e.g. "bank_logger.models.Customer"
+LOGGER_NAME = "bank_logger"
+
+logger = logging.getLogger(LOGGER_NAME)
+logger.setLevel(os.environ.get("BANK_LOG_LEVEL", "INFO").upper())
+logger.propagate = False
 
 # Formatter
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
 
 file_handler = logging.FileHandler("logs/errors.log")
-file_handler.setLevel(logging.WARNING) 
+file_handler.setLevel(logging.WARNING)
 file_handler.setFormatter(formatter)
 
 console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)  
 console_handler.setFormatter(formatter)
 
-# Add handlers to the logger
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+# Records are put on a queue by the caller and written by a background listener thread,
+# so slow handlers never block the code that logs
+log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
+
+def get_logger(module_name):
+    """Return the logger of a module
+    Args:
+        module_name (str): The module's __name__, e.g. "models.Customer"
+    Returns:
+        logging.Logger: Child of the bank logger, so its level can be set per module
+    """
+    return logger.getChild(module_name)
+
+
+def log_to_queue(target_queue, level=None):
+    """Send the records of this process to a queue instead of the local handlers
+    Use it as the initializer of worker processes whose parent drains the queue with listen_to_queue.
+    Args:
+        target_queue (multiprocessing.Queue): Queue read by the parent process
+        level (int): Level of the bank logger, e.g. the parent's, or None to keep the current one
+    """
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(target_queue))
+    if level is not None:
+        logger.setLevel(level)
+
+
+def listen_to_queue(source_queue):
+    """Write the records that worker processes put on a queue through this process's handlers
+    Args:
+        source_queue (multiprocessing.Queue): Queue the workers log to, see log_to_queue
+    Returns:
+        logging.handlers.QueueListener: The started listener; stop() it once the workers are gone
+    """
+    forwarder = logging.handlers.QueueListener(source_queue, *logger.handlers)
+    forwarder.start()
+    return forwarder
+
+
+def set_log_level(level, module_name=None):
+    """Set the level of the bank logger or of one module or package
+    Args:
+        level (str): Level name such as "DEBUG" or "WARNING"
+        module_name (str): Module or package such as "models" or "repositories.customer_repository", or None for all
+    """
+    target = get_logger(module_name) if module_name else logger
+    target.setLevel(level.upper())
+
+
+def configure_log_levels(spec):
+    """Apply per-module levels from a spec such as "models=WARNING,services.Bank=DEBUG"
+    Args:
+        spec (str): Comma separated module=LEVEL pairs; a bare LEVEL sets the bank logger
+    """
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        module_name, _, level = item.rpartition('=')
+        set_log_level(level, module_name or None)
+
+
+configure_log_levels(os.environ.get("BANK_LOG_LEVELS", ""))
@@ -0,0 +1,193 @@
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Histogram:
+    """Latency histogram with power-of-two buckets from 1 microsecond up to about 36 minutes."""
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    BOUNDS = [2 ** k / 1e6 for k in range(32)]
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(self.BOUNDS, seconds)] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding a percentile, capped at the largest observation.
+        Args:
+            fraction (float): Percentile as a fraction, e.g. 0.99
+        Returns:
+            float: Latency in seconds
+        """
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(self.BOUNDS[index], self.max) if index < len(self.BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min or 0.0,
+            'max': self.max,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99)
+        }
+
+
+class Metrics:
+    """Registry of latency histograms and counters.
+
+    Recording is off unless ``enabled`` is set, by ``enable()`` or the
+    BANK_METRICS=1 environment variable. While it is off, ``timed`` wrappers
+    cost one attribute check and ``increment`` returns at once.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._dump_thread = None
+        self._dump_stop = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def observe(self, name, seconds):
+        """Record one latency.
+        Args:
+            name (str): Histogram name, e.g. "bank.deposit"
+            seconds (float): Elapsed time
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, amount=1):
+        """Add to a counter.
+        Args:
+            name (str): Counter name, e.g. "customer_repository.bytes_written"
+            amount (int): Amount to add
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def timed(self, name):
+        """Decorator recording the latency of every call in a histogram.
+        Args:
+            name (str): Histogram name
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self, reset=False):
+        """Return every histogram and counter.
+        Args:
+            reset (bool): Clear the metrics after reading them
+        Returns:
+            dict: 'latency' (name -> count, total, mean, min, max, p50, p95 and p99 in seconds) and 'counters'
+        """
+        with self._lock:
+            snapshot = {
+                'time': time.time(),
+                'enabled': self.enabled,
+                'latency': {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())},
+                'counters': dict(sorted(self._counters.items()))
+            }
+            if reset:
+                self._histograms.clear()
+                self._counters.clear()
+        return snapshot
+
+    def reset(self):
+        """Clear every histogram and counter."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def start_periodic_dump(self, path="logs/metrics.json", interval=60.0):
+        """Write a snapshot to a JSON file every interval seconds from a background thread.
+        Args:
+            path (str): File to overwrite with the latest snapshot
+            interval (float): Seconds between dumps
+        """
+        self.stop_periodic_dump()
+        stop = self._dump_stop = threading.Event()
+
+        def dump():
+            while not stop.wait(interval):
+                try:
+                    self.dump(path)
+                except Exception as e:
+                    logger.error("Failed to dump metrics to %s: %s", path, e)
+
+        self._dump_thread = threading.Thread(target=dump, name="metrics-dump", daemon=True)
+        self._dump_thread.start()
+        logger.info("Dumping metrics to %s every %ss", path, interval)
+
+    def stop_periodic_dump(self):
+        """Stop the periodic dump thread, if any."""
+        if self._dump_thread is not None:
+            self._dump_stop.set()
+            self._dump_thread.join()
+            self._dump_thread = None
+
+    def dump(self, path):
+        """Write a snapshot to a JSON file atomically.
+        Args:
+            path (str): File to overwrite
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=4)
+        os.replace(tmp_path, path)
+
+
+# Process-wide registry used by Bank, the repositories and the models
+registry = Metrics(enabled=os.environ.get("BANK_METRICS") == "1")
+timed = registry.timed